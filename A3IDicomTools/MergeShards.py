@@ -0,0 +1,63 @@
+import argparse
+import os
+
+from .configs import parse_bool
+from .extractors.meta_writers import MetaWriterRegister
+from .extractors.sharding import find_shards, merge_reports
+
+
+def build_args():
+    parser = argparse.ArgumentParser(
+        description="Merge the metadata and performance reports of a sharded extraction"
+    )
+    parser.add_argument(
+        "--OutputDirectory",
+        required=True,
+        type=str,
+        help="OutputDirectory shared by the shards. The merged files are written there",
+    )
+    parser.add_argument(
+        "--MetadataFormat",
+        type=str,
+        required=False,
+        default="csv",
+        choices=MetaWriterRegister.get_writers(),
+        help="MetadataFormat used by the shards",
+    )
+    parser.add_argument("--MergeToParquet", type=parse_bool, required=False, default=False)
+    return parser
+
+
+def merge_shards(output_directory, metadata_format="csv", to_parquet=False):
+    """
+    Merges the metadata batches of every shard_{i}_of_{n} directory into a single metadata file
+    in output_directory and combines their performance reports. Fails if a shard is missing.
+    """
+    shards = find_shards(output_directory)
+    if not shards:
+        raise FileNotFoundError(f"No shard directories found in {output_directory}")
+    batch_files, report_files = [], []
+    for shard_index in sorted(shards):
+        writer = MetaWriterRegister.build_writer(
+            {"MetadataFormat": metadata_format}, os.path.join(shards[shard_index], "meta")
+        )
+        batch_files.extend(writer.batch_files())
+        report_file = os.path.join(shards[shard_index], "performance_report.json")
+        if os.path.isfile(report_file):
+            report_files.append(report_file)
+    destination = writer.merge(output_directory, to_parquet=to_parquet, batch_files=batch_files)
+    if report_files:
+        merge_reports(report_files, os.path.join(output_directory, "performance_report.json"))
+    return destination
+
+
+def main():
+    config = vars(build_args().parse_args())
+    destination = merge_shards(
+        config["OutputDirectory"], config["MetadataFormat"], config["MergeToParquet"]
+    )
+    print(f"Merged shard metadata into {destination}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,11 @@ from collections import (
 )
 
 from .extractors.PngExtractor import ExtractorRegister
+from .extractors.meta_writers import MetaWriterRegister
+from .extractors.extractUtils import OVERSIZED_MODES, resolve_tags
+from .extractors.volume_writers import volume_codecs
+from .extractors.decoders import load_decoder_preferences
+from .extractors.inventory import _CLASS_ORDER
 
 
 class LoadFromFile(argparse.Action):
@@ -34,6 +39,42 @@ def parse_bool(s: str):
     return eval(s) == True
 
 
+def parse_str_list(s: str):
+    """A json list, a comma separated string or false (empty list)"""
+    s = s.strip()
+    if s.startswith("["):
+        values = json.loads(s)
+    elif s in ("", "False", "false", "None"):
+        values = []
+    else:
+        values = s.split(",")
+    return [str(e).strip() for e in values if str(e).strip()]
+
+
+def parse_tag_list(s: str):
+    """A json list of tags, a comma separated string of tags or false"""
+    tags = parse_str_list(s)
+    resolve_tags(tags)  # fail early on unknown keywords
+    return tags
+
+
+def parse_class_list(s: str):
+    """A list of storage classes (MRCT, TOMO, XRAY, OTHER)"""
+    classes = parse_str_list(s)
+    unknown = [e for e in classes if e not in _CLASS_ORDER]
+    if unknown:
+        raise ValueError(f"Unknown storage classes {unknown}, expected some of {_CLASS_ORDER}")
+    return classes
+
+
+def parse_decoder_plugins(s: str):
+    """A json object of transfer syntax to plugin(s), the path of a decoder benchmark result or false"""
+    s = s.strip()
+    if s in ("", "False", "false", "None"):
+        return {}
+    return load_decoder_preferences(json.loads(s) if s.startswith("{") else s)
+
+
 def build_args():
     """Parses args. Must include all hyperparameters you want to tune.
 
@@ -75,7 +116,29 @@ def build_args():
     parser.add_argument(
         "--PublicHeadersOnly", type=parse_bool, required=True, default=True
     )
-    parser.add_argument("--SpecificHeadersOnly", type=str, required=True, default=False)
+    parser.add_argument(
+        "--SpecificHeadersOnly",
+        type=parse_tag_list,
+        required=True,
+        default=False,
+        help="List of keywords or hex tags to extract. false extracts every tag",
+    )
+    parser.add_argument(
+        "--MaxTagValueBytes",
+        type=int,
+        required=False,
+        default=0,
+        help="Tag values longer than this many bytes are not parsed, see OversizedTagValues. "
+        "Header only reads leave them on disk. 0 keeps every value",
+    )
+    parser.add_argument(
+        "--OversizedTagValues",
+        type=str,
+        required=False,
+        default="hash",
+        choices=OVERSIZED_MODES,
+        help="Replacement of values above MaxTagValueBytes: hash (size and blake2b), size or truncate",
+    )
     parser.add_argument("--ApplyVOILUT", type=parse_bool, required=True, default=True)
     parser.add_argument(
         "--Extractor",
@@ -85,11 +148,178 @@ def build_args():
     )
     parser.add_argument("--HashSeed", type=int, required=False, default=42)
     parser.add_argument(
-        "--ExtractNested", type=parse_bool, required=False, default=False
+        "--ExtractNested",
+        type=parse_bool,
+        required=False,
+        default=True,
+        help="Flatten the items of sequences into the metadata of non CT/MR objects",
     )
     parser.add_argument("--Debug", type=parse_bool, required=False, default=False)
     parser.add_argument("--Reorient",type=parse_bool,required=True,default=False,help="If TOMO/CT/MR volumes should be reoriented see nibabel orientatins for info. NOTE: CAREFUL WITH CHOICE. Keep false for consistency with past")
     parser.add_argument("--ApplyParentFilter",type=parse_bool,required=True,default=False,help='If extrating MRI/CT set to True for faster processing') 
+    parser.add_argument(
+        "--VerifyLaterality",
+        type=parse_bool,
+        required=False,
+        default=False,
+        help="Flip tomosynthesis volumes whose estimated laterality does not match FrameLaterality",
+    )
+    parser.add_argument(
+        "--StreamTomoFrames",
+        type=parse_bool,
+        required=False,
+        default=True,
+        help="Decode, window and write tomosynthesis frames one at a time instead of building the volume in memory",
+    )
+    parser.add_argument(
+        "--DecoderPlugins",
+        type=parse_decoder_plugins,
+        required=False,
+        default={},
+        help="Preferred pixel decoders by transfer syntax e.g. {\"JPEG2000Lossless\": [\"pylibjpeg\", \"gdcm\"]} "
+        "or the path of a benchmarks.bench_decoders result file",
+    )
+    parser.add_argument(
+        "--VolumeCodec",
+        type=str,
+        required=False,
+        default="gzip",
+        choices=volume_codecs(),
+        help="Codec of the nifti volumes: none (.nii), gzip or parallel_gzip (.nii.gz)",
+    )
+    parser.add_argument(
+        "--VolumeCompressionLevel",
+        type=int,
+        required=False,
+        default=1,
+        choices=range(0, 10),
+        help="gzip level of the nifti volumes. 1 is nibabel's default",
+    )
+    parser.add_argument(
+        "--VolumeCompressThreads",
+        type=int,
+        required=False,
+        default=4,
+        help="Threads per worker used by the parallel_gzip codec",
+    )
+    parser.add_argument(
+        "--PngCompressionLevel",
+        type=int,
+        required=False,
+        default=6,
+        choices=range(0, 10),
+        help="zlib level of the png images. 1 is the fastest, 9 the smallest",
+    )
+    parser.add_argument(
+        "--ScanThreads",
+        type=int,
+        required=False,
+        default=8,
+        help="Number of threads used to walk DICOMHome when discovering dicom files",
+    )
+    parser.add_argument(
+        "--ScanBatchSize",
+        type=int,
+        required=False,
+        default=256,
+        help="Number of discovered paths sent to a worker per categorization task",
+    )
+    parser.add_argument(
+        "--CostScheduling",
+        type=parse_bool,
+        required=False,
+        default=True,
+        help="Dispatch the most expensive tasks first and pack cheap tasks together",
+    )
+    parser.add_argument(
+        "--SchedulerChunkCost",
+        type=float,
+        required=False,
+        default=0.25,
+        help="Estimated seconds of work per chunk of cheap tasks sent to a worker",
+    )
+    parser.add_argument(
+        "--HeaderThreads",
+        type=int,
+        required=False,
+        default=0,
+        help="Threads running header only tasks next to the NumProcesses conversion processes. "
+        "0 runs everything on the processes",
+    )
+    parser.add_argument(
+        "--HeaderClasses",
+        type=parse_class_list,
+        required=False,
+        default=["OTHER"],
+        help="Storage classes run on the HeaderThreads. "
+        "Every class is header only when SaveImages is false",
+    )
+    parser.add_argument(
+        "--WriterQueueSize",
+        type=int,
+        required=False,
+        default=4,
+        help="Metadata batches waiting for the writer thread before collection blocks. 0 writes inline",
+    )
+    parser.add_argument(
+        "--MetadataBatchSize",
+        type=int,
+        required=False,
+        default=256,
+        help="Files per task when SaveImages is false, their rows are returned as columns. "
+        "0 sends one row dict per file",
+    )
+    parser.add_argument(
+        "--Deduplicate",
+        type=parse_bool,
+        required=False,
+        default=True,
+        help="Extract copies of a file (same SOPInstanceUID and content fingerprint) once",
+    )
+    parser.add_argument(
+        "--Incremental",
+        type=parse_bool,
+        required=False,
+        default=False,
+        help="Append the rows of the files that are new or changed since the previous run to the "
+        "merged metadata instead of rewriting it",
+    )
+    parser.add_argument(
+        "--WatchInterval",
+        type=float,
+        required=False,
+        default=0,
+        help="Seconds between incremental passes of a long running watch loop. 0 runs once",
+    )
+    parser.add_argument(
+        "--ShardIndex",
+        type=int,
+        required=False,
+        default=0,
+        help="Shard extracted by this run, in [0, ShardCount)",
+    )
+    parser.add_argument(
+        "--ShardCount",
+        type=int,
+        required=False,
+        default=1,
+        help="Number of runs sharing DICOMHome. Studies are split between them by a hash of StudyInstanceUID",
+    )
+    parser.add_argument(
+        "--MetadataFormat",
+        type=str,
+        required=False,
+        default="csv",
+        choices=MetaWriterRegister.get_writers(),
+        help="Format of the metadata batches and of the merged metadata file",
+    )
+    parser.add_argument(
+        "--MergeToParquet",
+        type=parse_bool,
+        required=False,
+        default=False,
+        help="Also write the merged metadata as metadata.parquet when MetadataFormat is csv",
+    )
 
     return parser
 
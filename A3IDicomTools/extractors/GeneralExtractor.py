@@ -1,6 +1,4 @@
-from collections import defaultdict
 from typing import Dict, List
-from collections import defaultdict
 from .PngExtractor import ExtractorRegister, fix_mismatch
 import pathlib
 import logging
@@ -8,18 +6,27 @@ import os
 import time
 import pandas as pd
 from functools import partial
-import pickle
 from pathlib import Path
 from multiprocessing import Pool
 from tqdm import tqdm
-import pydicom as pyd
 from enum import StrEnum
 from .functional_extractors import (
     process_ctmri,
+    process_ctmri_series,
     process_png,
     process_tomo,
     process_general,
 )
+from .columnar import ColumnBatch
+from .discovery import DicomTreeScanner
+from .extractUtils import file_fingerprint, read_dcm_uids
+from .inventory import FileStatus, InventoryIndex
+from .journal import CompletionJournal
+from .meta_writers import BackgroundBatchWriter, MetaWriterRegister, batch_id_from_path
+from .scheduling import plan_tasks
+from .executors import split_dispatch
+from .perf import PerfReport
+from .sharding import record_shard, shard_directory, validate_shard
 from ..help_data.uid_categories import _mr_tags, _tomo_tags, _xray_tags
 from glob import glob 
 
@@ -37,7 +44,13 @@ class GeneralExtractor:
         self.dicom_home = str(
             pathlib.PurePath(config["DICOMHome"])
         )  # parse the path and convert it to a string
-        self.output_directory = str(pathlib.Path(config["OutputDirectory"]))
+        self.ShardIndex = config["ShardIndex"]
+        self.ShardCount = config["ShardCount"]
+        validate_shard(self.ShardIndex, self.ShardCount)
+        # every shard writes its images, metadata, index and logs to its own directory
+        self.output_directory = shard_directory(
+            str(pathlib.Path(config["OutputDirectory"])), self.ShardIndex, self.ShardCount
+        )
         self.print_images = config["SaveImages"]
         self.PublicHeadersOnly = config["PublicHeadersOnly"]
         self.processes = config["NumProcesses"]
@@ -49,13 +62,39 @@ class GeneralExtractor:
             0  # used for keeping track of what metadata file we are to write
         )
         LOG_FILENAME = os.path.join(self.output_directory, "ImageExtractor.out")
-        # this will be a list of all the dicom files to extract
-        self.pickle_file = os.path.join(self.output_directory, "ImageExtractor.pickle")
+        # inventory of all the dicom files to extract and their extraction status
+        self.index_file = os.path.join(self.output_directory, "ImageExtractor.sqlite")
+        self.index = None
+        # append only record of the files extracted so far. used to resume interrupted runs
+        self.journal = CompletionJournal(
+            os.path.join(self.output_directory, "ImageExtractor.journal")
+        )
         self.ApplyVOILUT = config["ApplyVOILUT"]
         self.ExtractNested = config["ExtractNested"]
         self.Debug = config["Debug"]
         self.populate_extraction_dirs() 
+        self.meta_writer = MetaWriterRegister.build_writer(config, self.meta_directory)
         self.ApplyParentFilter = config['ApplyParentFilter']
+        self.ScanThreads = config["ScanThreads"]
+        self.ScanBatchSize = config["ScanBatchSize"]
+        self.MergeToParquet = config["MergeToParquet"]
+        self.CostScheduling = config["CostScheduling"]
+        self.SchedulerChunkCost = config["SchedulerChunkCost"]
+        self.HeaderThreads = config["HeaderThreads"]
+        self.HeaderClasses = config["HeaderClasses"]
+        self.WriterQueueSize = config["WriterQueueSize"]
+        # metadata only runs send batches of rows as columns instead of a dict per file
+        self.MetadataBatchSize = config["MetadataBatchSize"] if not self.print_images else 0
+        self.Deduplicate = config["Deduplicate"]
+        self.WatchInterval = config["WatchInterval"]
+        # the watch loop only looks at what arrived since the previous pass
+        self.Incremental = config["Incremental"] or self.WatchInterval > 0
+        # representative path -> paths of its copies. Only the representative is extracted
+        self.duplicates = {}
+        self.batch_writer = None
+        # per stage timings of the workers, written to performance_report.json at the end of the run
+        self.perf_report = PerfReport()
+        self.perf_report_file = os.path.join(self.output_directory, "performance_report.json")
         logging.basicConfig(filename=LOG_FILENAME, level=logging.DEBUG)
         logging.info("------- Values Initialization DONE -------")
 
@@ -80,151 +119,316 @@ class GeneralExtractor:
                 os.makedirs(fail_dir)
         print(f"Done Creating Directories")
 
-    def _get_filelist(self) -> Dict[str, List[str]]:
+    def _get_filelist(self) -> Dict[str, int]:
         """
-        Produces list of dicom files to extract. Saves the list as a pickle file
-        In the case of a workloads that are resumed we use exisitng metadata to prune the filelist
-        and resume from the remainig list
+        Updates the inventory index of DICOMHome and returns the number of files left to extract per
+        storage class. Only new or modified files are read again on later runs.
+        Files recorded in the completion journal are marked as extracted. In the case of a workload
+        that is resumed without a journal we use existing metadata to mark the extracted files
         """
-        if os.path.isfile(self.pickle_file):
-            f = open(self.pickle_file, "rb")
-            filedict = pickle.load(f)
-            filedict = self.prune_extracted(filedict)
-            # TODO: Add the pruning of the extraction list again
-        else:
-            filedict = self.get_dicom_files()
-            if os.path.isdir(
-                self.meta_directory
-            ):  # means we are resumming without pickle
-                print(f"We didn't have a pickle file but resuming using found metadata")
-                # TODO we need to bring back prunning based on the metadata
-                filedict = self.prune_extracted(filedict)
-            self._write_filelist(filedict)
-        if self.Debug:
-            # make the debug shortening occur again
-            pass
-        for k in filedict:
-            logging.info(f"For {k} we have {len(filedict[k])}")
-        return filedict
-
-    def prune_extracted(self, file_dict):
+        if self.index is not None:
+            self.index.close()
+        self.index = InventoryIndex(self.index_file)
+        self.update_index()
+        if os.path.isfile(self.journal.journal_path):
+            self._sync_journal()
+        elif glob(f"{self.meta_directory}/*.csv"):
+            print(f"We didn't have a journal file but resuming using found metadata")
+            self.prune_extracted()
+        self.meta_counter = self._next_meta_counter()
+        if self.Deduplicate:
+            n_duplicates = self.index.mark_duplicates()
+            self._copy_extracted_rows()
+            self.duplicates = self.index.duplicates_by_representative()
+            print(f"Found {n_duplicates} duplicate files, they will point to their representative")
+        pending = self.index.count_pending()
+        print(f"Files left to extract {sum(pending.values())}")
+        for k in pending:
+            logging.info(f"For {k} we have {pending[k]}")
+        return pending
+
+    def _copy_extracted_rows(self):
         """
-        Shortens extraction file list using exisitng metadta csvs.
+        Copies of files extracted by an earlier run get a copy of the metadata row of their
+        representative. Copies whose representative has no row left are extracted again
+        """
+        extracted = self.index.extracted_duplicates()
+        if not extracted:
+            return
+        found = self.meta_writer.find_rows(extracted)
+        meta_rows, missing = list(), list()
+        for representative, dup_paths in extracted.items():
+            row = found.get(representative)
+            if row is None:
+                missing.extend(dup_paths)
+                continue
+            for dup_path in dup_paths:
+                meta_rows.append(dict(row, file=dup_path, duplicate_of=representative))
+        self.index.set_status((e, FileStatus.PENDING) for e in missing)
+        if meta_rows:
+            self.journal.start()
+            entries = ((e["file"], FileStatus.DONE) for e in meta_rows)
+            self.journal.record_many(entries, self.meta_counter)
+            self._write_meta_batch(meta_rows)
+            self.journal.close()
+            self._sync_journal()
+
+    def prune_extracted(self):
+        """
+        Marks the files found in existing metadata csvs as extracted in the index.
         """
         meta_csvs = [str(e) for e in Path(self.meta_directory).rglob("*.csv")]
         all_files = set()
-        max_batch = 0
         for e in tqdm(meta_csvs, total=len(meta_csvs)):
-            batch_id = int(os.path.split(e)[1].split(".")[0].split("_")[1])
             df = pd.read_csv(e, dtype="str", usecols=["file"])
             all_files.update(df["file"].unique().tolist())
-            if batch_id >= max_batch:
-                max_batch = batch_id
         print(f"Number of extracted files was {len(all_files)}")
-        filtered_filed = defaultdict(list)
-        to_proc = 0
-        for k in file_dict:
-            for e in file_dict[k]:
-                if str(e) not in all_files:
-                    filtered_filed[k].append(e)
-                    to_proc += 0
-        print(f"Resuming Extraction with {to_proc}")
-        self.meta_counter = (
-            max_batch + 1
-        )  # we do +1 because we will start writing the next batch
-        return filtered_filed
+        self.index.set_status((e, FileStatus.DONE) for e in all_files)
+
+    def _sync_journal(self):
+        """Applies the journal entries written since the last sync to the index"""
+        offset = int(self.index.get_meta("journal_offset", 0))
+        self.index.set_status(self.journal.replay(offset))
+        self.index.set_meta("journal_offset", self.journal.last_offset)
+
+    def _next_meta_counter(self) -> int:
+        """Metadata batches are numbered. Returns the id after the last batch that was written"""
+        batch_ids = [batch_id_from_path(e) for e in self.meta_writer.batch_files()]
+        return max(batch_ids) + 1 if batch_ids else 0
 
     def execute(self):
         fix_mismatch()  # TODO: hold over from old processing code could be improved?
+        if self.WatchInterval > 0:
+            self.watch()
+        else:
+            self.run_once()
+        logging.shutdown()  # Closing logging file after extraction is done !!
+
+    def watch(self):
+        """Extracts the files arriving under DICOMHome every WatchInterval seconds until interrupted"""
+        logging.info(f"Watching {self.dicom_home} every {self.WatchInterval}s")
+        try:
+            while True:
+                t_start = time.time()
+                self.run_once()
+                time.sleep(max(0.0, self.WatchInterval - (time.time() - t_start)))
+        except KeyboardInterrupt:
+            logging.info("Watch loop stopped")
+
+    def run_once(self):
+        t_start = time.time()
+        self.perf_report = PerfReport()
+        self.batch_writer = None
         # gets all dicom files. if editing this code, get filelist into the format of a list of strings,
         # with each string as the file path to a different dicom file.
-        filedict = self._get_filelist()
+        pending = self._get_filelist()
+        t_discovered = time.time()
         # HEre i need a filtering step for MR or CT #TODO
-        filelist = self._make_proc_list(filedict)
-        total_len = sum([len(v) for k, v in filedict.items()])
-        t_start = time.time()
-        self.run_extraction(filelist, total_len)
-        meta_directory = f"{self.output_directory}/meta/"
-        metas = glob(f"{meta_directory}*.csv")
-        merged_meta = pd.DataFrame()
-        # TODO:  Right now we do not fillter out empty metadata columsn. add it in the future?
-        for meta in metas:
-            m = pd.read_csv(meta, dtype="str")
-            merged_meta = pd.concat([merged_meta, m], ignore_index=True)
-        merged_meta.to_csv("{}/metadata.csv".format(self.output_directory), index=False)
-        logging.info("Total run time: %s %s", time.time() - t_start, " seconds!")
-        logging.shutdown()  # Closing logging file after extraction is done !!
+        filelist = self._make_proc_list()
+        total_len = sum(pending.values())
+        if total_len or not self.Incremental:
+            self.run_extraction(filelist, total_len)
+        t_extracted = time.time()
+        self.merge_metadata()
+        t_end = time.time()
+        run_timings = {
+            "discovery": t_discovered - t_start,
+            "extraction": t_extracted - t_discovered,
+            "merge": t_end - t_extracted,
+            "total": t_end - t_start,
+        }
+        extra = {"writer": self.batch_writer.metrics} if self.batch_writer is not None else None
+        self.perf_report.write(self.perf_report_file, run_timings, extra)
+        logging.info("Total run time: %s %s", t_end - t_start, " seconds!")
 
-    def _make_proc_list(self, filedict):
-        # make it a generator for fun
-        for sop_key, sop_list in filedict.items():
-            for dcm in sop_list:
-                yield (sop_key, dcm)
+    def merge_metadata(self):
+        """
+        Merges the metadata batches into metadata.csv/parquet. Incremental runs only add the batches
+        written since the last merge instead of rewriting the merged output
+        """
+        merged_until = self.index.get_meta("merged_until")
+        if not self.Incremental or merged_until is None:
+            self.meta_writer.merge(self.output_directory, to_parquet=self.MergeToParquet)
+        else:
+            new_batches = [
+                e for e in self.meta_writer.batch_files() if batch_id_from_path(e) >= int(merged_until)
+            ]
+            if new_batches:
+                self.meta_writer.append(
+                    self.output_directory, new_batches, to_parquet=self.MergeToParquet
+                )
+        self.index.set_meta("merged_until", self.meta_counter)
 
-    def run_extraction(self, filelist, total_len):
-        with Pool(self.processes) as p:
-            meta_rows = list()
-            extract_func = partial(
-                general_extract,
+    def _make_proc_list(self):
+        """
+        Batches of (StorageClass, path or [paths]) tasks. With CostScheduling the most expensive
+        tasks are dispatched first and cheap tasks are packed together (see scheduling.plan_tasks),
+        otherwise tasks are dispatched one at a time in storage class order
+        """
+        # streamed from the index so the file list is never held in memory
+        # CT/MR files are grouped per series unless the parent filter already picked one file per series
+        series_classes = () if self.ApplyParentFilter else (StorageClass.MRCT,)
+        if self.MetadataBatchSize > 0:
+            # header only work costs about the same per file, fixed size batches of single files
+            batches = chunked(self.index.iter_pending(), self.MetadataBatchSize)
+        elif self.CostScheduling:
+            batches = plan_tasks(
+                self.index,
                 print_images=self.print_images,
-                save_dir=self.img_destination,
-                config = self.config
+                series_classes=series_classes,
+                chunk_cost=self.SchedulerChunkCost,
             )
-            proc = p.imap_unordered(extract_func, filelist)
-            for i, dcm_meta in tqdm(enumerate(proc), total=total_len):
-                if dcm_meta is None:
+        else:
+            batches = ([e] for e in self.index.iter_pending(series_classes=series_classes))
+        for batch in batches:
+            yield [(StorageClass(sop_key), dcm) for sop_key, dcm in batch]
+
+    def _is_header_task(self, work_tup) -> bool:
+        """Tasks that only parse headers. Without images every task only reads headers"""
+        return not self.print_images or work_tup[0] in self.HeaderClasses
+
+    def _dispatch(self, batches, extract_func):
+        """
+        Yields the rows of every batch as they complete. With HeaderThreads header only tasks run
+        on a thread pool next to the process pool used for image conversion
+        """
+        if self.HeaderThreads > 0:
+            yield from split_dispatch(
+                batches,
+                extract_func,
+                processes=self.processes,
+                threads=self.HeaderThreads,
+                is_header_task=self._is_header_task,
+            )
+            return
+        with Pool(self.processes) as p:
+            yield from p.imap_unordered(extract_func, batches)
+
+    def run_extraction(self, filelist, total_len):
+        meta_rows = ColumnBatch() if self.MetadataBatchSize > 0 else list()
+        extract_func = partial(
+            extract_columns if self.MetadataBatchSize > 0 else extract_batch,
+            print_images=self.print_images,
+            save_dir=self.img_destination,
+            config = self.config
+        )
+        proc = self._dispatch(filelist, extract_func)
+        self.journal.start()
+        if self.WriterQueueSize > 0:
+            # batches are serialized and written on a thread while results keep being collected
+            self.batch_writer = BackgroundBatchWriter(self._commit_meta_batch, self.WriterQueueSize)
+        pbar = tqdm(total=total_len)
+        try:
+            for dcm_metas in proc:
+                if isinstance(dcm_metas, ColumnBatch):
+                    self._collect_columns(dcm_metas, meta_rows)
+                    pbar.update(len(dcm_metas))
+                    if len(meta_rows) >= self.SaveBatchSize:
+                        self._write_meta_batch(meta_rows)
+                        meta_rows = ColumnBatch()
                     continue
-                meta_rows.append(dcm_meta)
+                # a series task returns the rows of all its slices
+                for dcm_meta in dcm_metas:
+                    perf = dcm_meta.pop("_perf", None)
+                    if perf is not None:
+                        self.perf_report.add(perf.pop("storage_class", StorageClass.OTHER), perf)
+                    status = FileStatus.FAILED if dcm_meta.get("err_code") else FileStatus.DONE
+                    for row in [dcm_meta] + self._duplicate_rows(dcm_meta):
+                        meta_rows.append(row)
+                        self.journal.record(row["file"], status, self.meta_counter)
+                pbar.update(len(dcm_metas))
                 if len(meta_rows) >= self.SaveBatchSize:
-                    meta_df = pd.DataFrame(meta_rows)
+                    self._write_meta_batch(meta_rows)
                     meta_rows = list()
-                    csv_destination = (
-                        f"{self.output_directory}/meta/metadata_{self.meta_counter}.csv"
-                    )
-                    self.meta_counter += 1
-                    meta_df.to_csv(csv_destination)
-        if meta_rows:
-            meta_df = pd.DataFrame(meta_rows)
-            meta_rows = list()
-            csv_destination = (
-                f"{self.output_directory}/meta/metadata_{self.meta_counter}.csv"
-            )
-            self.meta_counter += 1
-            meta_df.to_csv(csv_destination)
+                    if self.batch_writer is not None:
+                        pbar.set_postfix(writer_queue=self.batch_writer.queue.qsize())
+            if meta_rows:
+                self._write_meta_batch(meta_rows)
+        except BaseException:
+            # the extraction error is raised, not a writer error it may have caused
+            self._close_batch_writer(raise_error=False)
+            raise
+        self._close_batch_writer()
+        self.journal.close()
+        self._sync_journal()
 
-    def get_dicom_files(self):
+    def _collect_columns(self, batch: ColumnBatch, meta_rows: ColumnBatch):
+        """Adds the rows of a worker's ColumnBatch to meta_rows and records them in the journal"""
+        self.perf_report.merge(batch.perf)
+        files = batch.column("file")
+        err_codes = batch.column("err_code")
+        statuses = [FileStatus.FAILED if e else FileStatus.DONE for e in err_codes]
+        if self.duplicates:
+            for i in range(len(batch)):
+                for dup_path in self.duplicates.get(str(files[i]), ()):
+                    batch.copy_row(i, file=dup_path, duplicate_of=str(files[i]))
+                    statuses.append(statuses[i])
+            files = batch.column("file")
+        self.journal.record_many(zip(files, statuses), self.meta_counter)
+        meta_rows.extend(batch)
 
-        storage_d = defaultdict(list)
-        with Pool(self.processes) as P:
-            path_glob = Path(self.dicom_home).rglob("*.dcm")
-            if self.ApplyParentFilter: 
-                path_glob = self.filter_generator(path_glob)
-            proc = P.imap_unordered(read_and_categorize_dcm, path_glob)
-            for path, store_class in tqdm(proc, desc="Reading and categorizing DCMS"):
-                storage_d[store_class].append(path)
-        return storage_d
-
-    def filter_generator(self, path_generator):
-        seen_dirs = set()
-        for dcm_path in path_generator:
-            parent_path = str(dcm_path.parent)
-            if parent_path in seen_dirs:
-                continue
-            else:
-                seen_dirs.add(parent_path)
-                yield dcm_path
+    def _duplicate_rows(self, dcm_meta) -> List[dict]:
+        """Rows of the copies of an extracted file. They share its metadata and image_path"""
+        rows = list()
+        for dup_path in self.duplicates.get(str(dcm_meta["file"]), ()):
+            row = dict(dcm_meta)
+            row["file"] = dup_path
+            row["duplicate_of"] = str(dcm_meta["file"])
+            rows.append(row)
+        return rows
+
+    def _write_meta_batch(self, meta_rows):
+        """Hands a batch of metadata rows to the writer thread or writes it inline"""
+        batch_id = self.meta_counter
+        self.meta_counter += 1
+        if self.batch_writer is not None:
+            self.batch_writer.submit(meta_rows, batch_id)
+        else:
+            self._commit_meta_batch(meta_rows, batch_id)
 
-    def _write_filelist(self, filelist):
-        with open(self.pickle_file, "wb") as f:
-            pickle.dump(filelist, f)
+    def _close_batch_writer(self, raise_error=True):
+        """Batches already handed over are written even when the extraction fails"""
+        if self.batch_writer is None:
+            return
+        self.batch_writer.close(raise_error)
+        logging.info(f"Metadata writer {self.batch_writer.metrics}")
 
+    def _commit_meta_batch(self, meta_rows, batch_id):
+        """Writes a batch of metadata rows and commits their journal entries"""
+        self.meta_writer.write_batch(meta_rows, batch_id)
+        self.journal.commit(batch_id)
 
-def read_and_categorize_dcm(dcm_path: pathlib.Path):
-    sop_class_uid_tag = [0x0008, 0x0016]
-    dcm = pyd.dcmread(
-        dcm_path, stop_before_pixels=True, specific_tags=[sop_class_uid_tag]
-    )
-    sop_class_uid = dcm[sop_class_uid_tag].value
+    def update_index(self):
+        """
+        Walks DICOMHome with a pool of scandir threads and streams the found paths to the
+        workers in chunks of ScanBatchSize. Workers only read files that are new or whose
+        size/mtime changed since the last scan, files rewritten in place included
+        """
+        self.index.start_scan()
+        scanner = DicomTreeScanner(
+            self.dicom_home,
+            num_threads=self.ScanThreads,
+            one_per_dir=self.ApplyParentFilter,
+        )
+        work = self.index.iter_known_stats(scanner)
+        records = list()
+        with Pool(self.processes) as P:
+            read_func = partial(
+                read_dcm_record, shard_index=self.ShardIndex, shard_count=self.ShardCount
+            )
+            proc = P.imap_unordered(read_func, work, chunksize=self.ScanBatchSize)
+            pbar = tqdm(proc, desc="Reading and categorizing DCMS")
+            for i, record in enumerate(pbar):
+                records.append(record)
+                if len(records) >= self.ScanBatchSize:
+                    self.index.add_records(records)
+                    records = list()
+                    pbar.set_postfix(found_per_sec=f"{scanner.rate:.1f}")
+        self.index.add_records(records)
+        logging.info(f"Index status after scan {self.index.count_status()}")
+
+
+def categorize_sop_class(sop_class_uid) -> StorageClass:
     store_class = StorageClass.OTHER
     if sop_class_uid in _mr_tags:
         store_class = StorageClass.MRCT
@@ -232,13 +436,55 @@ def read_and_categorize_dcm(dcm_path: pathlib.Path):
         store_class = StorageClass.XRAY
     if sop_class_uid in _tomo_tags:
         store_class = StorageClass.TOMO
-    return dcm_path, store_class
+    return store_class
+
+
+def read_dcm_record(work_tup, shard_index=0, shard_count=1):
+    """
+    Builds the index record of a file. work_tup holds the path and the size/mtime known by the index.
+    Unchanged files are returned without a storage class so they are not read again. With
+    shard_count > 1 files of the studies of other shards are not categorized or fingerprinted, only
+    the beginning of their header is read to find their StudyInstanceUID
+    """
+    dcm_path, known_size, known_mtime = work_tup
+    record = {"path": str(dcm_path)}
+    try:
+        stat = os.stat(dcm_path)
+        record["size"] = stat.st_size
+        record["mtime"] = stat.st_mtime
+        if stat.st_size == known_size and stat.st_mtime == known_mtime:
+            return record
+        uids = read_dcm_uids(dcm_path)
+        record["study_uid"] = uids["StudyInstanceUID"]
+        if shard_count > 1 and record_shard(record, shard_count) != shard_index:
+            # indexed but never extracted
+            record["storage_class"] = None
+            record["status"] = FileStatus.OTHER_SHARD
+            return record
+        record["storage_class"] = categorize_sop_class(uids["SOPClassUID"])
+        record["series_uid"] = uids["SeriesInstanceUID"]
+        record["sop_uid"] = uids["SOPInstanceUID"]
+        record["fingerprint"] = file_fingerprint(dcm_path, stat.st_size)
+    except BaseException as error:
+        error_message = f"img:{dcm_path} produced error {error}"
+        logging.error(msg=error_message)
+        record["storage_class"] = None
+        record["status"] = FileStatus.UNREADABLE
+    return record
 
 
 def general_extract(work_tup, save_dir=None, print_images=None,config=None):
+    """Runs the processor of the storage class. Returns a list of metadata rows"""
     sop_tag, dcm_path = work_tup
     meta_row = None
     match sop_tag:
+        case StorageClass.MRCT if isinstance(dcm_path, list):
+            # a whole series is converted at once
+            rows = process_ctmri_series(
+                dcm_paths=dcm_path, save_dir=save_dir, print_images=print_images,config=config
+            )
+            rows[0]["_perf"]["storage_class"] = str(sop_tag)
+            return rows
         case StorageClass.MRCT:
             # call the mr CT processor
             meta_row = process_ctmri(
@@ -254,5 +500,47 @@ def general_extract(work_tup, save_dir=None, print_images=None,config=None):
                 dcm_path, save_dir=save_dir, print_images=print_images,config=config
             )
         case StorageClass.OTHER:
-            meta_row = process_general(dcm_path)
-    return meta_row
+            meta_row = process_general(dcm_path, config=config)
+    rows = [meta_row] if meta_row is not None else []
+    for row in rows:
+        if "_perf" in row:
+            row["_perf"]["storage_class"] = str(sop_tag)
+    return rows
+
+
+def chunked(iterable, size):
+    """Lists of up to size items of iterable"""
+    chunk = list()
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = list()
+    if chunk:
+        yield chunk
+
+
+def extract_columns(batch, save_dir=None, print_images=None, config=None):
+    """
+    extract_batch for metadata only runs. The rows come back as a single ColumnBatch with the
+    timings of the batch already aggregated, so a batch costs one small pickle instead of a
+    dict per file
+    """
+    columns = ColumnBatch()
+    for work_tup in batch:
+        for row in general_extract(work_tup, save_dir=save_dir, print_images=print_images, config=config):
+            perf = row.pop("_perf", None)
+            if perf is not None:
+                columns.perf.add(perf.pop("storage_class", StorageClass.OTHER), perf)
+            columns.append(row)
+    return columns
+
+
+def extract_batch(batch, save_dir=None, print_images=None, config=None):
+    """Runs general_extract on every task of a batch. Returns the metadata rows of all of them"""
+    rows = list()
+    for work_tup in batch:
+        rows.extend(
+            general_extract(work_tup, save_dir=save_dir, print_images=print_images, config=config)
+        )
+    return rows
@@ -0,0 +1,79 @@
+from typing import Dict, List
+
+import pandas as pd
+
+from .perf import PerfReport
+
+
+class ColumnBatch:
+    """
+    Metadata rows of a batch of files stored as columns, used to send the rows of metadata only
+    runs from the workers to the main process. The column names are sent once per batch instead
+    of once per row and the main process concatenates batches column by column without building
+    a dict per row.
+
+    columns: column names in order of first appearance
+    values: one list per column, None where a row has no value
+    perf: timings of the files of the batch, merged into the run's report by the main process.
+        Not combined by extend
+    """
+
+    def __init__(self) -> None:
+        self.columns: List[str] = []
+        self.values: List[list] = []
+        self._index: Dict[str, int] = {}
+        self.n_rows = 0
+        self.perf = PerfReport()
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def _column(self, name) -> list:
+        position = self._index.get(name)
+        if position is None:
+            position = self._index[name] = len(self.columns)
+            self.columns.append(name)
+            self.values.append([None] * self.n_rows)
+        return self.values[position]
+
+    def append(self, row: dict):
+        for name, value in row.items():
+            self._column(name).append(value)
+        self.n_rows += 1
+        # rows without some of the columns
+        for column in self.values:
+            if len(column) < self.n_rows:
+                column.append(None)
+
+    def column(self, name) -> list:
+        position = self._index.get(name)
+        return self.values[position] if position is not None else [None] * self.n_rows
+
+    def copy_row(self, row_index, **values):
+        """Appends a copy of a row with some of its values replaced"""
+        row = {name: column[row_index] for name, column in zip(self.columns, self.values)}
+        row.update(values)
+        self.append(row)
+
+    def extend(self, other: "ColumnBatch"):
+        """Appends the rows of other, the columns are aligned by name"""
+        for name, other_values in zip(other.columns, other.values):
+            self._column(name).extend(other_values)
+        self.n_rows += other.n_rows
+        for column in self.values:
+            if len(column) < self.n_rows:
+                column.extend([None] * (self.n_rows - len(column)))
+
+    def to_frame(self, dtype=None) -> pd.DataFrame:
+        """Same frame as pd.DataFrame(rows) of the rows of the batch"""
+        # a Series per column infers the dtypes like the rows do (ints with missing values are floats)
+        return pd.DataFrame(
+            {name: pd.Series(values, dtype=dtype) for name, values in zip(self.columns, self.values)}
+        )
+
+    def __getstate__(self):
+        return self.columns, self.values, self.n_rows, self.perf
+
+    def __setstate__(self, state):
+        self.columns, self.values, self.n_rows, self.perf = state
+        self._index = {name: i for i, name in enumerate(self.columns)}
@@ -0,0 +1,121 @@
+import json
+import logging
+import os
+import time
+
+import pydicom.uid as pyd_uid
+from pydicom import pixels as pyd_pixels
+from pydicom.pixels.decoders.base import get_decoder
+
+# uncompressed pixel data is read by pydicom itself, without a plugin
+NATIVE = "native"
+
+
+def transfer_syntax(ds) -> pyd_uid.UID:
+    """Transfer syntax of a dataset read from disk, implicit little endian without file meta"""
+    file_meta = getattr(ds, "file_meta", None)
+    uid = file_meta.get("TransferSyntaxUID", None) if file_meta is not None else None
+    return pyd_uid.UID(uid) if uid else pyd_uid.ImplicitVRLittleEndian
+
+
+def resolve_syntax(name) -> pyd_uid.UID:
+    """A transfer syntax UID or its pydicom keyword e.g. "JPEG2000Lossless" """
+    uid = getattr(pyd_uid, str(name), None)
+    if isinstance(uid, pyd_uid.UID) and uid.is_transfer_syntax:
+        return uid
+    if not str(name).replace(".", "").isdigit():
+        raise ValueError(f"{name} is not a known transfer syntax")
+    uid = pyd_uid.UID(str(name))
+    if not uid.is_valid or not uid.is_transfer_syntax:
+        raise ValueError(f"{name} is not a known transfer syntax")
+    return uid
+
+
+def load_decoder_preferences(value) -> dict:
+    """
+    Decoder preferences by transfer syntax UID, fastest first. value is a mapping of transfer syntax
+    (UID or keyword) to a plugin name or a list of them, or the path of a benchmarks.bench_decoders
+    result file whose ranking is used
+    """
+    if isinstance(value, str):
+        with open(os.path.expanduser(value)) as f:
+            value = json.load(f)["ranking"]
+    preferences = {}
+    for name, plugins in value.items():
+        plugins = [plugins] if isinstance(plugins, str) else list(plugins)
+        preferences[str(resolve_syntax(name))] = plugins
+    return preferences
+
+
+def decoder_candidates(uid, preferences=None) -> list:
+    """
+    Plugins tried in order for a transfer syntax: the preferred ones that are installed then the
+    other installed ones in pydicom's order. [None] lets pydicom raise its missing plugin error
+    """
+    uid = pyd_uid.UID(uid)
+    if not uid.is_compressed:
+        return [NATIVE]
+    try:
+        available = list(get_decoder(uid).available_plugins)
+    except NotImplementedError:
+        return [None]
+    preferred = [e for e in (preferences or {}).get(str(uid), []) if e in available]
+    return preferred + [e for e in available if e not in preferred] or [None]
+
+
+def decoding_options(plugin) -> dict:
+    return {"decoding_plugin": plugin} if plugin not in (None, NATIVE) else {}
+
+
+def _preferences(config):
+    return config.get("DecoderPlugins") if config else None
+
+
+def decode_pixels(ds, config=None, timer=None):
+    """
+    ds.pixel_array decoded with the preferred plugin of its transfer syntax. A plugin that fails
+    falls back to the next one. The array stays cached on ds so dicom2nifti and process_image
+    do not decode it again. The transfer syntax, plugin and decode time are recorded on timer
+    """
+    uid = transfer_syntax(ds)
+    candidates = decoder_candidates(uid, _preferences(config))
+    for i, plugin in enumerate(candidates):
+        ds.pixel_array_options(**decoding_options(plugin))
+        t_start = time.perf_counter()
+        try:
+            arr = ds.pixel_array
+        except Exception as error:
+            if i == len(candidates) - 1:
+                raise
+            logging.warning(f"{plugin} failed to decode {uid.name} ({error}), trying {candidates[i + 1]}")
+            continue
+        if timer is not None:
+            timer.decoded(uid, plugin, time.perf_counter() - t_start)
+        return arr
+
+
+def iter_frames(src, uid, indices, config=None, timer=None):
+    """
+    Frames of src decoded one at a time in the order of indices, see decode_pixels. A plugin that
+    fails restarts at the failing frame with the next one. The frames count as a single file
+    """
+    candidates = decoder_candidates(uid, _preferences(config))
+    position, elapsed = 0, 0.0
+    for i, plugin in enumerate(candidates):
+        try:
+            options = decoding_options(plugin)
+            frames = pyd_pixels.iter_pixels(src, indices=indices[position:], **options)
+            while position < len(indices):
+                t_start = time.perf_counter()
+                frame = next(frames)
+                elapsed += time.perf_counter() - t_start
+                position += 1
+                yield frame
+        except Exception as error:
+            if i == len(candidates) - 1:
+                raise
+            logging.warning(f"{plugin} failed to decode {uid.name} ({error}), trying {candidates[i + 1]}")
+            continue
+        if timer is not None:
+            timer.decoded(uid, plugin, elapsed)
+        return
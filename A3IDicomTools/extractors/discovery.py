@@ -0,0 +1,88 @@
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+
+def _scan_dir(dir_path: str, suffix: str, one_per_dir: bool):
+    """Scan a single directory. Returns the matching files and the subdirectories to walk next.
+    When one_per_dir is set we stop collecting files after the first match, entries that look like
+    dicom files are then skipped without a stat call.
+    """
+    files, subdirs = [], []
+    try:
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                is_candidate = entry.name.endswith(suffix)
+                if is_candidate and one_per_dir and files:
+                    continue
+                try:
+                    if entry.is_dir():
+                        # same behaviour as Path.rglob: don't walk into symlinked directories
+                        if not entry.is_symlink():
+                            subdirs.append(entry.path)
+                    elif is_candidate:
+                        files.append(entry.path)
+                except OSError:
+                    continue
+    except OSError as err:
+        logging.error(f"Could not scan {dir_path} produced error {err}")
+    return files, subdirs
+
+
+class DicomTreeScanner:
+    """Walks a directory tree concurrently and yields the dicom paths as they are found.
+    Every directory is scanned by a thread of the pool so large exports are walked in parallel
+    while the consumer is already processing the first paths.
+
+    root: str   directory to walk
+    num_threads: int  number of scandir threads
+    one_per_dir: bool  only yield the first dicom file of each directory (ApplyParentFilter)
+    """
+
+    def __init__(self, root, num_threads=8, one_per_dir=False, suffix=".dcm") -> None:
+        self.root = str(root)
+        self.num_threads = max(1, num_threads)
+        self.one_per_dir = one_per_dir
+        self.suffix = suffix
+        self.files_found = 0
+        self.dirs_scanned = 0
+        self.t_start = None
+        self.t_end = None
+
+    @property
+    def elapsed(self) -> float:
+        if self.t_start is None:
+            return 0.0
+        t_end = self.t_end if self.t_end is not None else time.time()
+        return t_end - self.t_start
+
+    @property
+    def rate(self) -> float:
+        """Files discovered per second"""
+        elapsed = self.elapsed
+        return self.files_found / elapsed if elapsed > 0 else 0.0
+
+    def __iter__(self):
+        self.t_start = time.time()
+        self.t_end = None
+        with ThreadPoolExecutor(self.num_threads) as ex:
+            pending = {ex.submit(_scan_dir, self.root, self.suffix, self.one_per_dir)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    files, subdirs = fut.result()
+                    self.dirs_scanned += 1
+                    for sub_dir in subdirs:
+                        pending.add(
+                            ex.submit(_scan_dir, sub_dir, self.suffix, self.one_per_dir)
+                        )
+                    for dcm_path in files:
+                        self.files_found += 1
+                        yield Path(dcm_path)
+        self.t_end = time.time()
+        logging.info(
+            f"Scanned {self.dirs_scanned} directories and found {self.files_found} files "
+            f"in {self.elapsed:.1f}s ({self.rate:.1f} files/sec)"
+        )
@@ -0,0 +1,73 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+
+_DONE = object()
+
+
+class _Failed:
+    def __init__(self, error) -> None:
+        self.error = error
+
+
+def split_dispatch(batches, func, processes, threads, is_header_task, max_in_flight=None):
+    """
+    Runs func on every batch of tasks and yields the results as they complete. Tasks for which
+    is_header_task is true run on a pool of threads (header I/O), the others on a pool of
+    processes (pixel decoding and compression). Both pools run at the same time and put their
+    results on a single queue. At most max_in_flight batches are queued so the task stream is
+    consumed lazily.
+    """
+    max_in_flight = max_in_flight or 2 * (processes + threads)
+    results = queue.Queue()
+    slots = threading.BoundedSemaphore(max_in_flight)
+    n_submitted = 0
+
+    def _thread_done(fut):
+        error = fut.exception()
+        results.put(_Failed(error) if error else fut.result())
+
+    with Pool(processes) as process_pool, ThreadPoolExecutor(threads) as thread_pool:
+
+        def _submit(tasks, header):
+            nonlocal n_submitted
+            slots.acquire()
+            n_submitted += 1
+            if header:
+                thread_pool.submit(func, tasks).add_done_callback(_thread_done)
+            else:
+                process_pool.apply_async(
+                    func,
+                    (tasks,),
+                    callback=results.put,
+                    error_callback=lambda error: results.put(_Failed(error)),
+                )
+
+        def _feed():
+            try:
+                for batch in batches:
+                    header_tasks = [e for e in batch if is_header_task(e)]
+                    image_tasks = [e for e in batch if not is_header_task(e)]
+                    if header_tasks:
+                        _submit(header_tasks, header=True)
+                    if image_tasks:
+                        _submit(image_tasks, header=False)
+            except BaseException as error:
+                results.put(_Failed(error))
+            results.put(_DONE)
+
+        feeder = threading.Thread(target=_feed, daemon=True)
+        feeder.start()
+        n_received, feeding = 0, True
+        while feeding or n_received < n_submitted:
+            result = results.get()
+            if result is _DONE:
+                feeding = False
+                continue
+            if isinstance(result, _Failed):
+                raise result.error
+            n_received += 1
+            slots.release()
+            yield result
+        feeder.join()
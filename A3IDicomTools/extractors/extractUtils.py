@@ -4,10 +4,15 @@ from typing import List
 import pydicom as pyd
 import numpy as np
 import hashlib
-import png
 from pydicom import valuerep as tagTypes
 from pydicom import multival as multivalTypes
 from pydicom import uid as UidTypes
+from pydicom.datadict import dictionary_VR, keyword_for_tag, tag_for_keyword
+from pydicom.tag import BaseTag
+from pydicom.dataelem import RawDataElement
+import struct
+
+from .image_encoders import write_png
 
 
 def get_dcms(dicom_home: str, group_volumes=False) -> List:
@@ -20,6 +25,46 @@ def get_dcms(dicom_home: str, group_volumes=False) -> List:
     return candidate_files
 
 
+_UID_TAGS = {
+    "SOPClassUID": 0x00080016,
+    "SOPInstanceUID": 0x00080018,
+    "StudyInstanceUID": 0x0020000D,
+    "SeriesInstanceUID": 0x0020000E,
+}
+
+
+def read_dcm_uids(dcm_path) -> dict:
+    """Read the sop class and the sop/study/series instance uids of a file. Parsing stops right
+    after SeriesInstanceUID so only the beginning of the header is read.
+    The sop class of the file meta group is preferred over the dataset one.
+    """
+    last_tag = max(_UID_TAGS.values())
+    with open(dcm_path, "rb") as f:
+        dcm = pyd.filereader.read_partial(
+            f,
+            stop_when=lambda tag, vr, length: tag > last_tag,
+            specific_tags=list(_UID_TAGS.values()),
+        )
+    uids = {k: str(dcm[tag].value) if tag in dcm else None for k, tag in _UID_TAGS.items()}
+    meta_sop_class = dcm.file_meta.get("MediaStorageSOPClassUID", None)
+    if meta_sop_class:
+        uids["SOPClassUID"] = str(meta_sop_class)
+    return uids
+
+
+def file_fingerprint(dcm_path, size, block_size=1 << 16) -> str:
+    """Cheap content fingerprint: hash of the size and of the first and last block_size bytes.
+    Copies of a file share it, a re-sent instance with different pixels or tags almost never does.
+    """
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(dcm_path, "rb") as f:
+        digest.update(f.read(block_size))
+        if size > 2 * block_size:
+            f.seek(-block_size, os.SEEK_END)
+        digest.update(f.read(block_size))
+    return digest.hexdigest()
+
+
 def proc_img(pix_arr: np.array, dcm_path: str, dcm_tags: dict, config: dict):
     im_name = os.path.split(dcm_path)[1]
     im_name = os.path.splitext(im_name)[0]
@@ -51,10 +96,7 @@ def proc_img(pix_arr: np.array, dcm_path: str, dcm_tags: dict, config: dict):
 
 
 def write_grayscale(arr, png_path):
-    shape = arr.shape
-    with open(png_path, "wb") as png_file:
-        w = png.Writer(shape[1], shape[0], greyscale=True, bitdepth=16)
-        w.write(png_file, arr)
+    write_png(png_path, arr, bit_depth=16)
 
 
 def img_handling(arr: np.array, png_file: str):
@@ -124,6 +166,239 @@ def extract_all_tags(dcm, tag_prefix="", extract_nested=True):
     return tag_d
 
 
+_PIXEL_DATA_TAG = 0x7FE00010
+_SEQUENCE_VR = "SQ"
+_INT_VRS = {"IS", "SL", "SS", "SV", "UL", "US", "UV"}
+_FLOAT_VRS = {"DS", "FD", "FL"}
+# text VRs that are always ascii and VRs whose decoding depends on the character set
+_ASCII_VRS = {"AE", "AS", "CS", "DA", "DS", "DT", "IS", "TM", "UI"}
+_CHARSET_VRS = {"LO", "PN", "SH", "UC"}
+_SINGLE_TEXT_VRS = {"LT", "ST", "UT"}  # backslash is not a value delimiter for these
+_BINARY_FORMATS = {"US": "H", "UL": "I", "SS": "h", "SL": "i", "FL": "f", "FD": "d"}
+_SIMPLE_ENCODINGS = {
+    None: "latin_1",
+    "": "latin_1",
+    "ISO_IR 6": "latin_1",
+    "ISO_IR 100": "latin_1",
+    "ISO_IR 192": "utf_8",
+}
+# returned by _fast_value when the element needs the regular pydicom conversion
+_SLOW = object()
+
+
+def convert_value(vr, value):
+    """Converts a single valued element by its VR. Multi valued elements are kept as text"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, multivalTypes.MultiValue):
+        return str(value)
+    if vr in _INT_VRS:
+        return int(value)
+    if vr in _FLOAT_VRS:
+        return float(value)
+    return str(value)
+
+
+def _fast_value(raw, encoding):
+    """
+    Decodes single valued raw elements straight from their bytes. Anything else (multi values,
+    implicit VR, deferred values, other character sets, unparsable values) takes the pydicom path
+    so the behaviour of fix_mismatch and of the value representations is kept.
+    """
+    vr = raw.VR
+    value = raw.value
+    if value is None or vr is None:
+        return _SLOW
+    if not value:
+        return None
+    if vr in _BINARY_FORMATS:
+        fmt = _BINARY_FORMATS[vr]
+        if len(value) != struct.calcsize(fmt):
+            return _SLOW
+        return struct.unpack(("<" if raw.is_little_endian else ">") + fmt, value)[0]
+    if vr in _SINGLE_TEXT_VRS:
+        if encoding is None:
+            return _SLOW
+        return value.decode(encoding).rstrip(" \x00") or None
+    if vr in _ASCII_VRS or (vr in _CHARSET_VRS and encoding is not None):
+        if b"\\" in value:
+            return _SLOW
+        text = value.decode(encoding or "latin_1").strip(" \x00")
+        if not text:
+            return None
+        try:
+            if vr == "IS":
+                return int(text)
+            if vr == "DS":
+                return float(text)
+        except ValueError:
+            return _SLOW
+        return text
+    return _SLOW
+
+
+_UNDEFINED_LENGTH = 0xFFFFFFFF
+_TEXT_VRS = _ASCII_VRS | _CHARSET_VRS | _SINGLE_TEXT_VRS | {"UR"}
+_READ_CHUNK = 1 << 20
+OVERSIZED_MODES = ("hash", "size", "truncate")
+
+
+def _raw_vr(raw):
+    if raw.VR is not None:
+        return raw.VR
+    try:
+        return dictionary_VR(raw.tag)
+    except KeyError:
+        return "UN"
+
+
+def _is_oversized(raw, max_value_bytes) -> bool:
+    """Raw elements longer than max_value_bytes. Sequences are flattened item by item instead"""
+    if _raw_vr(raw) == _SEQUENCE_VR or raw.length == _UNDEFINED_LENGTH:
+        return False
+    length = len(raw.value) if raw.value is not None else raw.length
+    return length > max_value_bytes
+
+
+def _iter_raw_bytes(dcm, raw, limit):
+    """
+    Streams up to limit bytes of a raw element. Values deferred by dcmread(defer_size=...) are read
+    from the file in chunks so they are never held in memory as a whole
+    """
+    if raw.value is not None:
+        yield raw.value[:limit]
+        return
+    with open(dcm.filename, "rb") as f:
+        f.seek(raw.value_tell)
+        remaining = min(limit, raw.length)
+        while remaining > 0:
+            chunk = f.read(min(_READ_CHUNK, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _oversized_value(dcm, raw, encoding, max_value_bytes, mode):
+    """
+    Replaces the value of an oversized element.
+    hash: "<N bytes blake2b:...>", size: "<N bytes>", truncate: the first max_value_bytes bytes of
+    text values, the first max_value_bytes // 2 bytes of binary values as hex
+    """
+    length = len(raw.value) if raw.value is not None else raw.length
+    if mode == "truncate":
+        if _raw_vr(raw) in _TEXT_VRS:
+            head = b"".join(_iter_raw_bytes(dcm, raw, max_value_bytes))
+            # a character cut in half is dropped so the value stays within max_value_bytes
+            return head.decode(encoding or "latin_1", errors="ignore").strip(" \x00")
+        return b"".join(_iter_raw_bytes(dcm, raw, max_value_bytes // 2)).hex()
+    if mode == "hash":
+        digest = hashlib.blake2b(digest_size=16)
+        for chunk in _iter_raw_bytes(dcm, raw, length):
+            digest.update(chunk)
+        return f"<{length} bytes blake2b:{digest.hexdigest()}>"
+    return f"<{length} bytes>"
+
+
+def _cap_value(value, max_value_bytes, mode):
+    """Same as _oversized_value for values that were already converted by pydicom"""
+    if not isinstance(value, str):
+        return value
+    data = value.encode("utf_8", errors="replace")
+    if len(data) <= max_value_bytes:
+        return value
+    if mode == "truncate":
+        return data[:max_value_bytes].decode("utf_8", errors="ignore")
+    if mode == "hash":
+        return f"<{len(data)} bytes blake2b:{hashlib.blake2b(data, digest_size=16).hexdigest()}>"
+    return f"<{len(data)} bytes>"
+
+
+def resolve_tags(names) -> List[BaseTag]:
+    """
+    Converts a list of keywords (PatientID) or hex tags (00100020, 0x00100020, (0010,0020))
+    to pydicom tags. Raises ValueError for names that are neither.
+    """
+    tags = []
+    for name in names:
+        name = str(name).strip()
+        tag = tag_for_keyword(name)
+        if tag is None:
+            hex_tag = name.replace("(", "").replace(")", "").replace(",", "").lower()
+            hex_tag = hex_tag[2:] if hex_tag.startswith("0x") else hex_tag
+            if len(hex_tag) != 8:
+                raise ValueError(f"{name} is not a dicom keyword or tag")
+            try:
+                tag = int(hex_tag, 16)
+            except ValueError:
+                raise ValueError(f"{name} is not a dicom keyword or tag") from None
+        tags.append(BaseTag(tag))
+    return tags
+
+
+def extract_tags(
+    dcm,
+    tag_prefix="",
+    extract_nested=True,
+    public_only=True,
+    out=None,
+    encoding="",
+    tags=None,
+    max_value_bytes=0,
+    oversized="hash",
+):
+    """
+    Flattens the elements of dcm into a dictionary keyed by keyword. Elements are visited by tag,
+    private tags are skipped before their value is parsed when public_only is set and sequence
+    items are written straight into the output dict using the sequence keyword as prefix.
+    Common single valued elements are decoded from their raw bytes by VR, the rest goes through
+    pydicom. Private tags are keyed by their hex tag (e.g. 00091001).
+    The items of a sequence are flattened in order into the same keys, a key holds the value of the
+    last item that has it (e.g. the last frame of PerFrameFunctionalGroupsSequence).
+    tags: only these top level tags are extracted (SpecificHeadersOnly), sequences are kept whole
+    max_value_bytes: values longer than this are replaced according to oversized (see
+        _oversized_value) without being parsed. Deferred values are not loaded. 0 keeps every value
+    """
+    tag_d = {} if out is None else out
+    if encoding == "":
+        char_set = dcm.get(0x00080005, None)
+        char_set = char_set.value if char_set else None
+        # multiple character sets (code extensions) are left to pydicom
+        encoding = _SIMPLE_ENCODINGS.get(char_set) if not isinstance(char_set, list) else None
+    for tag in dcm.keys() if tags is None else [e for e in tags if e in dcm]:
+        if tag == _PIXEL_DATA_TAG or (public_only and tag.is_private):
+            continue
+        try:
+            keyword = keyword_for_tag(tag) or (f"{tag:08X}" if tag.is_private else "")
+            if not keyword:
+                continue
+            elem = dcm.get_item(tag, keep_deferred=True)
+            value = _SLOW
+            if isinstance(elem, RawDataElement):
+                if max_value_bytes and _is_oversized(elem, max_value_bytes):
+                    value = _oversized_value(dcm, elem, encoding, max_value_bytes, oversized)
+                else:
+                    value = _fast_value(elem, encoding)
+            if value is _SLOW:
+                elem = dcm[tag]
+                if elem.VR == _SEQUENCE_VR:
+                    if extract_nested:
+                        for item in elem.value:
+                            extract_tags(
+                                item, keyword, extract_nested, public_only, tag_d, encoding,
+                                max_value_bytes=max_value_bytes, oversized=oversized,
+                            )
+                    continue
+                value = convert_value(elem.VR, elem.value)
+                if max_value_bytes:
+                    value = _cap_value(value, max_value_bytes, oversized)
+        except:
+            continue
+        key_name = f"{tag_prefix}_{keyword}" if tag_prefix else keyword
+        tag_d[key_name] = value
+    return tag_d
+
+
 def proc_tag(tag):
     match tag:
         case tagTypes.PersonName:
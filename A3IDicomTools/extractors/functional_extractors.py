@@ -5,13 +5,21 @@ from pydicom import pixels as pyd_pixels
 import numpy as np
 import hashlib
 import os
-import png
-from .extractUtils import extract_all_tags
+from .image_encoders import encode_png
+from .perf import StageTimer
+from .decoders import decode_pixels, iter_frames, transfer_syntax
+from .volume_writers import VolumeStreamWriter, stub_volume, volume_extension, write_volume
+from .extractUtils import extract_tags, resolve_tags
+from functools import lru_cache
 from enum import Enum
+from dicom2nifti import common as d2n_common
+from dicom2nifti import settings as d2n_settings
 from dicom2nifti.common import multiframe_create_affine
 import nibabel as nib
 from .extractUtils import get_window_param as get_window_fallback
 from dicom2nifti.convert_dicom import dicom_array_to_nifti
+from dicom2nifti import image_reorientation
+from dicom2nifti.image_volume import ImageVolume
 import dicom2nifti 
 dicom2nifti.disable_resampling()
 
@@ -39,33 +47,186 @@ def make_hashpath(dcm, dcm_path, save_dir, extension):
     return save_path
 
 
-def process_general(dcm_path):
-    dcm = pyd.dcmread(dcm_path, stop_before_pixels=True)
-    dcm_tags = extract_all_tags(dcm, extract_nested=True)
+# tags every reader needs to name its outputs, read on top of SpecificHeadersOnly
+_NAMING_TAGS = resolve_tags(["PatientID", "StudyInstanceUID", "SeriesInstanceUID", "SOPInstanceUID"])
+# tags needed to decode, window and orient the pixel data
+_IMAGE_TAGS = _NAMING_TAGS + resolve_tags(
+    [
+        "SOPClassUID",
+        "Modality",
+        "Manufacturer",
+        "ImageType",
+        "InstanceNumber",
+        "Rows",
+        "Columns",
+        "SamplesPerPixel",
+        "PhotometricInterpretation",
+        "PlanarConfiguration",
+        "BitsAllocated",
+        "BitsStored",
+        "HighBit",
+        "PixelRepresentation",
+        "NumberOfFrames",
+        "RescaleSlope",
+        "RescaleIntercept",
+        "RescaleType",
+        "ModalityLUTSequence",
+        "VOILUTSequence",
+        "WindowCenter",
+        "WindowWidth",
+        "VOILUTFunction",
+        "PixelSpacing",
+        "SliceThickness",
+        "SpacingBetweenSlices",
+        "ImageOrientationPatient",
+        "ImagePositionPatient",
+        "SharedFunctionalGroupsSequence",
+        "PerFrameFunctionalGroupsSequence",
+        "ExtendedOffsetTable",
+        "ExtendedOffsetTableLengths",
+        "PixelData",
+    ]
+)
+
+
+def _png_compression(config):
+    return config.get("PngCompressionLevel", 6) if config else 6
+
+
+def _volume_codec(config):
+    return config.get("VolumeCodec", "gzip") if config else "gzip"
+
+
+def _write_volume(nii, nifti_path, config, timer=None):
+    """Writes a nifti volume with the configured codec, returns the encode stats"""
+    if not config:
+        return write_volume(nii, nifti_path, timer=timer)
+    return write_volume(
+        nii,
+        nifti_path,
+        codec=_volume_codec(config),
+        level=config.get("VolumeCompressionLevel", 1),
+        threads=config.get("VolumeCompressThreads", 1),
+        timer=timer,
+    )
+
+
+def _volume_stream(nii, nifti_path, config, timer=None):
+    """VolumeStreamWriter with the configured codec"""
+    return VolumeStreamWriter(
+        nii,
+        nifti_path,
+        codec=_volume_codec(config),
+        level=config.get("VolumeCompressionLevel", 1),
+        threads=config.get("VolumeCompressThreads", 1),
+        timer=timer,
+    )
+
+
+def _public_only(config):
+    return config["PublicHeadersOnly"] if config else True
+
+
+def _extract_nested(config):
+    return config.get("ExtractNested", True) if config else True
+
+
+def _value_cap(config):
+    """extract_tags arguments bounding the size of the extracted values (MaxTagValueBytes)"""
+    if not config:
+        return {}
+    return {
+        "max_value_bytes": config.get("MaxTagValueBytes", 0),
+        "oversized": config.get("OversizedTagValues", "hash"),
+    }
+
+
+def _defer_size(config):
+    """Header only reads leave values above MaxTagValueBytes on disk until they are needed"""
+    max_value_bytes = config.get("MaxTagValueBytes", 0) if config else 0
+    return max_value_bytes or None
+
+
+@lru_cache(maxsize=None)
+def _resolve_specific(names):
+    return tuple(resolve_tags(names))
+
+
+def _specific_tags(config):
+    """Tags listed in SpecificHeadersOnly or None when every tag is extracted"""
+    names = config.get("SpecificHeadersOnly") if config else None
+    return _resolve_specific(tuple(names)) if names else None
+
+
+def _read_tags(specific, with_pixels):
+    """Tags to read from disk. The pipeline's own tags are added to the requested ones"""
+    if specific is None:
+        return None
+    return list(specific) + (_IMAGE_TAGS if with_pixels else _NAMING_TAGS)
+
+
+def process_general(dcm_path, config=None):
+    timer = StageTimer()
+    specific = _specific_tags(config)
+    with timer.stage("read"):
+        dcm = pyd.dcmread(
+            dcm_path,
+            stop_before_pixels=True,
+            specific_tags=specific,
+            defer_size=_defer_size(config),
+        )
+    with timer.stage("tags"):
+        dcm_tags = extract_tags(
+            dcm,
+            extract_nested=_extract_nested(config),
+            public_only=_public_only(config),
+            tags=specific,
+            **_value_cap(config),
+        )
+    timer.add("bytes_read", os.path.getsize(dcm_path))
     dcm_tags["file"] = dcm_path
+    dcm_tags["TransferSyntaxUID"] = str(transfer_syntax(dcm))
     dcm_tags["erro_code"] = 0
+    dcm_tags["_perf"] = timer.perf
     return dcm_tags
 
 
 def process_png(dcm_path, save_dir, print_images,config=None):
     stop_before_pixels = False if print_images else True
-    dcm = pyd.dcmread(dcm_path, stop_before_pixels=stop_before_pixels)
-    dcm_tags = extract_all_tags(dcm, extract_nested=True)
+    timer = StageTimer()
+    specific = _specific_tags(config)
+    with timer.stage("read"):
+        dcm = pyd.dcmread(
+            dcm_path,
+            stop_before_pixels=stop_before_pixels,
+            specific_tags=_read_tags(specific, print_images),
+            defer_size=None if print_images else _defer_size(config),
+        )
+    with timer.stage("tags"):
+        dcm_tags = extract_tags(
+            dcm,
+            extract_nested=_extract_nested(config),
+            public_only=_public_only(config),
+            tags=specific,
+            **_value_cap(config),
+        )
+    timer.add("bytes_read", os.path.getsize(dcm_path))
     err_code = 0
     if print_images:
         try:
             png_path = make_hashpath(dcm, dcm_path, save_dir, extension=".png")
-            image_2d_scaled, arr_shape, isRGB, bit_depth = process_image(dcm)
-            with open(png_path, "wb") as png_file:
-                if isRGB:
-                    image_2d_scaled = rgb_store_format(image_2d_scaled)
-                    greyscale = False
-                else:
-                    greyscale = True
-                w = png.Writer(
-                    arr_shape[1], arr_shape[0], greyscale=greyscale, bitdepth=bit_depth
+            with timer.stage("decode"):
+                # cached on the dataset, process_image does not decode again
+                decode_pixels(dcm, config, timer)
+            with timer.stage("encode"):
+                image_2d_scaled, arr_shape, isRGB, bit_depth = process_image(dcm)
+                png_bytes = encode_png(
+                    image_2d_scaled, bit_depth, compression_level=_png_compression(config)
                 )
-                w.write(png_file, image_2d_scaled)
+            with timer.stage("write"):
+                with open(png_path, "wb") as png_file:
+                    png_file.write(png_bytes)
+            timer.add("bytes_written", len(png_bytes))
         except BaseException as error:
             error_message = f"img:{dcm_path} produced error {error}"
             logging.error(msg=error_message)
@@ -77,32 +238,74 @@ def process_png(dcm_path, save_dir, print_images,config=None):
     dcm_tags["image_path"] = png_path
     dcm_tags["err_code"] = err_code
     dcm_tags["file"] = dcm_path
+    dcm_tags["TransferSyntaxUID"] = str(transfer_syntax(dcm))
+    dcm_tags["_perf"] = timer.perf
     if "Pixel Data" in dcm_tags:
         del dcm_tags["Pixel Data"]
     return dcm_tags
 
 
 def process_tomo(dcm_path, save_dir, print_images,reorient=False,config=None):
-    stop_before_pixels = False if print_images else True
-    dcm = pyd.dcmread(dcm_path, stop_before_pixels=stop_before_pixels)
-    dcm_tags = extract_all_tags(dcm, extract_nested=True)
-    nifti_path = make_hashpath(dcm, dcm_path, save_dir, extension=".nii.gz")
+    # frames are streamed from disk, the pixel data is only loaded when the volume needs dicom2nifti
+    stream_frames = print_images and config.get("StreamTomoFrames", True) and not config["Reorient"]
+    stop_before_pixels = stream_frames or not print_images
+    timer = StageTimer()
+    specific = _specific_tags(config)
+    with timer.stage("read"):
+        dcm = pyd.dcmread(
+            dcm_path,
+            stop_before_pixels=stop_before_pixels,
+            specific_tags=_read_tags(specific, print_images),
+            defer_size=None if print_images else _defer_size(config),
+        )
+    with timer.stage("tags"):
+        dcm_tags = extract_tags(
+            dcm,
+            extract_nested=_extract_nested(config),
+            public_only=_public_only(config),
+            tags=specific,
+            **_value_cap(config),
+        )
+    timer.add("bytes_read", os.path.getsize(dcm_path))
+    nifti_path = make_hashpath(
+        dcm, dcm_path, save_dir, extension=volume_extension(_volume_codec(config))
+    )
     err_code = 0 
+    encode_stats = {}
     apply_voi= config['ApplyVOILUT'] 
     reorient = config['Reorient'] 
-    if print_images:
+    verify_laterality = config.get("VerifyLaterality", False)
+    layout = _tomo_stream_layout(dcm) if stream_frames else None
+    if print_images and layout is not None:
+        try:
+            encode_stats = _stream_tomo(
+                dcm, dcm_path, dcm_tags, nifti_path, layout, apply_voi, verify_laterality, config, timer
+            )
+        except BaseException as error:
+            error_message = f"img:{dcm_path} produced error {error}"
+            logging.error(msg=error_message)
+            nifti_path = None
+            err_code = 1
+    elif print_images:
         try: 
-            #use the dicom2nifti processing 
-            out_info = _dicomnifti_proc([dcm],output_file=nifti_path,reorient_nifti=reorient)
-            # use the dicom2nifti outputs to then apply windowing 
-            #the first call alread handles saving the image so no need to reload
-            if apply_voi: 
-                og_vol = out_info['NII'] 
-                arr = og_vol.get_fdata() 
-                arr = apply_window(arr,dcm,dcm_tags)  
-                #save windowed image using the dicom2nifti modifications 
-                new_vol = nib.nifti1.Nifti1Image(arr,affine=og_vol.affine,header=og_vol.header) 
-                nib.save(new_vol,nifti_path)
+            if stop_before_pixels:
+                with timer.stage("read"):
+                    dcm = pyd.dcmread(dcm_path, specific_tags=_read_tags(specific, True))
+            # the volume and affine are built in memory and written once
+            with timer.stage("decode"):
+                decode_pixels(dcm, config, timer)
+                out_info = _dicomnifti_proc([dcm],output_file=None,reorient_nifti=reorient)
+                vol = out_info['NII']
+                if apply_voi or verify_laterality:
+                    # windowing is done in place in the native dtype of the volume
+                    arr = np.asanyarray(vol.dataobj)
+                    if apply_voi:
+                        arr = apply_window(arr,dcm,dcm_tags)
+                    if verify_laterality:
+                        # the nifti volume is (columns, rows, frames), verify_lat expects frames first
+                        arr = verify_lat(dcm, arr.T).T
+                    vol = nib.nifti1.Nifti1Image(arr,affine=vol.affine,header=vol.header)
+            encode_stats = _write_volume(vol, nifti_path, config, timer)
         except BaseException as error:
             error_message = f"img:{dcm_path} produced error {error}"
             logging.error(msg=error_message)
@@ -113,6 +316,9 @@ def process_tomo(dcm_path, save_dir, print_images,reorient=False,config=None):
     dcm_tags["image_path"] = nifti_path
     dcm_tags["err_code"] = err_code
     dcm_tags["file"] = dcm_path
+    dcm_tags["TransferSyntaxUID"] = str(transfer_syntax(dcm))
+    dcm_tags.update(encode_stats)
+    dcm_tags["_perf"] = timer.perf
     if "Pixel Data" in dcm_tags:
         del dcm_tags["Pixel Data"]
     return dcm_tags
@@ -120,18 +326,42 @@ def process_tomo(dcm_path, save_dir, print_images,reorient=False,config=None):
 
 
 def process_ctmri(dcm_path, save_dir, print_images,config=None):
-    stop_before_pixels = False if print_images else True
-    dcm = pyd.dcmread(dcm_path, stop_before_pixels=stop_before_pixels)
+    timer = StageTimer()
+    specific = _specific_tags(config)
+    # dicom2nifti reads the series from disk on its own
+    with timer.stage("read"):
+        dcm = pyd.dcmread(
+            dcm_path,
+            stop_before_pixels=True,
+            specific_tags=_read_tags(specific, False),
+            defer_size=_defer_size(config),
+        )
     dcm_dir = os.path.split(dcm_path)[0]
-    dcm_tags = extract_all_tags(dcm, extract_nested=False)
-    nifti_path = make_hashpath(dcm, dcm_path, save_dir, extension=".nii.gz")
+    with timer.stage("tags"):
+        dcm_tags = extract_tags(
+            dcm,
+            extract_nested=False,
+            public_only=_public_only(config),
+            tags=specific,
+            **_value_cap(config),
+        )
+    timer.add("bytes_read", os.path.getsize(dcm_path))
+    nifti_path = make_hashpath(
+        dcm, dcm_path, save_dir, extension=volume_extension(_volume_codec(config))
+    )
     err_code = 0
+    encode_stats = {}
     reorient = config['Reorient'] 
     if print_images:
         try:
-            dicom2nifti.dicom_series_to_nifti(
-                dcm_dir, nifti_path, reorient_nifti=reorient
-            )  # TODO: Make reorientation an option
+            with timer.stage("decode"):
+                # dicom2nifti can only reorient an image it writes to a file
+                out_info = dicom2nifti.dicom_series_to_nifti(
+                    dcm_dir, output_file=None, reorient_nifti=False
+                )
+                if reorient:
+                    out_info["NII"] = reorient_volume(out_info["NII"])
+            encode_stats = _write_volume(out_info["NII"], nifti_path, config, timer)
         except BaseException as error:
             error_message = f"img:{dcm_path} produced error {error}"
             logging.error(msg=error_message)
@@ -147,13 +377,88 @@ def process_ctmri(dcm_path, save_dir, print_images,config=None):
     dcm_tags["image_path"] = nifti_path
     dcm_tags["err_code"] = err_code
     dcm_tags["file"] = dcm_path
+    dcm_tags["TransferSyntaxUID"] = str(transfer_syntax(dcm))
+    dcm_tags.update(encode_stats)
+    dcm_tags["_perf"] = timer.perf
     if "Pixel Data" in dcm_tags:
         del dcm_tags["Pixel Data"]
     return dcm_tags
 
 
+def process_ctmri_series(dcm_paths, save_dir, print_images, config=None):
+    """
+    Converts a whole CT/MR series with a single dicom2nifti call and returns one metadata row per slice.
+    Every slice is read once, when images are saved the pixel data is deferred so it is only loaded
+    while the volume is built.
+    """
+    dcm_paths = sorted(dcm_paths, key=str)
+    timer = StageTimer(n_files=len(dcm_paths))
+    specific = _specific_tags(config)
+    with timer.stage("read"):
+        if print_images:
+            # the vendor specific MR conversions of dicom2nifti rely on private tags, the whole
+            # header is read and only the output is restricted to SpecificHeadersOnly
+            dcms = [pyd.dcmread(e, defer_size="512 KB") for e in dcm_paths]
+        else:
+            dcms = [
+                pyd.dcmread(
+                    e,
+                    stop_before_pixels=True,
+                    specific_tags=_read_tags(specific, False),
+                    defer_size=_defer_size(config),
+                )
+                for e in dcm_paths
+            ]
+    with timer.stage("tags"):
+        rows = [
+            extract_tags(
+                dcm,
+                extract_nested=False,
+                public_only=_public_only(config),
+                tags=specific,
+                **_value_cap(config),
+            )
+            for dcm in dcms
+        ]
+    timer.add("bytes_read", sum(os.path.getsize(e) for e in dcm_paths))
+    # named after the series so converting it again after more slices arrived replaces the volume
+    series_key = dcms[0].get("SeriesInstanceUID") or dcm_paths[0]
+    nifti_path = make_hashpath(
+        dcms[0], series_key, save_dir, extension=volume_extension(_volume_codec(config))
+    )
+    err_code = 0
+    encode_stats = {}
+    reorient = config['Reorient']
+    if print_images:
+        try:
+            with timer.stage("decode"):
+                for dcm in dcms:
+                    decode_pixels(dcm, config, timer)
+                out_info = _dicomnifti_proc(dcms, output_file=None, reorient_nifti=reorient)
+            encode_stats = _write_volume(out_info["NII"], nifti_path, config, timer)
+        except BaseException as error:
+            error_message = f"img:{dcm_paths[0]} produced error {error}"
+            logging.error(msg=error_message)
+            nifti_path = None
+            err_code = 1
+    else:
+        nifti_path = None
+    for dcm_tags, dcm_path, dcm in zip(rows, dcm_paths, dcms):
+        dcm_tags["image_path"] = nifti_path
+        dcm_tags["err_code"] = err_code
+        dcm_tags["file"] = dcm_path
+        dcm_tags["TransferSyntaxUID"] = str(transfer_syntax(dcm))
+        dcm_tags.update(encode_stats)
+        if "Pixel Data" in dcm_tags:
+            del dcm_tags["Pixel Data"]
+    # the timings cover the whole series and are reported once
+    rows[0]["_perf"] = timer.perf
+    return rows
+
+
 def rgb_store_format(arr):
-    """Create a  list containing pixels  in format expected by pypng
+    """Create a  list containing pixels  in format expected by pypng.
+    Only needed when writing through png.Writer, process_png uses image_encoders.encode_png
     arr: numpy array to be modified.
 
     We create an array such that an  nxmx3  matrix becomes a list of n elements.
@@ -168,28 +473,84 @@ def rgb_store_format(arr):
     return flat_out
 
 
+def _window_range(ds):
+    """Output range of the windowing operation, same as pydicom's apply_windowing"""
+    if ds.get("ModalityLUTSequence"):
+        y_min, y_max = 0, 2 ** ds.ModalityLUTSequence[0].LUTDescriptor[2] - 1
+    elif ds.PixelRepresentation == 0:
+        y_min, y_max = 0, 2**ds.BitsStored - 1
+    else:
+        y_min, y_max = -(2 ** (ds.BitsStored - 1)), 2 ** (ds.BitsStored - 1) - 1
+    slope = ds.get("RescaleSlope", None)
+    intercept = ds.get("RescaleIntercept", None)
+    if slope is not None and intercept is not None:
+        y_min = y_min * float(slope) + float(intercept)
+        y_max = y_max * float(slope) + float(intercept)
+    return y_min, y_max
+
+
+def _window_linear(arr, ds):
+    """
+    LINEAR/LINEAR_EXACT windowing of the first window as a clipped linear ramp computed in place
+    in a single float32 buffer. Returns None when pydicom has to handle the VOI transform
+    (VOI LUT sequence, SIGMOID, no window)
+    """
+    if ds.get("VOILUTSequence") or "WindowCenter" not in ds or "WindowWidth" not in ds:
+        return None
+    if ds.get("PhotometricInterpretation") not in ("MONOCHROME1", "MONOCHROME2"):
+        return None
+    voi_func = str(ds.get("VOILUTFunction", "LINEAR")).upper()
+    if voi_func not in ("LINEAR", "LINEAR_EXACT"):
+        return None
+    center, width = ds["WindowCenter"], ds["WindowWidth"]
+    center = float(center.value[0] if center.VM > 1 else center.value)
+    width = float(width.value[0] if width.VM > 1 else width.value)
+    if voi_func == "LINEAR":
+        center, width = center - 0.5, width - 1
+    if width <= 0:
+        return None
+    y_min, y_max = _window_range(ds)
+    out = arr.astype(np.float32)
+    out -= center
+    out *= (y_max - y_min) / width
+    out += 0.5 * (y_max - y_min) + y_min
+    np.clip(out, y_min, y_max, out=out)
+    return out
+
+
 def process_image(ds, is16Bit=True):
-    try:
-        isRGB = ds.PhotometricInterpretation.value == "RGB"
-    except:
-        isRGB = False
-    image_2d = ds.pixel_array
-    image_2d = pyd_pixels.apply_voi_lut(image_2d, ds, prefer_lut=True)
-    image_2d = image_2d.astype(float)
-    shape = ds.pixel_array.shape
+    """
+    Decodes the pixel data once, applies the VOI LUT/windowing and rescales the image to
+    [0, 2**16-1] (or [0, 255]) with respect to its maximum.
+    Linear windows are applied in a float32 buffer that is rescaled in place. Images without a
+    window of up to 16 bits are rescaled with exact integer arithmetic in a single uint32 buffer.
+    """
+    isRGB = ds.get("SamplesPerPixel", 1) == 3
+    decoded = ds.pixel_array
+    shape = decoded.shape
+    image_2d = _window_linear(decoded, ds)
+    if image_2d is None:
+        image_2d = pyd_pixels.apply_voi_lut(decoded, ds, prefer_lut=True)
     if is16Bit:
         # write the PNG file as a 16-bit greyscale
-        image_2d_scaled = (np.maximum(image_2d, 0) / image_2d.max()) * (2**16 - 1)
-        # # Convert to uint
-        image_2d_scaled = np.uint16(image_2d_scaled)
-        bit_depth = 16
+        out_max, out_dtype, bit_depth = 2**16 - 1, np.uint16, 16
+    else:
+        out_max, out_dtype, bit_depth = 255, np.uint8, 8
+    image_max = image_2d.max()
+    if image_max <= 0:
+        return np.zeros(shape, dtype=out_dtype), shape, isRGB, bit_depth
+    if image_2d.dtype.kind in "iu" and image_2d.dtype.itemsize <= 2:
+        # x * out_max fits in 32 bits for inputs of up to 16 bits
+        scaled = np.empty(shape, dtype=np.uint32)
+        np.maximum(image_2d, 0, out=scaled, casting="unsafe")
+        scaled *= out_max
+        scaled //= int(image_max)
     else:
-        # Rescaling grey scale between 0-255
-        image_2d_scaled = (np.maximum(image_2d, 0) / image_2d.max()) * 255.0
-        # onvert to uint
-        image_2d_scaled = np.uint8(image_2d_scaled)
-        bit_depth = 8
-        # Write the PNG file
+        # the cached pixel_array of ds is left untouched
+        scaled = image_2d.astype(np.float32) if image_2d is decoded else image_2d
+        np.maximum(scaled, 0, out=scaled)
+        scaled *= out_max / image_max
+    image_2d_scaled = scaled.astype(out_dtype)
     return image_2d_scaled, shape, isRGB, bit_depth
 
 
@@ -199,16 +560,113 @@ def _make_mammo_img(dcm, arr, dcm_dict):
     return arr
 
 
-def apply_window(arr, dcm, dcm_dict):
+def window_bounds(dtype, dcm, dcm_dict):
+    """Tomo window of the shared functional groups (or of the tags as a fallback) for dtype"""
     try:
         w_min, w_max = get_window_params(dcm)
     except:
         w_min, w_max = get_window_fallback(dcm_dict)
-    arr[arr < w_min] = w_min
-    arr[arr > w_max] = w_max
+    if np.dtype(dtype).kind in "iu":
+        # keep the native dtype, the window bounds are rounded inwards to the integer grid
+        info = np.iinfo(dtype)
+        w_min = int(np.clip(np.ceil(w_min), info.min, info.max))
+        w_max = int(np.clip(np.floor(w_max), info.min, info.max))
+    return w_min, w_max
+
+
+def apply_window(arr, dcm, dcm_dict):
+    w_min, w_max = window_bounds(arr.dtype, dcm, dcm_dict)
+    np.clip(arr, w_min, w_max, out=arr)
     return arr
 
 
+def _tomo_stream_layout(dcm):
+    """
+    Order in which the frames of a tomo object are written (by InStackPositionNumber) and the dtype
+    of the volume, as dicom2nifti's multiframe conversion would build it. None when the object
+    needs the full conversion: MR (vendor specific), RGB, several stacks or rescaled frames.
+    """
+    try:
+        if dcm.get("Modality", "").upper() == "MR" or dcm.PhotometricInterpretation == "RGB":
+            return None
+        n_stacks, _ = d2n_common.multiframe_get_stack_count([dcm])
+        frame_info = dcm.PerFrameFunctionalGroupsSequence
+        if n_stacks != 1 or len(frame_info) != int(dcm.get("NumberOfFrames", len(frame_info))):
+            return None
+        order = [None] * len(frame_info)
+        for frame_index, frame in enumerate(frame_info):
+            if "PixelValueTransformationSequence" in frame:
+                transform = frame.PixelValueTransformationSequence[0]
+                if float(transform.RescaleSlope) != 1 or float(transform.RescaleIntercept) != 0:
+                    return None
+            z_index = frame_index
+            if "FrameContentSequence" in frame:
+                z_index = frame.FrameContentSequence[0].InStackPositionNumber - 1
+            if order[z_index] is not None:
+                return None
+            order[z_index] = frame_index
+        if None in order:
+            return None
+        return order, np.dtype(d2n_common.get_numpy_type(dcm))
+    except BaseException:
+        return None
+
+
+def _validate_tomo(dcm):
+    """Checks dicom2nifti runs on a multiframe object before converting it"""
+    if d2n_settings.validate_slicecount:
+        d2n_common.multiframe_validate_slicecount([dcm])
+    if d2n_settings.validate_orientation:
+        d2n_common.multiframe_validate_orientation([dcm])
+    if d2n_settings.validate_orthogonal:
+        d2n_common.multiframe_validate_orthogonal([dcm])
+    if d2n_settings.validate_slice_increment:
+        d2n_common.multiframe_validate_slice_increment([dcm])
+
+
+def _stream_laterality_flip(dcm, dcm_path, order, config=None) -> bool:
+    """verify_lat estimated on the middle frame only: True when the frames must be flipped"""
+    try:
+        function_sequence = dcm[MammoTomoTags.SharedFunctionalGroupSequence.value][0]
+        img_laterality = function_sequence[MammoTomoTags.FrameAnatomySequence.value][0][
+            MammoTomoTags.FrameLaterality.value
+        ].value
+        middle = next(iter_frames(dcm_path, transfer_syntax(dcm), [order[len(order) // 2]], config))
+        return img_laterality != estimate_image_lat(middle)
+    except:
+        return False
+
+
+def _stream_tomo(dcm, dcm_path, dcm_tags, nifti_path, layout, apply_voi, verify_laterality, config, timer):
+    """
+    Decodes, windows and writes the frames of a tomo object one at a time. Produces the same volume
+    as the dicom2nifti path but only one frame is held in memory.
+    The nifti volume is (columns, rows, frames) in Fortran order so every frame in C order is the
+    next slab of the file.
+    """
+    order, dtype = layout
+    with timer.stage("decode"):
+        _validate_tomo(dcm)
+        shape = (int(dcm.Columns), int(dcm.Rows), len(order))
+        affine, _ = multiframe_create_affine([dcm], stub_volume(shape, dtype))
+        vol = nib.Nifti1Image(stub_volume(shape, dtype), affine)
+        if "RepetitionTime" in dcm and "EchoTime" in dcm:
+            d2n_common.set_tr_te(vol, dcm.RepetitionTime, dcm.EchoTime)
+        window = window_bounds(dtype, dcm, dcm_tags) if apply_voi else None
+        flip = verify_laterality and _stream_laterality_flip(dcm, dcm_path, order, config)
+        frames = iter_frames(dcm_path, transfer_syntax(dcm), order, config, timer)
+    with _volume_stream(vol, nifti_path, config, timer) as stream:
+        for _ in order:
+            with timer.stage("decode"):
+                frame = next(frames).astype(dtype, copy=False)
+                if window is not None:
+                    np.clip(frame, window[0], window[1], out=frame)
+                if flip:
+                    frame = frame[:, ::-1]
+            stream.write(np.ascontiguousarray(frame))
+    return stream.close()
+
+
 def get_window_params(dcm):
     function_sequence = dcm[MammoTomoTags.SharedFunctionalGroupSequence.value][0]
     voi_lut_sequence = function_sequence[MammoTomoTags.FrameVoiLutSequence.value][0]
@@ -243,6 +701,51 @@ def estimate_image_lat(pixel_array) -> str:
     return "R" if left_edge < right_edge else "L"
 
 
+def reorient_volume(nii):
+    """
+    dicom2nifti's image_reorientation.reorient_image (LAS orientation) of an in memory image.
+    dicom2nifti always writes the reoriented image to a file, which fails without an output_file
+    """
+    image = ImageVolume(nii)
+    new_image = image_reorientation._reorient(image)
+    affine = image.affine
+    new_affine = np.eye(4)
+    new_affine[:, 0] = affine[:, image.sagittal_orientation.normal_component]
+    new_affine[:, 1] = affine[:, image.coronal_orientation.normal_component]
+    new_affine[:, 2] = affine[:, image.axial_orientation.normal_component]
+    # the origin moves to the last voxel along the inverted axes
+    point = [0, 0, 0, 1]
+    if not image.axial_orientation.x_inverted:
+        new_affine[:, 0] = -new_affine[:, 0]
+        point[image.sagittal_orientation.normal_component] = (
+            image.dimensions[image.sagittal_orientation.normal_component] - 1
+        )
+    if image.axial_orientation.y_inverted:
+        new_affine[:, 1] = -new_affine[:, 1]
+        point[image.coronal_orientation.normal_component] = (
+            image.dimensions[image.coronal_orientation.normal_component] - 1
+        )
+    if image.coronal_orientation.y_inverted:
+        new_affine[:, 2] = -new_affine[:, 2]
+        point[image.axial_orientation.normal_component] = (
+            image.dimensions[image.axial_orientation.normal_component] - 1
+        )
+    new_affine[:, 3] = np.dot(affine, point)
+    if new_image.ndim > 3:
+        new_image = new_image.squeeze()
+    output = nib.nifti1.Nifti1Image(new_image, new_affine)
+    output.header.set_slope_inter(1, 0)
+    output.header.set_xyzt_units(2)
+    return output
+
+
 def _dicomnifti_proc(dicom_list,output_file,reorient_nifti=True): 
-    results =  dicom_array_to_nifti(dicom_list=dicom_list,output_file=output_file,reorient_nifti=reorient_nifti) 
+    # without an output_file the image is kept in memory and reoriented here
+    results = dicom_array_to_nifti(
+        dicom_list=dicom_list,
+        output_file=output_file,
+        reorient_nifti=reorient_nifti and output_file is not None,
+    )
+    if reorient_nifti and output_file is None:
+        results["NII"] = reorient_volume(results["NII"])
     return results  
\ No newline at end of file
@@ -0,0 +1,57 @@
+import struct
+import zlib
+
+import numpy as np
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# png color types
+_GREYSCALE = 0
+_RGB = 2
+
+
+def _chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data))
+        + chunk_type
+        + data
+        + struct.pack(">I", zlib.crc32(data, zlib.crc32(chunk_type)))
+    )
+
+
+def _scanlines(arr: np.ndarray, bit_depth: int) -> np.ndarray:
+    """Rows of the image as big endian bytes, each preceded by the filter type byte (0, no filter)"""
+    dtype = ">u2" if bit_depth == 16 else np.uint8
+    rows = np.ascontiguousarray(arr, dtype=dtype).reshape(arr.shape[0], -1).view(np.uint8)
+    raw = np.zeros((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)
+    raw[:, 1:] = rows
+    return raw
+
+
+def encode_png(arr: np.ndarray, bit_depth=16, compression_level=6) -> bytes:
+    """
+    Encodes a rows x cols greyscale or rows x cols x 3 RGB array as a png straight from its buffer.
+    bit_depth: 8 or 16, values are cast to uint8/uint16
+    compression_level: zlib level, 1 is the fastest and 9 the smallest
+    """
+    if bit_depth not in (8, 16):
+        raise ValueError(f"Unsupported png bit depth {bit_depth}")
+    if arr.ndim == 3 and arr.shape[-1] == 3:
+        color_type = _RGB
+    elif arr.ndim == 2:
+        color_type = _GREYSCALE
+    else:
+        raise ValueError(f"Can't encode an array of shape {arr.shape} as png")
+    height, width = arr.shape[:2]
+    header = struct.pack(">IIBBBBB", width, height, bit_depth, color_type, 0, 0, 0)
+    idat = zlib.compress(_scanlines(arr, bit_depth), compression_level)
+    return (
+        _PNG_SIGNATURE
+        + _chunk(b"IHDR", header)
+        + _chunk(b"IDAT", idat)
+        + _chunk(b"IEND", b"")
+    )
+
+
+def write_png(png_path, arr: np.ndarray, bit_depth=16, compression_level=6):
+    with open(png_path, "wb") as png_file:
+        png_file.write(encode_png(arr, bit_depth, compression_level))
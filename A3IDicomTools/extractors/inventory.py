@@ -0,0 +1,311 @@
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime REAL,
+    storage_class TEXT,
+    study_uid TEXT,
+    series_uid TEXT,
+    sop_uid TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    scan_id INTEGER,
+    fingerprint TEXT,
+    duplicate_of TEXT
+);
+CREATE INDEX IF NOT EXISTS files_status ON files (status, storage_class);
+CREATE INDEX IF NOT EXISTS files_series ON files (storage_class, series_uid);
+CREATE INDEX IF NOT EXISTS files_sop ON files (sop_uid, fingerprint);
+CREATE TABLE IF NOT EXISTS index_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# order in which the storage classes are handed to the extraction pool
+_CLASS_ORDER = ["MRCT", "TOMO", "XRAY", "OTHER"]
+
+# files of a storage class converted per series, parameters in _series_params. A series with a
+# pending slice comes with its extracted slices too so a series that arrives over several scans is
+# converted again as a single volume
+_SERIES_FILES = (
+    "SELECT series_uid, path, size FROM files "
+    "WHERE scan_id = ? AND storage_class = ? AND (status = ? OR (status IN (?, ?) AND series_uid IN ("
+    "  SELECT series_uid FROM files WHERE status = ? AND scan_id = ? AND storage_class = ?"
+    ")))"
+)
+
+
+class FileStatus:
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+    UNREADABLE = "unreadable"
+    OTHER_SHARD = "other_shard"
+    DUPLICATE = "duplicate"
+
+
+class InventoryIndex:
+    """
+    On disk inventory of every dicom file under DICOMHome. One row per file with its size, mtime,
+    storage class, study/series/sop uids, content fingerprint and extraction status.
+    Rescans only need to re-read files whose size or mtime changed. Files that were not seen on
+    the latest scan are ignored when streaming work.
+
+    index_path: str  location of the sqlite database
+    """
+
+    _RECORD_COLS = (
+        "path", "size", "mtime", "storage_class", "study_uid", "series_uid", "sop_uid", "fingerprint",
+    )
+
+    def __init__(self, index_path) -> None:
+        self.index_path = str(index_path)
+        self.conn = self._connect()
+        self._add_missing_columns()
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+        self.scan_id = int(self.get_meta("scan_id", 0))
+
+    def _connect(self):
+        conn = sqlite3.connect(self.index_path, timeout=60)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def close(self):
+        self.conn.close()
+
+    def _add_missing_columns(self):
+        """Indexes written by older versions lack the dedup columns"""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(files)")}
+        if not columns:
+            return
+        for column in ("fingerprint", "duplicate_of"):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE files ADD COLUMN {column} TEXT")
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute(
+            "SELECT value FROM index_meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO index_meta (key, value) VALUES (?, ?)",
+            (key, str(value)),
+        )
+        self.conn.commit()
+
+    def start_scan(self) -> int:
+        """Starts a new scan generation. Every path seen during the scan is stamped with it"""
+        self.scan_id += 1
+        self.set_meta("scan_id", self.scan_id)
+        return self.scan_id
+
+    def iter_known_stats(self, paths: Iterable) -> Iterator[Tuple[Path, int, float]]:
+        """Pairs every path with the size and mtime stored in the index (None if unknown).
+        Uses its own connection so it can be consumed from the pool's feeder thread.
+        """
+        conn = self._connect()
+        try:
+            for dcm_path in paths:
+                row = conn.execute(
+                    "SELECT size, mtime FROM files WHERE path = ?", (str(dcm_path),)
+                ).fetchone()
+                known_size, known_mtime = row if row else (None, None)
+                yield dcm_path, known_size, known_mtime
+        finally:
+            conn.close()
+
+    def add_records(self, records: Iterable[Dict]):
+        """Insert or refresh records produced by read_dcm_record. A record without a storage class
+        is a file that did not change since the last scan, we only stamp it with the scan id.
+        Changed files are reset to pending so they are extracted again.
+        """
+        seen, changed = [], []
+        for rec in records:
+            if "storage_class" in rec:
+                changed.append(
+                    tuple(rec.get(k) for k in self._RECORD_COLS)
+                    + (rec.get("status", FileStatus.PENDING), self.scan_id)
+                )
+            else:
+                seen.append((self.scan_id, rec["path"]))
+        if seen:
+            self.conn.executemany("UPDATE files SET scan_id = ? WHERE path = ?", seen)
+        if changed:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO files "
+                "(path, size, mtime, storage_class, study_uid, series_uid, sop_uid, fingerprint, "
+                "status, scan_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                changed,
+            )
+        self.conn.commit()
+
+    def set_status(self, path_status: Iterable[Tuple[str, str]]):
+        """path_status: iterable of (path, status)"""
+        self.conn.executemany(
+            "UPDATE files SET status = ? WHERE path = ?",
+            [(status, str(p)) for p, status in path_status],
+        )
+        self.conn.commit()
+
+    def count_pending(self) -> Dict[str, int]:
+        rows = self.conn.execute(
+            "SELECT storage_class, COUNT(*) FROM files "
+            "WHERE status = ? AND scan_id = ? GROUP BY storage_class",
+            (FileStatus.PENDING, self.scan_id),
+        ).fetchall()
+        return dict(rows)
+
+    def count_status(self) -> Dict[str, int]:
+        rows = self.conn.execute(
+            "SELECT status, COUNT(*) FROM files WHERE scan_id = ? GROUP BY status",
+            (self.scan_id,),
+        ).fetchall()
+        return dict(rows)
+
+    def mark_duplicates(self) -> int:
+        """
+        Pending files sharing a SOPInstanceUID and a fingerprint are copies of the same instance.
+        Copies of a file extracted by an earlier run are marked as duplicates of it. Among the
+        others the first path of every group stays pending and the rest are marked as duplicates
+        of it. Duplicates left over by an interrupted run are pending again first. Returns the
+        number of duplicates.
+        """
+        self.conn.execute(
+            "UPDATE files SET status = ?, duplicate_of = NULL WHERE status = ?",
+            (FileStatus.PENDING, FileStatus.DUPLICATE),
+        )
+        # rowcount is not set for statements starting with WITH
+        changes_before = self.conn.total_changes
+        for status in (FileStatus.DONE, FileStatus.PENDING):
+            # a pending group is only a duplicate group with more than one file
+            min_count = 1 if status == FileStatus.DONE else 2
+            self.conn.execute(
+                "WITH groups AS ("
+                "  SELECT sop_uid, fingerprint, MIN(path) AS representative FROM files "
+                "  WHERE status = ? AND scan_id = ? AND sop_uid IS NOT NULL AND fingerprint IS NOT NULL "
+                "  GROUP BY sop_uid, fingerprint HAVING COUNT(*) >= ?"
+                ") "
+                "UPDATE files SET status = ?, duplicate_of = groups.representative FROM groups "
+                "WHERE files.sop_uid = groups.sop_uid AND files.fingerprint = groups.fingerprint "
+                "AND files.path != groups.representative AND files.status = ? AND files.scan_id = ?",
+                (
+                    status, self.scan_id, min_count, FileStatus.DUPLICATE, FileStatus.PENDING,
+                    self.scan_id,
+                ),
+            )
+        self.conn.commit()
+        return self.conn.total_changes - changes_before
+
+    def extracted_duplicates(self) -> Dict[str, List[str]]:
+        """Paths of the duplicates of every representative extracted by an earlier run"""
+        duplicates = {}
+        cursor = self.conn.execute(
+            "SELECT files.duplicate_of, files.path FROM files "
+            "JOIN files AS representatives ON representatives.path = files.duplicate_of "
+            "WHERE files.status = ? AND files.scan_id = ? AND representatives.status = ? "
+            "ORDER BY files.path",
+            (FileStatus.DUPLICATE, self.scan_id, FileStatus.DONE),
+        )
+        for representative, dcm_path in cursor:
+            duplicates.setdefault(representative, []).append(dcm_path)
+        return duplicates
+
+    def duplicates_by_representative(self) -> Dict[str, List[str]]:
+        """Paths of the duplicates of every representative file"""
+        duplicates = {}
+        cursor = self.conn.execute(
+            "SELECT duplicate_of, path FROM files WHERE status = ? AND scan_id = ? ORDER BY path",
+            (FileStatus.DUPLICATE, self.scan_id),
+        )
+        for representative, dcm_path in cursor:
+            duplicates.setdefault(representative, []).append(dcm_path)
+        return duplicates
+
+    def iter_pending(self, series_classes=()) -> Iterator[Tuple[str, Path | List[Path]]]:
+        """Streams (storage_class, path) for every pending file seen on the latest scan.
+        Files of a storage class in series_classes are grouped by SeriesInstanceUID and streamed as
+        (storage_class, [paths]) instead, with the already extracted slices of their series.
+        Uses its own connection so it can be consumed from the pool's feeder thread.
+        """
+        conn = self._connect()
+        try:
+            for store_class in _CLASS_ORDER:
+                if store_class in series_classes:
+                    yield from self._iter_pending_series(conn, store_class)
+                    continue
+                cursor = conn.execute(
+                    "SELECT path FROM files WHERE status = ? AND scan_id = ? AND storage_class = ?",
+                    (FileStatus.PENDING, self.scan_id, store_class),
+                )
+                for (dcm_path,) in cursor:
+                    yield store_class, Path(dcm_path)
+        finally:
+            conn.close()
+
+    def _series_params(self, store_class):
+        return (
+            self.scan_id, store_class, FileStatus.PENDING, FileStatus.DONE, FileStatus.FAILED,
+            FileStatus.PENDING, self.scan_id, store_class,
+        )
+
+    def _iter_pending_series(self, conn, store_class):
+        cursor = conn.execute(
+            f"SELECT series_uid, path FROM ({_SERIES_FILES}) ORDER BY series_uid",
+            self._series_params(store_class),
+        )
+        series_uid, series_paths = None, []
+        for row_series, dcm_path in cursor:
+            if row_series is None:
+                # without a series uid a file can't be grouped
+                yield store_class, [Path(dcm_path)]
+                continue
+            if row_series != series_uid and series_paths:
+                yield store_class, series_paths
+                series_paths = []
+            series_uid = row_series
+            series_paths.append(Path(dcm_path))
+        if series_paths:
+            yield store_class, series_paths
+
+    def iter_pending_by_size(self, store_class, group_series=False) -> Iterator[Tuple[Path | List[Path], int]]:
+        """Streams (path, size) for the pending files of a storage class, largest first.
+        With group_series the files of a series are streamed together as ([paths], total size),
+        with the already extracted slices of the series. Files without a series uid stay on their own.
+        The sort is done by sqlite.
+        Uses its own connection so it can be consumed from the pool's feeder thread.
+        """
+        conn = self._connect()
+        try:
+            if not group_series:
+                cursor = conn.execute(
+                    "SELECT path, COALESCE(size, 0) FROM files "
+                    "WHERE status = ? AND scan_id = ? AND storage_class = ? ORDER BY 2 DESC",
+                    (FileStatus.PENDING, self.scan_id, store_class),
+                )
+                for dcm_path, size in cursor:
+                    yield Path(dcm_path), size
+                return
+            cursor = conn.execute(
+                f"SELECT series_uid, MIN(path), COALESCE(SUM(size), 0) FROM ({_SERIES_FILES}) "
+                "GROUP BY COALESCE(series_uid, path) ORDER BY 3 DESC",
+                self._series_params(store_class),
+            )
+            for series_uid, dcm_path, size in cursor:
+                if series_uid is None:
+                    yield [Path(dcm_path)], size
+                    continue
+                series_paths = conn.execute(
+                    f"SELECT path FROM ({_SERIES_FILES}) WHERE series_uid = ?",
+                    self._series_params(store_class) + (series_uid,),
+                ).fetchall()
+                yield [Path(e) for (e,) in series_paths], size
+        finally:
+            conn.close()
@@ -0,0 +1,96 @@
+import os
+import threading
+from typing import Iterator, Tuple
+
+_COMMIT = "#commit"
+_START = "#start"
+
+
+class CompletionJournal:
+    """
+    Append only record of the files that finished extraction. Each result is appended as it arrives
+    with the id of the metadata batch it belongs to. Once the batch is on disk a commit line is written.
+    On replay only entries of committed batches are returned, results of a batch that was lost in a
+    crash are extracted again. Every run starts with a start line so uncommitted entries of an
+    interrupted run are never committed by a later batch reusing the same id.
+    Batches can be committed from a writer thread while results are still being recorded.
+
+    journal_path: str   location of the journal file
+    """
+
+    def __init__(self, journal_path) -> None:
+        self.journal_path = str(journal_path)
+        self._f = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        if self._f is None:
+            self._f = open(self.journal_path, "a", encoding="utf-8")
+        return self._f
+
+    def start(self):
+        prefix = ""
+        if os.path.isfile(self.journal_path) and os.path.getsize(self.journal_path):
+            with open(self.journal_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    # terminate the partial line left by an interrupted write
+                    prefix = "\n"
+        f = self._open()
+        f.write(f"{prefix}{_START}\n")
+        f.flush()
+
+    def record(self, dcm_path, status, batch_id):
+        with self._lock:
+            self._open().write(f"{status}\t{batch_id}\t{dcm_path}\n")
+
+    def record_many(self, entries, batch_id):
+        """Records (dcm_path, status) entries with a single write"""
+        lines = "".join(f"{status}\t{batch_id}\t{dcm_path}\n" for dcm_path, status in entries)
+        with self._lock:
+            self._open().write(lines)
+
+    def commit(self, batch_id):
+        with self._lock:
+            f = self._open()
+            f.write(f"{_COMMIT}\t{batch_id}\n")
+            f.flush()
+            fd = f.fileno()
+        # records keep being appended while the commit reaches the disk
+        os.fsync(fd)
+
+    def close(self):
+        with self._lock:
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+
+    def replay(self, offset=0) -> Iterator[Tuple[str, str]]:
+        """
+        Yields (path, status) of committed entries written after byte offset.
+        The offset to resume from next time is available as last_offset once the iterator is exhausted
+        """
+        self.last_offset = offset
+        if not os.path.isfile(self.journal_path):
+            return
+        uncommitted = {}
+        with open(self.journal_path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # partial line from an interrupted write
+                    break
+                fields = line.decode("utf-8").rstrip("\n").split("\t", 2)
+                if fields[0] == _START:
+                    # whatever is left uncommitted belongs to an interrupted run
+                    uncommitted = {}
+                    self.last_offset = f.tell()
+                elif fields[0] == _COMMIT:
+                    for entry in uncommitted.pop(fields[1], []):
+                        yield entry
+                    # entries of later batches may be interleaved so only move past fully committed data
+                    if not uncommitted:
+                        self.last_offset = f.tell()
+                elif len(fields) == 3:
+                    status, batch_id, dcm_path = fields
+                    uncommitted.setdefault(batch_id, []).append((dcm_path, status))
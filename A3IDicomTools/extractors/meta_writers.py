@@ -0,0 +1,523 @@
+import logging
+import os
+import queue
+import threading
+import time
+from glob import glob
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from .columnar import ColumnBatch
+
+
+class MetaWriterRegister:
+    __data = {}
+
+    @classmethod
+    def register(cls, cls_name=None):
+        def decorator(cls_obj):
+            cls.__data[cls_name] = cls_obj
+            return cls_obj
+
+        return decorator
+
+    @classmethod
+    def get_writer(cls, key):
+        return cls.__data[key]
+
+    @classmethod
+    def get_writers(cls):
+        return list(cls.__data.keys())
+
+    @classmethod
+    def build_writer(cls, conf, meta_directory):
+        key = conf["MetadataFormat"]
+        writer = cls.get_writer(key)
+        return writer(meta_directory)
+
+
+class BackgroundBatchWriter:
+    """
+    Writes metadata batches on a thread fed through a bounded queue so results keep being collected
+    while a batch is serialized and written. When the queue is full submit blocks, the time spent
+    waiting is reported as stall_time.
+
+    write_func: called as write_func(meta_rows, batch_id) on the writer thread
+    max_queue: number of batches waiting to be written before submit blocks
+    """
+
+    def __init__(self, write_func, max_queue=4) -> None:
+        self.write_func = write_func
+        self.queue = queue.Queue(max(1, max_queue))
+        self.batches = 0
+        self.max_depth = 0
+        self.total_depth = 0
+        self.stall_time = 0.0
+        self.write_time = 0.0
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="meta-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self._error is not None:
+                # a failed batch stops the writes, the error is raised on the submitting side
+                continue
+            t_start = time.perf_counter()
+            try:
+                self.write_func(*item)
+            except BaseException as error:
+                self._error = error
+            self.write_time += time.perf_counter() - t_start
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def submit(self, meta_rows, batch_id):
+        self._raise_error()
+        depth = self.queue.qsize()
+        self.max_depth = max(self.max_depth, depth)
+        self.total_depth += depth
+        self.batches += 1
+        t_start = time.perf_counter()
+        self.queue.put((meta_rows, batch_id))
+        self.stall_time += time.perf_counter() - t_start
+
+    def close(self, raise_error=True):
+        """
+        Waits for the queued batches to be written. Without raise_error a failed write is only
+        logged, for callers that are already handling another error
+        """
+        self.queue.put(None)
+        self._thread.join()
+        if raise_error:
+            self._raise_error()
+        elif self._error is not None:
+            logging.error(f"Metadata writer produced error {self._error}")
+
+    @property
+    def metrics(self) -> dict:
+        return {
+            "writer_batches": self.batches,
+            "writer_queue_max_depth": self.max_depth,
+            "writer_queue_mean_depth": self.total_depth / self.batches if self.batches else 0.0,
+            "writer_stall_sec": self.stall_time,
+            "writer_busy_sec": self.write_time,
+        }
+
+
+def rows_frame(meta_rows, dtype=None) -> pd.DataFrame:
+    """DataFrame of a list of row dicts or of a ColumnBatch"""
+    if isinstance(meta_rows, ColumnBatch):
+        return meta_rows.to_frame(dtype=dtype)
+    return pd.DataFrame(meta_rows, dtype=dtype)
+
+
+def batch_id_from_path(batch_path) -> int:
+    return int(os.path.split(batch_path)[1].split(".")[0].split("_")[1])
+
+
+class MetaWriter:
+    """
+    Writes batches of metadata rows to meta_directory as metadata_{batch_id}{extension}
+    and merges them into a single output at the end of the extraction.
+    """
+
+    extension = ""
+
+    def __init__(self, meta_directory) -> None:
+        self.meta_directory = meta_directory
+
+    def batch_path(self, batch_id) -> str:
+        return os.path.join(self.meta_directory, f"metadata_{batch_id}{self.extension}")
+
+    def batch_files(self) -> List[str]:
+        """Batch files sorted by batch id"""
+        return sorted(
+            glob(os.path.join(self.meta_directory, f"metadata_*{self.extension}")),
+            key=batch_id_from_path,
+        )
+
+    def write_batch(self, meta_rows: List[dict] | ColumnBatch, batch_id) -> str:
+        raise NotImplementedError
+
+    def read_batch(self, batch_path) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def find_rows(self, files) -> Dict[str, dict]:
+        """Metadata row of each of files by file, read from the batches. The latest batch wins"""
+        files = set(map(str, files))
+        rows = dict()
+        for meta in self.batch_files():
+            meta_df = self.read_batch(meta)
+            if "file" not in meta_df.columns:
+                continue
+            for row in meta_df[meta_df["file"].isin(files)].to_dict("records"):
+                rows[row["file"]] = row
+        return rows
+
+    def merge(self, output_directory, to_parquet=False, batch_files=None) -> str:
+        """
+        Merges the batches into a single file in output_directory. With to_parquet a
+        metadata.parquet is emitted as well (writers producing parquet always do)
+        batch_files: batches to merge instead of the ones in meta_directory (e.g. of several shards)
+        """
+        raise NotImplementedError
+
+    def append(self, output_directory, batch_files, to_parquet=False) -> str:
+        """
+        Adds the rows of batch_files to the merged output written by a previous merge. Writers that
+        can't append rewrite the merged output from every batch
+        """
+        return self.merge(output_directory, to_parquet=to_parquet)
+
+
+@MetaWriterRegister.register("csv")
+class CsvMetaWriter(MetaWriter):
+    extension = ".csv"
+
+    def write_batch(self, meta_rows, batch_id):
+        destination = self.batch_path(batch_id)
+        # typed columns so an int column missing from some rows is still written as 0 and not 0.0
+        meta_df = typed_frame(rows_frame(meta_rows, dtype=object))
+        meta_df.to_csv(destination)
+        return destination
+
+    def read_batch(self, batch_path):
+        return pd.read_csv(batch_path, dtype="str", index_col=0)
+
+    def merge(self, output_directory, to_parquet=False, batch_files=None):
+        # TODO:  Right now we do not fillter out empty metadata columsn. add it in the future?
+        destination = os.path.join(output_directory, "metadata.csv")
+        batch_files = self.batch_files() if batch_files is None else batch_files
+        merge_csv_batches(batch_files, destination)
+        if to_parquet:
+            merge_csv_batches_to_parquet(
+                batch_files, os.path.join(output_directory, "metadata.parquet")
+            )
+        return destination
+
+    def append(self, output_directory, batch_files, to_parquet=False):
+        """
+        Appends the new batches to metadata.csv when their columns are already part of its header.
+        New columns need a new header so the whole file is rewritten, as do files extracted again
+        since their earlier rows have to be dropped. metadata.parquet gets the new rows after its
+        own row groups, see extend_parquet
+        """
+        destination = os.path.join(output_directory, "metadata.csv")
+        if not os.path.isfile(destination):
+            return self.merge(output_directory, to_parquet=to_parquet)
+        if _extracted_again(csv_batch_files(destination), [csv_batch_files(e) for e in batch_files]):
+            logging.info("Files extracted again found, rewriting metadata.csv")
+            return self.merge(output_directory, to_parquet=to_parquet)
+        columns = list(pd.read_csv(destination, dtype="str", nrows=0).columns)
+        if not columns or not set(csv_union_columns(batch_files)) <= set(columns):
+            logging.info("New metadata columns found, rewriting metadata.csv")
+            return self.merge(output_directory, to_parquet=to_parquet)
+        with open(destination, "a", newline="") as f:
+            for meta in batch_files:
+                m = pd.read_csv(meta, dtype="str").reindex(columns=columns)
+                m.to_csv(f, index=False, header=False)
+        if to_parquet:
+            parquet_destination = os.path.join(output_directory, "metadata.parquet")
+            tables = (_csv_table(meta, columns) for meta in batch_files)
+            if not extend_parquet(parquet_destination, tables, columns):
+                merge_csv_batches_to_parquet(self.batch_files(), parquet_destination)
+        return destination
+
+
+def _extracted_again(merged_files: pd.Series, batch_file_columns) -> bool:
+    """True when a file of the new batches already has a row, in the merged output or another batch"""
+    seen = set(merged_files.dropna())
+    for files in batch_file_columns:
+        files = files.dropna()
+        if files.duplicated().any() or not seen.isdisjoint(files):
+            return True
+        seen.update(files)
+    return False
+
+
+def _csv_table(batch_file, columns):
+    import pyarrow as pa
+
+    m = pd.read_csv(batch_file, dtype="str").reindex(columns=columns)
+    return pa.Table.from_pandas(m, preserve_index=False)
+
+
+def extend_parquet(destination, tables, columns=None) -> bool:
+    """
+    Adds tables after the row groups of the parquet file destination. Parquet files can't be
+    appended to in place so the file is rewritten, but from its own row groups instead of every
+    metadata batch. Returns False without writing when destination does not exist or lacks some of
+    columns (the columns of the tables), the caller then merges the batches again
+    """
+    import pyarrow.parquet as pq
+
+    if not os.path.isfile(destination):
+        return False
+    existing = pq.ParquetFile(destination)
+    schema = existing.schema_arrow
+    if columns is not None and not set(columns) <= set(schema.names):
+        return False
+    partial_path = f"{destination}.partial"
+    with pq.ParquetWriter(partial_path, schema, compression="zstd") as writer:
+        for i in range(existing.num_row_groups):
+            writer.write_table(existing.read_row_group(i))
+        for table in tables:
+            writer.write_table(conform_table(table, schema))
+    os.replace(partial_path, destination)
+    return True
+
+
+def csv_union_columns(batch_files) -> List[str]:
+    """First pass of the merge. Only the header of every batch is read"""
+    columns = dict()
+    for meta in batch_files:
+        columns.update(dict.fromkeys(pd.read_csv(meta, dtype="str", nrows=0).columns))
+    return list(columns)
+
+
+def csv_batch_files(batch_file) -> pd.Series:
+    """file column of a csv batch, empty when the batch has none"""
+    m = pd.read_csv(batch_file, dtype="str", usecols=lambda c: c == "file")
+    return m["file"] if "file" in m.columns else pd.Series(dtype="str")
+
+
+def parquet_batch_files(batch_file) -> pd.Series:
+    """file column of a parquet batch, empty when the batch has none"""
+    import pyarrow.parquet as pq
+
+    if "file" not in pq.read_schema(batch_file).names:
+        return pd.Series(dtype="str")
+    return pq.read_table(batch_file, columns=["file"]).column("file").to_pandas()
+
+
+def latest_batch_by_file(batch_file_columns) -> Dict[str, int]:
+    """
+    Index of the last batch holding each file. A file extracted again (rewritten in place, or a
+    series converted again with its new slices) gets a new row in a later batch that replaces the
+    earlier ones, as in MetaWriter.find_rows
+    """
+    latest = dict()
+    for i, files in enumerate(batch_file_columns):
+        latest.update(dict.fromkeys(files.dropna(), i))
+    return latest
+
+
+def current_rows(files: pd.Series, latest, batch_index) -> np.ndarray:
+    """Mask of the rows of batch batch_index that are not replaced by a later row of their file"""
+    current = files.map(latest).eq(batch_index) & ~files.duplicated(keep="last")
+    return (files.isna() | current).to_numpy()
+
+
+def _current_frame(m, latest, batch_index):
+    if "file" not in m.columns:
+        return m
+    return m[current_rows(m["file"], latest, batch_index)]
+
+
+def merge_csv_batches(batch_files, destination):
+    """
+    Streams the batches into a single csv aligned on the union of their columns.
+    Only one batch is held in memory at a time.
+    """
+    columns = csv_union_columns(batch_files)
+    latest = latest_batch_by_file(csv_batch_files(e) for e in batch_files)
+    with open(destination, "w", newline="") as f:
+        if not columns:
+            f.write("\n")
+        for i, meta in enumerate(batch_files):
+            m = _current_frame(pd.read_csv(meta, dtype="str"), latest, i)
+            m = m.reindex(columns=columns)
+            m.to_csv(f, index=False, header=i == 0)
+
+
+def merge_csv_batches_to_parquet(batch_files, destination):
+    """Same as merge_csv_batches but emits a parquet file with string columns"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = csv_union_columns(batch_files)
+    latest = latest_batch_by_file(csv_batch_files(e) for e in batch_files)
+    schema = pa.schema([pa.field(e, pa.string()) for e in columns])
+    with pq.ParquetWriter(destination, schema, compression="zstd") as writer:
+        for i, meta in enumerate(batch_files):
+            m = _current_frame(pd.read_csv(meta, dtype="str"), latest, i).reindex(columns=columns)
+            writer.write_table(pa.Table.from_pandas(m, schema=schema, preserve_index=False))
+
+
+def _column_kind(values: pd.Series) -> str:
+    """int, float or str depending on the python types held by a column"""
+    kinds = set()
+    for v in values:
+        if v is None or (isinstance(v, float) and np.isnan(v)):
+            continue
+        if isinstance(v, (bool, np.bool_)):
+            return "str"
+        if isinstance(v, (int, np.integer)):
+            kinds.add("int")
+        elif isinstance(v, (float, np.floating)):
+            kinds.add("float")
+        else:
+            return "str"
+    if kinds == {"int"}:
+        return "int"
+    if kinds:
+        return "float"
+    return "str"
+
+
+def typed_frame(meta_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Numeric tags are stored as typed columns, everything else (uids, multi values, person names)
+    becomes a nullable string column.
+    """
+    out = {}
+    for col in meta_df.columns:
+        values = meta_df[col]
+        kind = _column_kind(values)
+        if kind == "int":
+            out[col] = values.astype("Int64")
+        elif kind == "float":
+            out[col] = values.astype("float64")
+        else:
+            out[col] = values.map(
+                lambda v: None if v is None or (isinstance(v, float) and np.isnan(v)) else str(v)
+            ).astype("string")
+    return pd.DataFrame(out, index=meta_df.index)
+
+
+def unify_schemas(schemas):
+    """
+    Union of the columns of every batch. A column keeps its type when the batches agree,
+    int and float columns are promoted to float and any other conflict falls back to string.
+    """
+    import pyarrow as pa
+
+    col_types = {}
+    for schema in schemas:
+        for field in schema:
+            col_types.setdefault(field.name, set()).add(field.type)
+    fields = []
+    for name, types in col_types.items():
+        types.discard(pa.null())
+        if not types:
+            col_type = pa.string()
+        elif len(types) == 1:
+            col_type = types.pop()
+        elif all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in types):
+            col_type = pa.float64()
+        else:
+            col_type = pa.string()
+        fields.append(pa.field(name, col_type))
+    return pa.schema(fields)
+
+
+def conform_table(table, schema):
+    """Reorders and casts table to schema, missing columns are filled with nulls"""
+    import pyarrow as pa
+
+    columns = []
+    for field in schema:
+        if field.name in table.column_names:
+            columns.append(table.column(field.name).cast(field.type))
+        else:
+            columns.append(pa.nulls(table.num_rows, type=field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+@MetaWriterRegister.register("parquet")
+class ParquetMetaWriter(MetaWriter):
+    """
+    Each batch becomes a parquet file with a single row group. Batches can have different columns,
+    the union of the columns is taken when merging.
+    """
+
+    extension = ".parquet"
+
+    def __init__(self, meta_directory) -> None:
+        super().__init__(meta_directory)
+        try:
+            import pyarrow
+        except ImportError as error:
+            raise ImportError(
+                "MetadataFormat parquet requires pyarrow. Install it with pip install pyarrow"
+            ) from error
+
+    def write_batch(self, meta_rows, batch_id):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        destination = self.batch_path(batch_id)
+        # object dtype keeps ints as ints when a column is missing from some rows
+        meta_df = rows_frame(meta_rows, dtype=object)
+        table = pa.Table.from_pandas(typed_frame(meta_df), preserve_index=False)
+        pq.write_table(table, destination, compression="zstd")
+        return destination
+
+    def read_batch(self, batch_path):
+        import pyarrow.parquet as pq
+
+        return pq.read_table(batch_path).to_pandas()
+
+    def merge(self, output_directory, to_parquet=False, batch_files=None):
+        """
+        Two passes over the batches. The first one only reads the schemas and the file column to
+        compute the union of the columns and the latest row of each file, the second one streams
+        every row group to the output with aligned columns.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        batch_files = self.batch_files() if batch_files is None else batch_files
+        destination = os.path.join(output_directory, "metadata.parquet")
+        if not batch_files:
+            logging.info("No metadata batches to merge")
+            return None
+        schema = unify_schemas(pq.read_schema(e) for e in batch_files)
+        latest = latest_batch_by_file(parquet_batch_files(e) for e in batch_files)
+        with pq.ParquetWriter(destination, schema, compression="zstd") as writer:
+            for batch_index, meta in enumerate(batch_files):
+                batch_file = pq.ParquetFile(meta)
+                mask = None
+                if "file" in batch_file.schema_arrow.names:
+                    mask = current_rows(parquet_batch_files(meta), latest, batch_index)
+                offset = 0
+                for i in range(batch_file.num_row_groups):
+                    table = batch_file.read_row_group(i)
+                    n_rows = table.num_rows
+                    if mask is not None:
+                        table = table.filter(pa.array(mask[offset : offset + n_rows]))
+                    offset += n_rows
+                    writer.write_table(conform_table(table, schema))
+        return destination
+
+    def append(self, output_directory, batch_files, to_parquet=False):
+        """
+        Adds the new batches to metadata.parquet when their columns and types fit its schema (see
+        extend_parquet), otherwise every batch is merged again. So are files extracted again, their
+        earlier rows have to be dropped
+        """
+        import pyarrow.parquet as pq
+
+        destination = os.path.join(output_directory, "metadata.parquet")
+        if os.path.isfile(destination) and _extracted_again(
+            parquet_batch_files(destination), [parquet_batch_files(e) for e in batch_files]
+        ):
+            logging.info("Files extracted again found, rewriting metadata.parquet")
+            return self.merge(output_directory, to_parquet=to_parquet)
+        if os.path.isfile(destination):
+            schema = pq.read_schema(destination)
+            batch_schemas = [pq.read_schema(e) for e in batch_files]
+            if unify_schemas([schema] + batch_schemas) == schema:
+                tables = (pq.read_table(e) for e in batch_files)
+                if extend_parquet(destination, tables):
+                    return destination
+        logging.info("New metadata columns found, rewriting metadata.parquet")
+        return self.merge(output_directory, to_parquet=to_parquet)
@@ -0,0 +1,154 @@
+import json
+import time
+from array import array
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+from pydicom.uid import UID
+
+# order of the stages in the report
+STAGES = ("read", "tags", "decode", "encode", "write")
+
+
+class StageTimer:
+    """
+    Collects the time spent in each stage of a task. The result is attached to the first metadata
+    row of the task under the _perf key and removed by the extractor before the row is written.
+    """
+
+    def __init__(self, n_files=1) -> None:
+        self.perf = {"files": n_files, "bytes_read": 0, "bytes_written": 0}
+
+    @contextmanager
+    def stage(self, name):
+        t_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.perf[name] = self.perf.get(name, 0.0) + time.perf_counter() - t_start
+
+    def add(self, key, value):
+        self.perf[key] = self.perf.get(key, 0) + value
+
+    def decoded(self, transfer_syntax, plugin, seconds, files=1):
+        """Pixel decode time of files by transfer syntax and decoder plugin"""
+        by_plugin = self.perf.setdefault("pixel_decode", {}).setdefault(str(transfer_syntax), {})
+        files_total, seconds_total = by_plugin.get(str(plugin), (0, 0.0))
+        by_plugin[str(plugin)] = (files_total + files, seconds_total + seconds)
+
+
+def _stats(values) -> dict:
+    arr = np.frombuffer(values, dtype=np.float64)
+    return {
+        "p50": float(np.percentile(arr, 50)),
+        "p95": float(np.percentile(arr, 95)),
+        "max": float(arr.max()),
+        "total": float(arr.sum()),
+    }
+
+
+class PerfReport:
+    """Aggregates the per task timings by storage class and writes performance_report.json"""
+
+    def __init__(self) -> None:
+        self.stage_times = defaultdict(lambda: defaultdict(lambda: array("d")))
+        self.counts = defaultdict(lambda: defaultdict(int))
+        # seconds per file of every task by transfer syntax and decoder plugin
+        self.decode_times = defaultdict(lambda: defaultdict(lambda: array("d")))
+        self.decode_files = defaultdict(lambda: defaultdict(int))
+
+    def add(self, store_class, perf: dict):
+        counts = self.counts[str(store_class)]
+        counts["tasks"] += 1
+        task_time = 0.0
+        for key, value in perf.items():
+            if key == "pixel_decode":
+                self._add_decode(value)
+            elif key in STAGES:
+                self.stage_times[str(store_class)][key].append(value)
+                task_time += value
+            else:
+                counts[key] += value
+        self.stage_times[str(store_class)]["task"].append(task_time)
+
+    def merge(self, other: "PerfReport"):
+        """Adds the timings collected by another report (e.g. of a worker)"""
+        for store_class, times in other.stage_times.items():
+            for name, values in times.items():
+                self.stage_times[store_class][name].extend(values)
+        for store_class, counts in other.counts.items():
+            for key, value in counts.items():
+                self.counts[store_class][key] += value
+        for uid, by_plugin in other.decode_times.items():
+            for plugin, values in by_plugin.items():
+                self.decode_times[uid][plugin].extend(values)
+                self.decode_files[uid][plugin] += other.decode_files[uid][plugin]
+
+    def __getstate__(self):
+        # the defaultdict factories are lambdas which can't be pickled
+        return {
+            name: {k: dict(v) for k, v in getattr(self, name).items()}
+            for name in ("stage_times", "counts", "decode_times", "decode_files")
+        }
+
+    def __setstate__(self, state):
+        self.__init__()
+        for name, values in state.items():
+            for k, v in values.items():
+                getattr(self, name)[k].update(v)
+
+    def _add_decode(self, pixel_decode):
+        for uid, by_plugin in pixel_decode.items():
+            for plugin, (files, seconds) in by_plugin.items():
+                if files:
+                    self.decode_times[uid][plugin].append(seconds / files)
+                    self.decode_files[uid][plugin] += files
+
+    def decode_summary(self) -> dict:
+        """Decode time per file by transfer syntax and decoder plugin"""
+        syntaxes = {}
+        for uid, by_plugin in self.decode_times.items():
+            syntaxes[uid] = {
+                "name": UID(uid).name,
+                "decoders": {
+                    plugin: {"files": self.decode_files[uid][plugin], **_stats(times)}
+                    for plugin, times in by_plugin.items()
+                },
+            }
+        return syntaxes
+
+    def summary(self) -> dict:
+        classes = {}
+        for store_class, counts in self.counts.items():
+            times = self.stage_times[store_class]
+            task_total = float(np.frombuffer(times["task"], dtype=np.float64).sum())
+            classes[store_class] = {
+                "tasks": counts["tasks"],
+                "files": counts["files"],
+                "bytes_read": counts["bytes_read"],
+                "bytes_written": counts["bytes_written"],
+                # throughput of a single worker, the run level rate is in files_per_sec
+                "files_per_worker_sec": counts["files"] / task_total if task_total else 0.0,
+                "stages": {name: _stats(times[name]) for name in ("task",) + STAGES if times[name]},
+            }
+        return classes
+
+    def write(self, report_path, run_timings: dict, extra=None):
+        """run_timings: wall clock seconds of the phases of the run (discovery, extraction, ...)"""
+        classes = self.summary()
+        files = sum(e["files"] for e in classes.values())
+        extraction_time = run_timings.get("extraction", 0.0)
+        report = {
+            "run": run_timings,
+            "files": files,
+            "files_per_sec": files / extraction_time if extraction_time else 0.0,
+            "storage_classes": classes,
+        }
+        if self.decode_times:
+            report["transfer_syntaxes"] = self.decode_summary()
+        if extra:
+            report.update(extra)
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        return report
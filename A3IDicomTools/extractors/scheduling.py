@@ -0,0 +1,57 @@
+import heapq
+from typing import Iterator, List, Tuple
+
+from .inventory import _CLASS_ORDER
+
+# rough cost of a task in seconds. Only the relative values matter: they decide the order in which
+# tasks are dispatched and how many cheap tasks share a chunk
+_HEADER_COST = 0.003
+_IMAGE_COST_PER_MB = {"MRCT": 0.05, "TOMO": 0.08, "XRAY": 0.04}
+
+
+def estimate_cost(store_class, size, n_files=1, print_images=True) -> float:
+    """
+    Estimated run time of a task: a fixed header cost per file plus, when images are written,
+    a decode/encode cost proportional to the pixel data of the storage class
+    """
+    cost = n_files * _HEADER_COST
+    if print_images:
+        cost += size / 2**20 * _IMAGE_COST_PER_MB.get(store_class, 0)
+    return cost
+
+
+def _costed(index, store_class, group_series, print_images):
+    """(-cost, sequence number, task) of a storage class, most expensive first"""
+    for i, (dcm, size) in enumerate(index.iter_pending_by_size(store_class, group_series)):
+        n_files = len(dcm) if isinstance(dcm, list) else 1
+        cost = estimate_cost(store_class, size, n_files, print_images)
+        yield -cost, i, (store_class, dcm)
+
+
+def plan_tasks(
+    index, print_images=True, series_classes=(), chunk_cost=0.25
+) -> Iterator[List[Tuple[str, object]]]:
+    """
+    Longest processing time first schedule of the pending work of index. Yields batches of
+    (storage_class, path or [paths]) tasks: tasks estimated to cost at least chunk_cost seconds
+    are dispatched on their own, cheaper tasks (header only work) are packed together until a
+    batch reaches chunk_cost so they don't pay the IPC overhead of a task each.
+    The storage classes are sorted by sqlite and merged lazily, nothing is held in memory.
+    """
+    streams = [
+        _costed(index, store_class, store_class in series_classes, print_images)
+        for store_class in _CLASS_ORDER
+    ]
+    batch, batch_cost = [], 0.0
+    for neg_cost, _, task in heapq.merge(*streams):
+        cost = -neg_cost
+        if cost >= chunk_cost:
+            yield [task]
+            continue
+        batch.append(task)
+        batch_cost += cost
+        if batch_cost >= chunk_cost:
+            yield batch
+            batch, batch_cost = [], 0.0
+    if batch:
+        yield batch
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+import re
+from glob import glob
+from typing import Dict, List
+
+_SHARD_DIR = re.compile(r"shard_(\d+)_of_(\d+)$")
+
+
+def shard_of(key, shard_count) -> int:
+    """
+    Shard of a StudyInstanceUID (or of a path for files without one). Uses a stable hash so every
+    node computes the same partition, python's hash() is salted per process.
+    """
+    digest = hashlib.blake2b(str(key).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shard_count
+
+
+def record_shard(record, shard_count) -> int:
+    """Shard of an index record. Every file of a study, hence of a series, lands on the same shard"""
+    return shard_of(record.get("study_uid") or record["path"], shard_count)
+
+
+def validate_shard(shard_index, shard_count):
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise ValueError(
+            f"ShardIndex must be in [0, ShardCount) got ShardIndex={shard_index} ShardCount={shard_count}"
+        )
+
+
+def shard_directory(output_directory, shard_index, shard_count) -> str:
+    """Namespace of a shard under OutputDirectory. Unsharded runs use OutputDirectory itself"""
+    if shard_count == 1:
+        return str(output_directory)
+    return os.path.join(output_directory, f"shard_{shard_index}_of_{shard_count}")
+
+
+def find_shards(output_directory) -> Dict[int, str]:
+    """Shard directories of output_directory by shard index. All of them must share a shard count"""
+    shards, counts = {}, set()
+    for shard_dir in sorted(glob(os.path.join(output_directory, "shard_*_of_*"))):
+        match = _SHARD_DIR.search(shard_dir)
+        if match is None or not os.path.isdir(shard_dir):
+            continue
+        shards[int(match.group(1))] = shard_dir
+        counts.add(int(match.group(2)))
+    if len(counts) > 1:
+        raise ValueError(f"Shards of different ShardCount found in {output_directory}: {sorted(counts)}")
+    if counts:
+        missing = sorted(set(range(counts.pop())) - set(shards))
+        if missing:
+            raise FileNotFoundError(f"Shards {missing} are missing from {output_directory}")
+    return shards
+
+
+def merge_reports(report_files: List[str], destination) -> dict:
+    """
+    Combines the performance reports of the shards. Counts are summed, the run time of the
+    sharded extraction is the one of the slowest shard. Per stage percentiles can't be combined
+    so the shard reports are kept as they are under shards.
+    """
+    shards = {}
+    for report_file in report_files:
+        with open(report_file) as f:
+            shards[os.path.basename(os.path.dirname(report_file))] = json.load(f)
+    run_keys = {k for e in shards.values() for k in e.get("run", {})}
+    report = {
+        "run": {k: max(e.get("run", {}).get(k, 0.0) for e in shards.values()) for k in run_keys},
+        "files": sum(e.get("files", 0) for e in shards.values()),
+        "shards": shards,
+    }
+    extraction_time = report["run"].get("extraction", 0.0)
+    report["files_per_sec"] = report["files"] / extraction_time if extraction_time else 0.0
+    with open(destination, "w") as f:
+        json.dump(report, f, indent=2)
+    return report
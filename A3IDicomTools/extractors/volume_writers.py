@@ -0,0 +1,215 @@
+import gzip
+import io
+import os
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# size of the independently compressed members of parallel_gzip
+_BLOCK_SIZE = 1 << 20
+
+
+def _no_compression(data, level, threads):
+    return data
+
+
+def _gzip(data, level, threads):
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _parallel_gzip(data, level, threads):
+    """
+    Compresses fixed size blocks on a thread pool (zlib releases the GIL) and concatenates them as
+    gzip members. Multi member files are valid gzip and are read by gzip, nibabel and zcat.
+    """
+    if threads <= 1 or len(data) <= _BLOCK_SIZE:
+        return _gzip(data, level, threads)
+    view = memoryview(data)
+    blocks = [view[i : i + _BLOCK_SIZE] for i in range(0, len(view), _BLOCK_SIZE)]
+    with ThreadPoolExecutor(threads) as ex:
+        members = ex.map(lambda block: gzip.compress(block, compresslevel=level, mtime=0), blocks)
+        return b"".join(members)
+
+
+_CODECS = {"gzip": _gzip, "none": _no_compression, "parallel_gzip": _parallel_gzip}
+
+
+def volume_codecs():
+    return list(_CODECS)
+
+
+def volume_extension(codec) -> str:
+    return ".nii" if codec == "none" else ".nii.gz"
+
+
+def write_volume(nii, save_path, codec="gzip", level=1, threads=1, timer=None) -> dict:
+    """
+    Writes a nibabel image with the given codec. Returns the encode time (serialization and
+    compression) and the compression ratio so they can be stored with the metadata.
+    The volume is serialized and compressed slab by slab with a VolumeStreamWriter, a copy of the
+    whole volume is only made when nibabel has to scale the data to the header's dtype.
+    codec: none (.nii), gzip or parallel_gzip (.nii.gz)
+    level: gzip level, nibabel's default is 1
+    threads: threads used by parallel_gzip
+    timer: optional perf.StageTimer receiving the encode and write stages
+    """
+    arr = np.asanyarray(nii.dataobj)
+    dtype = nii.header.get_data_dtype()
+    if arr.ndim < 3 or not np.can_cast(arr.dtype, dtype, "safe"):
+        return _write_serialized(nii, save_path, codec, level, threads, timer)
+    with VolumeStreamWriter(nii, save_path, codec, level, threads, timer) as stream:
+        # the last axis varies slowest on disk (Fortran order)
+        for index in np.ndindex(arr.shape[3:][::-1]):
+            volume = arr[(...,) + index[::-1]]
+            for k in range(volume.shape[2]):
+                stream.write(np.ascontiguousarray(volume[:, :, k].T, dtype=dtype))
+    return stream.close()
+
+
+def _write_serialized(nii, save_path, codec, level, threads, timer):
+    """write_volume of an image serialized by nibabel in a single buffer"""
+    t_start = time.perf_counter()
+    raw = nii.to_bytes()
+    data = _CODECS[codec](raw, level, threads)
+    t_encoded = time.perf_counter()
+    encode_time = t_encoded - t_start
+    with open(save_path, "wb") as f:
+        f.write(data)
+    if timer is not None:
+        timer.add("encode", encode_time)
+        timer.add("write", time.perf_counter() - t_encoded)
+        timer.add("bytes_written", len(data))
+    return {
+        "image_encode_time": encode_time,
+        "image_compression_ratio": len(raw) / len(data),
+    }
+
+
+def nifti_header_bytes(nii) -> bytes:
+    """
+    Header, extensions and padding up to vox_offset of a single file nifti, as written by
+    nibabel for an unscaled image. The data of nii is not touched, only its shape and dtype.
+    """
+    header = nii.header.copy()
+    header.set_slope_inter(1, 0)
+    buff = io.BytesIO()
+    header.write_to(buff)
+    header.extensions.write_to(buff, False)
+    offset = int(header.get_data_offset())
+    return buff.getvalue() + b"\0" * (offset - buff.tell())
+
+
+def stub_volume(shape, dtype) -> np.ndarray:
+    """Read only array of the given shape and dtype that uses no memory, to build headers/affines"""
+    return np.broadcast_to(np.zeros((), dtype=dtype), shape)
+
+
+class VolumeStreamWriter:
+    """
+    Writes a nifti volume slab by slab so it never has to be held in memory. Slabs are appended in
+    the on disk (Fortran) order of the volume: for a (columns, rows, frames) volume every frame in
+    C order (rows, columns) is one slab. The output is the same as write_volume with the same codec.
+
+    nii: image whose header (shape, dtype, affine) is written. Its data is not used
+    codec, level, threads, timer: see write_volume
+    """
+
+    def __init__(self, nii, save_path, codec="gzip", level=1, threads=1, timer=None) -> None:
+        self.codec = codec
+        self.level = level
+        self.timer = timer
+        self.raw_bytes = 0
+        self.written_bytes = 0
+        self.encode_time = 0.0
+        self.write_time = 0.0
+        self._file = open(save_path, "wb")
+        self._compressor = None
+        self._pool = None
+        self._pending = deque()
+        self._block = bytearray()
+        self._stats = None
+        if codec == "gzip" or (codec == "parallel_gzip" and threads <= 1):
+            # single gzip member, same content as gzip.compress
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif codec == "parallel_gzip":
+            self._pool = ThreadPoolExecutor(threads)
+            self._max_pending = 2 * threads
+        self.write(nifti_header_bytes(nii))
+
+    def _write_out(self, data):
+        t_start = time.perf_counter()
+        self._file.write(data)
+        self.write_time += time.perf_counter() - t_start
+        self.written_bytes += len(data)
+
+    def _drain(self, keep):
+        while len(self._pending) > keep:
+            fut = self._pending.popleft()
+            t_start = time.perf_counter()
+            member = fut.result()
+            self.encode_time += time.perf_counter() - t_start
+            self._write_out(member)
+
+    def _submit_block(self, block):
+        self._pending.append(
+            self._pool.submit(gzip.compress, block, compresslevel=self.level, mtime=0)
+        )
+        # keeps at most 2 * threads blocks in memory
+        self._drain(self._max_pending)
+
+    def write(self, data):
+        data = memoryview(data).cast("B")
+        self.raw_bytes += len(data)
+        if self._pool is not None:
+            self._block += data
+            while len(self._block) >= _BLOCK_SIZE:
+                self._submit_block(bytes(self._block[:_BLOCK_SIZE]))
+                del self._block[:_BLOCK_SIZE]
+            return
+        if self._compressor is not None:
+            t_start = time.perf_counter()
+            data = self._compressor.compress(data)
+            self.encode_time += time.perf_counter() - t_start
+        if data:
+            self._write_out(data)
+
+    def close(self) -> dict:
+        """Flushes the volume. Returns the same stats as write_volume, closing again returns them"""
+        if self._stats is not None:
+            return self._stats
+        if self._pool is not None:
+            if self._block:
+                self._submit_block(bytes(self._block))
+            self._drain(0)
+            self._pool.shutdown()
+        elif self._compressor is not None:
+            t_start = time.perf_counter()
+            tail = self._compressor.flush()
+            self.encode_time += time.perf_counter() - t_start
+            self._write_out(tail)
+        self._file.close()
+        if self.timer is not None:
+            self.timer.add("encode", self.encode_time)
+            self.timer.add("write", self.write_time)
+            self.timer.add("bytes_written", self.written_bytes)
+        self._stats = {
+            "image_encode_time": self.encode_time,
+            "image_compression_ratio": self.raw_bytes / self.written_bytes,
+        }
+        return self._stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # a partial volume is not left behind
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+            self._file.close()
+            os.remove(self._file.name)
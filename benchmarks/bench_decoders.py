@@ -0,0 +1,161 @@
+"""
+Decode time of every installed pydicom decoder plugin per transfer syntax. Runs on a sample of an
+archive (--samples) or on synthetic images compressed with the encoders that are installed. The
+ranking of the result file (fastest plugin first) can be passed to the extractor as DecoderPlugins.
+
+    python -m benchmarks.bench_decoders --samples /path/to/DICOMHome --out decoders.json
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+
+import pydicom as pyd
+from pydicom.pixels.encoders.base import get_encoder
+from pydicom.uid import UID, ExplicitVRLittleEndian
+
+from A3IDicomTools.extractors.decoders import decoding_options, decoder_candidates, transfer_syntax
+
+from .run_suite import environment
+from .synthetic import cr_image, write_dataset
+
+# transfer syntaxes compressed for the synthetic samples when an encoder is installed
+SYNTHETIC_SYNTAXES = (
+    "1.2.840.10008.1.2.5",  # RLE Lossless
+    "1.2.840.10008.1.2.4.70",  # JPEG Lossless SV1
+    "1.2.840.10008.1.2.4.80",  # JPEG-LS Lossless
+    "1.2.840.10008.1.2.4.90",  # JPEG 2000 Lossless
+    "1.2.840.10008.1.2.4.201",  # HTJ2K Lossless
+)
+
+# gdcm encodes the syntaxes pydicom has no encoder for
+_GDCM_SYNTAXES = {
+    "1.2.840.10008.1.2.4.70": "JPEGLosslessProcess14_1",
+    "1.2.840.10008.1.2.4.80": "JPEGLSLossless",
+    "1.2.840.10008.1.2.4.90": "JPEG2000Lossless",
+}
+
+
+def find_samples(root, per_syntax):
+    """Up to per_syntax files of every transfer syntax found under root"""
+    samples = defaultdict(list)
+    for dir_path, _, files in os.walk(root):
+        for name in files:
+            dcm_path = os.path.join(dir_path, name)
+            try:
+                ds = pyd.dcmread(dcm_path, stop_before_pixels=True)
+            except Exception:
+                continue
+            uid = transfer_syntax(ds)
+            if "PixelData" in ds and len(samples[uid]) < per_syntax:
+                samples[uid].append(dcm_path)
+    return samples
+
+
+def _gdcm_compress(src, dst, uid):
+    """Transcodes src to uid with gdcm. False when gdcm is not installed or can't encode uid"""
+    try:
+        import gdcm
+    except ImportError:
+        return False
+    if str(uid) not in _GDCM_SYNTAXES:
+        return False
+    reader = gdcm.ImageReader()
+    reader.SetFileName(src)
+    change = gdcm.ImageChangeTransferSyntax()
+    change.SetTransferSyntax(gdcm.TransferSyntax(getattr(gdcm.TransferSyntax, _GDCM_SYNTAXES[str(uid)])))
+    if not reader.Read():
+        return False
+    change.SetInput(reader.GetImage())
+    if not change.Change():
+        return False
+    writer = gdcm.ImageWriter()
+    writer.SetFileName(dst)
+    writer.SetFile(reader.GetFile())
+    writer.SetImage(change.GetOutput())
+    return writer.Write()
+
+
+def _encoder_available(uid):
+    try:
+        return get_encoder(uid).is_available
+    except NotImplementedError:
+        return False
+
+
+def synthetic_samples(root, rows=2048, cols=1670):
+    """A DX image stored natively and in every SYNTHETIC_SYNTAXES pydicom or gdcm can encode"""
+    native = write_dataset(cr_image(rows, cols), os.path.join(root, "native.dcm"))
+    samples = {ExplicitVRLittleEndian: [native]}
+    for uid in map(UID, SYNTHETIC_SYNTAXES):
+        dcm_path = os.path.join(root, f"{uid.keyword}.dcm")
+        if _encoder_available(uid):
+            ds = cr_image(rows, cols)
+            ds.compress(uid)
+            samples[uid] = [write_dataset(ds, dcm_path)]
+        elif _gdcm_compress(native, dcm_path, uid):
+            samples[uid] = [dcm_path]
+    return samples
+
+
+def time_plugin(paths, plugin, repeat):
+    """Seconds per file to decode paths with plugin"""
+    elapsed = 0.0
+    for _ in range(repeat):
+        for dcm_path in paths:
+            ds = pyd.dcmread(dcm_path)
+            ds.pixel_array_options(**decoding_options(plugin))
+            t_start = time.perf_counter()
+            ds.pixel_array
+            elapsed += time.perf_counter() - t_start
+    return elapsed / (repeat * len(paths))
+
+
+def run(samples, repeat=3):
+    results, ranking = {}, {}
+    for uid, paths in samples.items():
+        decoders = {}
+        for plugin in decoder_candidates(uid):
+            try:
+                decoders[str(plugin)] = {"sec_per_file": time_plugin(paths, plugin, repeat)}
+            except Exception as error:
+                decoders[str(plugin)] = {"error": str(error)}
+        results[str(uid)] = {"name": UID(uid).name, "files": len(paths), "decoders": decoders}
+        timed = [e for e in decoders if "sec_per_file" in decoders[e]]
+        if UID(uid).is_compressed and timed:
+            ranking[str(uid)] = sorted(timed, key=lambda e: decoders[e]["sec_per_file"])
+    return results, ranking
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pixel decoder benchmark")
+    parser.add_argument(
+        "--samples", default=None, help="directory of dicoms, synthetic images if not set"
+    )
+    parser.add_argument("--per-syntax", type=int, default=20, help="files decoded per transfer syntax")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default="decoders.json")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.samples:
+            samples = find_samples(args.samples, args.per_syntax)
+        else:
+            samples = synthetic_samples(tmp_dir)
+        results, ranking = run(samples, args.repeat)
+    for uid, res in results.items():
+        for plugin, timing in res["decoders"].items():
+            if "sec_per_file" in timing:
+                value = f"{timing['sec_per_file'] * 1000:10.2f} ms/file"
+            else:
+                value = timing["error"]
+            print(f"{res['name'][:48]:>48} {plugin:>10}: {value}")
+    with open(args.out, "w") as f:
+        json.dump(
+            {"environment": environment(), "results": results, "ranking": ranking}, f, indent=2
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Work left to the main process per file in metadata only runs: unpickling the results of the
+workers, collecting the rows and building the frame of every metadata batch. Compares the row dict
+per file transport against ColumnBatch. The rows are extracted once beforehand, the time spent in
+the workers is not included.
+
+    python -m benchmarks.bench_metadata_transport --files 3000
+"""
+import argparse
+import os
+import pickle
+import tempfile
+import time
+
+from A3IDicomTools.extractors.GeneralExtractor import (
+    StorageClass,
+    extract_columns,
+    general_extract,
+)
+from A3IDicomTools.extractors.columnar import ColumnBatch
+from A3IDicomTools.extractors.meta_writers import rows_frame
+from A3IDicomTools.extractors.perf import PerfReport
+
+from .run_suite import make_config
+from .synthetic import cr_image, ct_slice, other_with_private, write_dataset
+
+
+def build_files(root, n_files):
+    builders = [lambda i: ct_slice(i % 64, size=64), lambda i: cr_image(64, 64), lambda i: other_with_private(64)]
+    classes = [StorageClass.MRCT, StorageClass.XRAY, StorageClass.OTHER]
+    tasks = []
+    for i in range(n_files):
+        dcm_path = write_dataset(builders[i % 3](i), os.path.join(root, f"{i}.dcm"))
+        tasks.append((classes[i % 3], dcm_path))
+    return tasks
+
+
+def parent_rows(payloads, save_batch_size):
+    """The main process of MetadataBatchSize 0: a pickled list of row dicts per file"""
+    perf_report, meta_rows = PerfReport(), []
+    for payload in payloads:
+        for dcm_meta in pickle.loads(payload):
+            perf = dcm_meta.pop("_perf", None)
+            if perf is not None:
+                perf_report.add(perf.pop("storage_class", StorageClass.OTHER), perf)
+            meta_rows.append(dcm_meta)
+        if len(meta_rows) >= save_batch_size:
+            rows_frame(meta_rows)
+            meta_rows = []
+
+
+def parent_columns(payloads, save_batch_size):
+    """The main process of MetadataBatchSize > 0: a pickled ColumnBatch per task"""
+    perf_report, meta_rows = PerfReport(), ColumnBatch()
+    for payload in payloads:
+        batch = pickle.loads(payload)
+        perf_report.merge(batch.perf)
+        batch.column("file")
+        meta_rows.extend(batch)
+        if len(meta_rows) >= save_batch_size:
+            rows_frame(meta_rows)
+            meta_rows = ColumnBatch()
+
+
+def run(n_files=3000, batch_size=256, save_batch_size=500, repeat=3):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tasks = build_files(tmp_dir, n_files)
+        config = make_config(tmp_dir, tmp_dir, SaveImages=False)
+        kwargs = {"save_dir": tmp_dir, "print_images": False, "config": config}
+        row_payloads = [pickle.dumps(general_extract(e, **kwargs)) for e in tasks]
+        column_payloads = [
+            pickle.dumps(extract_columns(tasks[i : i + batch_size], **kwargs))
+            for i in range(0, n_files, batch_size)
+        ]
+        for name, func, payloads in (
+            ("rows", parent_rows, row_payloads),
+            ("columns", parent_columns, column_payloads),
+        ):
+            t_start = time.perf_counter()
+            for _ in range(repeat):
+                func(payloads, save_batch_size)
+            elapsed = (time.perf_counter() - t_start) / repeat
+            results[name] = {
+                "parent_sec_per_1000_files": elapsed / n_files * 1000,
+                "bytes_per_file": sum(len(e) for e in payloads) / n_files,
+                "messages": len(payloads),
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Metadata transport benchmark")
+    parser.add_argument("--files", type=int, default=3000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    for name, res in run(args.files, args.batch_size, repeat=args.repeat).items():
+        print(
+            f"{name:>8}: {res['parent_sec_per_1000_files'] * 1000:8.1f} ms per 1000 files in the "
+            f"main process, {res['bytes_per_file']:8.0f} bytes/file, {res['messages']} messages"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Time and peak memory (tracemalloc) per image of process_image against the float64 implementation
+it replaced, on large DR/mammography images.
+
+    python -m benchmarks.bench_pixel_pipeline --repeat 3
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pydicom as pyd
+from pydicom import pixels as pyd_pixels
+
+from A3IDicomTools.extractors.functional_extractors import process_image
+
+from .synthetic import cr_image, write_dataset
+
+
+def legacy_process_image(ds, is16Bit=True):
+    image_2d = ds.pixel_array
+    image_2d = pyd_pixels.apply_voi_lut(image_2d, ds, prefer_lut=True)
+    image_2d = image_2d.astype(float)
+    shape = ds.pixel_array.shape
+    if is16Bit:
+        image_2d_scaled = (np.maximum(image_2d, 0) / image_2d.max()) * (2**16 - 1)
+        image_2d_scaled = np.uint16(image_2d_scaled)
+    else:
+        image_2d_scaled = (np.maximum(image_2d, 0) / image_2d.max()) * 255.0
+        image_2d_scaled = np.uint8(image_2d_scaled)
+    return image_2d_scaled, shape
+
+
+def _measure(func, dcm_path, repeat):
+    """Seconds per image and peak traced memory relative to the decoded image size"""
+    elapsed, peak_ratio = 0.0, 0.0
+    for _ in range(repeat):
+        ds = pyd.dcmread(dcm_path)
+        decoded_bytes = ds.Rows * ds.Columns * ds.BitsAllocated // 8
+        tracemalloc.start()
+        t_start = time.perf_counter()
+        func(ds)
+        elapsed += time.perf_counter() - t_start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        peak_ratio = max(peak_ratio, peak / decoded_bytes)
+    return elapsed / repeat, peak_ratio
+
+
+def run(repeat=3):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        images = {"dr_windowed": cr_image(3000, 3000), "mammo_raw": cr_image(4096, 3328)}
+        # no VOI attributes, the raw pixel values are rescaled
+        del images["mammo_raw"].WindowCenter, images["mammo_raw"].WindowWidth
+        for name, ds in images.items():
+            dcm_path = write_dataset(ds, os.path.join(tmp_dir, f"{name}.dcm"))
+            results[name] = {
+                "legacy": _measure(legacy_process_image, dcm_path, repeat),
+                "process_image": _measure(process_image, dcm_path, repeat),
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pixel pipeline benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    for name, res in run(args.repeat).items():
+        for impl, (sec, peak_ratio) in res.items():
+            print(f"{name:>12} {impl:>13}: {sec:6.3f} s/img  peak {peak_ratio:5.1f}x decoded size")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Seconds per image and output size of the numpy png encoder against the pypng path it replaced,
+on mammography sized images.
+
+    python -m benchmarks.bench_png_encoding --repeat 3
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+import png
+
+from A3IDicomTools.extractors.functional_extractors import rgb_store_format
+from A3IDicomTools.extractors.image_encoders import encode_png
+
+
+def mammo_grey(rows=3328, cols=2560):
+    """16 bit image with a smooth breast like blob on a black background"""
+    y, x = np.mgrid[0:rows, 0:cols]
+    blob = np.clip(1 - ((y - rows / 2) / (rows / 2)) ** 2 - (x / cols) ** 2, 0, 1)
+    noise = np.random.default_rng(0).integers(0, 512, size=(rows, cols))
+    return (blob * 60000 + noise * (blob > 0)).astype(np.uint16)
+
+
+def photo_rgb(rows=3000, cols=2500):
+    grey = (mammo_grey(rows, cols) >> 8).astype(np.uint8)
+    return np.stack([grey, grey[::-1], grey[:, ::-1]], axis=-1)
+
+
+def pypng_encode(arr, bit_depth):
+    is_rgb = arr.ndim == 3
+    rows = rgb_store_format(arr) if is_rgb else arr
+    buff = io.BytesIO()
+    w = png.Writer(arr.shape[1], arr.shape[0], greyscale=not is_rgb, bitdepth=bit_depth)
+    w.write(buff, rows)
+    return buff.getvalue()
+
+
+def _time(func, repeat):
+    t_start = time.perf_counter()
+    for _ in range(repeat):
+        out = func()
+    return (time.perf_counter() - t_start) / repeat, len(out)
+
+
+def run(repeat=3):
+    images = {"grey16": (mammo_grey(), 16), "rgb8": (photo_rgb(), 8)}
+    results = {}
+    for name, (arr, bit_depth) in images.items():
+        res = {"pypng": _time(lambda: pypng_encode(arr, bit_depth), repeat)}
+        for level in (1, 6):
+            res[f"numpy_level{level}"] = _time(
+                lambda: encode_png(arr, bit_depth, compression_level=level), repeat
+            )
+        results[name] = res
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PNG encoding benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    for name, res in run(args.repeat).items():
+        base_sec = res["pypng"][0]
+        for encoder, (sec, size) in res.items():
+            print(
+                f"{name:>7} {encoder:>13}: {sec:7.3f} s/img  {size / 2**20:7.2f} MiB  "
+                f"x{base_sec / sec:.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
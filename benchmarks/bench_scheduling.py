@@ -0,0 +1,136 @@
+"""
+Wall clock of run_extraction on a synthetic mixed modality tree (synthetic.build_corpus) with and
+without CostScheduling. Each run extracts the same tree into its own OutputDirectory, the
+extraction time is taken from its performance_report.json.
+
+    python -m benchmarks.bench_scheduling --scale 4 --workers 4
+
+--model only checks the scheduling model, it does not measure anything: class ordered dispatch
+with one task per message is compared to plan_tasks on a larger simulated tree (a real
+InventoryIndex filled with synthetic records). Task run times are the scheduler's own cost estimate
+perturbed by +-30% and every message pays a fixed IPC overhead, so the result only shows what the
+schedule gains if the cost model is right.
+
+    python -m benchmarks.bench_scheduling --model --workers 12
+"""
+import argparse
+import heapq
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from A3IDicomTools.extractors.inventory import InventoryIndex
+from A3IDicomTools.extractors.PngExtractor import ExtractorRegister
+from A3IDicomTools.extractors.scheduling import estimate_cost, plan_tasks
+
+from .run_suite import make_config
+from .synthetic import build_corpus
+
+MB = 2**20
+
+
+def mixed_tree_records(rng):
+    records = []
+
+    def add(path, store_class, size, series_uid=None):
+        record = {"path": path, "size": int(size), "mtime": 0, "storage_class": store_class}
+        record["series_uid"] = series_uid
+        records.append(record)
+
+    # mostly small CT/MR series with a few thin slice acquisitions
+    for s in range(60):
+        n_slices = 2000 if s % 20 == 19 else rng.integers(30, 300)
+        for i in range(n_slices):
+            add(f"ct/{s}/{i}.dcm", "MRCT", 0.5 * MB, f"1.2.{s}")
+    for t in range(20):
+        add(f"tomo/{t}.dcm", "TOMO", rng.integers(50, 450) * MB)
+    for x in range(400):
+        add(f"xray/{x}.dcm", "XRAY", rng.integers(10, 30) * MB)
+    for o in range(30000):
+        add(f"other/{o}.dcm", "OTHER", 50_000)
+    return records
+
+
+def simulate(batches, sizes, workers, ipc_overhead, print_images, rng):
+    """Greedy dispatch of the batches to the first free worker, like imap_unordered"""
+    free_at = [0.0] * workers
+    for batch in batches:
+        run_time = ipc_overhead
+        for store_class, dcm in batch:
+            paths = dcm if isinstance(dcm, list) else [dcm]
+            size = sum(sizes[str(e)] for e in paths)
+            cost = estimate_cost(store_class, size, len(paths), print_images)
+            run_time += cost * rng.uniform(0.7, 1.3)
+        heapq.heappush(free_at, heapq.heappop(free_at) + run_time)
+    return max(free_at)
+
+
+def run(scale=2, workers=4, print_images=True):
+    """Extraction time of the same tree with class ordered and cost aware dispatch"""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_root = os.path.join(tmp_dir, "corpus")
+        build_corpus(corpus_root, scale=scale)
+        for name, cost_scheduling in (("class_order_sec", False), ("cost_aware_sec", True)):
+            config = make_config(
+                corpus_root,
+                os.path.join(tmp_dir, name),
+                NumProcesses=workers,
+                SaveImages=print_images,
+                CostScheduling=cost_scheduling,
+            )
+            extractor = ExtractorRegister.build_extractor(config)
+            extractor.execute()
+            with open(extractor.perf_report_file) as f:
+                results[name] = json.load(f)["run"]["extraction"]
+    return results
+
+
+def run_model(workers=12, ipc_overhead=0.0015, print_images=True, seed=0):
+    rng = np.random.default_rng(seed)
+    records = mixed_tree_records(rng)
+    sizes = {e["path"]: e["size"] for e in records}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index = InventoryIndex(os.path.join(tmp_dir, "index.sqlite"))
+        index.start_scan()
+        index.add_records(records)
+        series_classes = ("MRCT",)
+        legacy = ([e] for e in index.iter_pending(series_classes=series_classes))
+        legacy_wall = simulate(
+            legacy, sizes, workers, ipc_overhead, print_images, np.random.default_rng(seed)
+        )
+        planned = plan_tasks(index, print_images=print_images, series_classes=series_classes)
+        planned_wall = simulate(
+            planned, sizes, workers, ipc_overhead, print_images, np.random.default_rng(seed)
+        )
+        index.close()
+    return {"class_order_sec": legacy_wall, "cost_aware_sec": planned_wall}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scheduling benchmark")
+    parser.add_argument("--scale", type=int, default=2, help="number of corpus units")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--no-images", action="store_true", help="metadata only run")
+    parser.add_argument(
+        "--model", action="store_true", help="simulate the schedule with the cost model instead"
+    )
+    parser.add_argument("--ipc-overhead", type=float, default=0.0015, help="seconds, --model only")
+    args = parser.parse_args()
+    if args.model:
+        res = run_model(args.workers, args.ipc_overhead, print_images=not args.no_images)
+        label = "simulated"
+    else:
+        res = run(args.scale, args.workers, print_images=not args.no_images)
+        label = "measured"
+    print(
+        f"{label}: class order {res['class_order_sec']:8.1f} s  "
+        f"cost aware {res['cost_aware_sec']:8.1f} s  "
+        f"x{res['class_order_sec'] / res['cost_aware_sec']:.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Rows/sec of extract_tags against the legacy extract_all_tags on the same headers.
+
+    python -m benchmarks.bench_tag_extraction --repeat 200
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pydicom as pyd
+
+from A3IDicomTools.extractors.extractUtils import extract_all_tags, extract_tags
+
+from .synthetic import cr_image, ct_slice, other_with_private, write_dataset
+
+
+def _rows_per_sec(func, dcms, repeat):
+    t_start = time.perf_counter()
+    for _ in range(repeat):
+        for dcm in dcms:
+            func(dcm)
+    return repeat * len(dcms) / (time.perf_counter() - t_start)
+
+
+def run(repeat=100):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        datasets = {
+            "ct": ct_slice(0, size=64),
+            "cr": cr_image(64, 64),
+            "other_private": other_with_private(),
+        }
+        for name, ds in datasets.items():
+            dcm_path = write_dataset(ds, os.path.join(tmp_dir, f"{name}.dcm"))
+            # a fresh read per run so element conversion is part of the measurement
+            dcms = [pyd.dcmread(dcm_path, stop_before_pixels=True) for _ in range(repeat)]
+            legacy = _rows_per_sec(extract_all_tags, dcms, 1)
+            dcms = [pyd.dcmread(dcm_path, stop_before_pixels=True) for _ in range(repeat)]
+            engine = _rows_per_sec(extract_tags, dcms, 1)
+            results[name] = {
+                "extract_all_tags_rows_per_sec": legacy,
+                "extract_tags_rows_per_sec": engine,
+                "speedup": engine / legacy,
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tag extraction benchmark")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    for name, res in run(args.repeat).items():
+        print(
+            f"{name:>14}: legacy {res['extract_all_tags_rows_per_sec']:9.1f} rows/s  "
+            f"engine {res['extract_tags_rows_per_sec']:9.1f} rows/s  x{res['speedup']:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Benchmark suite of the extractors on a synthetic corpus (see synthetic.build_corpus). Times the
+categorization, the tag extraction, every process_* function and a full GeneralExtractor.execute
+and saves the results as JSON. A previous result file can be passed with --compare to flag
+regressions.
+
+    python -m benchmarks.run_suite --out bench.json
+    python -m benchmarks.run_suite --out new.json --compare bench.json --tolerance 0.2
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pydicom as pyd
+
+from A3IDicomTools.configs import build_args
+from A3IDicomTools.extractors.extractUtils import extract_all_tags, extract_tags
+from A3IDicomTools.extractors.functional_extractors import (
+    process_ctmri,
+    process_ctmri_series,
+    process_general,
+    process_png,
+    process_tomo,
+)
+from A3IDicomTools.extractors.GeneralExtractor import read_dcm_record
+from A3IDicomTools.extractors.PngExtractor import ExtractorRegister
+
+from .synthetic import build_corpus
+
+
+def make_config(dicom_home, output_directory, **overrides):
+    """Default configuration of the extractor, as parsed from the command line"""
+    args = [
+        "--DICOMHome", str(dicom_home),
+        "--OutputDirectory", str(output_directory),
+        "--SaveBatchSize", "200",
+        "--SaveImages", "True",
+        "--NumProcesses", str(os.cpu_count() or 1),
+        "--PublicHeadersOnly", "True",
+        "--SpecificHeadersOnly", "False",
+        "--ApplyVOILUT", "True",
+        "--Extractor", "General",
+        "--Reorient", "False",
+        "--ApplyParentFilter", "False",
+    ]
+    config = vars(build_args().parse_args(args))
+    config.update(overrides)
+    return config
+
+
+def _time_calls(func, items, repeat):
+    """Runs func on every item repeat times. Returns seconds per call"""
+    t_start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            func(item)
+    elapsed = time.perf_counter() - t_start
+    calls = repeat * len(items)
+    return {"calls": calls, "sec_per_call": elapsed / calls, "calls_per_sec": calls / elapsed}
+
+
+def _headers(paths):
+    return [pyd.dcmread(e, stop_before_pixels=True) for e in paths]
+
+
+def run(scale=1, repeat=3):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_root = os.path.join(tmp_dir, "corpus")
+        corpus = build_corpus(corpus_root, scale=scale)
+        all_files = [e for paths in corpus.values() for e in paths]
+        out_dir = os.path.join(tmp_dir, "out")
+        save_dir = os.path.join(out_dir, "images")
+        os.makedirs(save_dir)
+        config = make_config(corpus_root, out_dir)
+
+        # unknown size/mtime, every file is read like on a first scan
+        results["read_dcm_record"] = _time_calls(
+            lambda e: read_dcm_record((e, None, None)), all_files, repeat
+        )
+        for kind in ("ct", "dx", "other"):
+            headers = _headers(corpus[kind])
+            results[f"extract_all_tags[{kind}]"] = _time_calls(extract_all_tags, headers, 1)
+            headers = _headers(corpus[kind])
+            results[f"extract_tags[{kind}]"] = _time_calls(extract_tags, headers, 1)
+
+        results["process_general"] = _time_calls(
+            lambda e: process_general(e, config=config), corpus["other"], repeat
+        )
+        for kind in ("dx", "mammo", "rgb"):
+            results[f"process_png[{kind}]"] = _time_calls(
+                lambda e: process_png(e, save_dir, True, config=config), corpus[kind], repeat
+            )
+        results["process_tomo"] = _time_calls(
+            lambda e: process_tomo(e, save_dir, True, config=config), corpus["tomo"], repeat
+        )
+        results["process_ctmri"] = _time_calls(
+            lambda e: process_ctmri(e, save_dir, True, config=config), corpus["ct"][:1], repeat
+        )
+        for kind in ("ct", "mr"):
+            series = [corpus[kind][i : i + 64] for i in range(0, len(corpus[kind]), 64)]
+            results[f"process_ctmri_series[{kind}]"] = _time_calls(
+                lambda e: process_ctmri_series(e, save_dir, True, config=config), series, repeat
+            )
+
+        t_start = time.perf_counter()
+        extractor = ExtractorRegister.build_extractor(make_config(corpus_root, out_dir + "_full"))
+        extractor.execute()
+        elapsed = time.perf_counter() - t_start
+        with open(extractor.perf_report_file) as f:
+            report = json.load(f)
+        results["GeneralExtractor.execute"] = {
+            "calls": 1,
+            "sec_per_call": elapsed,
+            "calls_per_sec": 1 / elapsed,
+            "files_per_sec": len(all_files) / elapsed,
+            "run": report["run"],
+        }
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "pydicom": pyd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Names of the benchmarks that got slower than baseline by more than tolerance"""
+    regressions = []
+    for name, res in results.items():
+        if name not in baseline:
+            continue
+        ratio = res["sec_per_call"] / baseline[name]["sec_per_call"]
+        flag = "REGRESSION" if ratio > 1 + tolerance else ""
+        print(f"{name:>32}: x{ratio:5.2f} of baseline {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extractor benchmark suite")
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--scale", type=int, default=1, help="number of corpus units")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--compare", default=None, help="previous result file")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    results = run(args.scale, args.repeat)
+    for name, res in results.items():
+        print(f"{name:>32}: {res['sec_per_call'] * 1000:10.2f} ms/call")
+    with open(args.out, "w") as f:
+        json.dump(
+            {"environment": environment(), "scale": args.scale, "results": results}, f, indent=2
+        )
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
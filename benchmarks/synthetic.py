@@ -0,0 +1,205 @@
+"""Synthetic dicom datasets used by the benchmarks."""
+import os
+
+import numpy as np
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+CT_SOP = "1.2.840.10008.5.1.4.1.1.2"
+MR_SOP = "1.2.840.10008.5.1.4.1.1.4"
+CR_SOP = "1.2.840.10008.5.1.4.1.1.1.1"
+MG_SOP = "1.2.840.10008.5.1.4.1.1.1.2"
+TOMO_SOP = "1.2.840.10008.5.1.4.1.1.13.1.3"
+SR_SOP = "1.2.840.10008.5.1.4.1.1.88.11"
+
+
+def base_dataset(sop_class_uid, patient_id="BENCH", study_uid=None, series_uid=None):
+    ds = Dataset()
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.MediaStorageSOPClassUID = sop_class_uid
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.SOPClassUID = sop_class_uid
+    ds.SOPInstanceUID = generate_uid()
+    ds.file_meta.MediaStorageSOPInstanceUID = ds.SOPInstanceUID
+    ds.PatientID = patient_id
+    ds.PatientName = "Bench^Mark"
+    ds.StudyInstanceUID = study_uid or generate_uid()
+    ds.SeriesInstanceUID = series_uid or generate_uid()
+    ds.StudyDate = "20240101"
+    ds.Manufacturer = "SYNTHETIC"
+    ds.InstitutionName = "Benchmark Hospital"
+    return ds
+
+
+def set_pixels(ds, arr):
+    """Native little endian pixel data. arr is rows x cols (x 3 for RGB) or frames x rows x cols"""
+    is_rgb = arr.ndim == 3 and arr.shape[-1] == 3
+    if arr.ndim == 3 and not is_rgb:
+        ds.NumberOfFrames = arr.shape[0]
+        ds.Rows, ds.Columns = arr.shape[1:]
+    else:
+        ds.Rows, ds.Columns = arr.shape[:2]
+    ds.SamplesPerPixel = 3 if is_rgb else 1
+    ds.PhotometricInterpretation = "RGB" if is_rgb else "MONOCHROME2"
+    if is_rgb:
+        ds.PlanarConfiguration = 0
+    ds.BitsAllocated = arr.dtype.itemsize * 8
+    ds.BitsStored = ds.BitsAllocated
+    ds.HighBit = ds.BitsStored - 1
+    ds.PixelRepresentation = 0
+    ds.PixelData = arr.tobytes()
+    return ds
+
+
+def ct_slice(index, study_uid=None, series_uid=None, size=512):
+    ds = base_dataset(CT_SOP, study_uid=study_uid, series_uid=series_uid)
+    ds.Modality = "CT"
+    ds.InstanceNumber = index + 1
+    ds.ImagePositionPatient = [0.0, 0.0, index * 1.25]
+    ds.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+    ds.PixelSpacing = [0.7, 0.7]
+    ds.SliceThickness = 1.25
+    ds.RescaleSlope = 1
+    ds.RescaleIntercept = -1024
+    ds.WindowCenter = [40, 400]
+    ds.WindowWidth = [400, 1500]
+    ds.KVP = 120
+    ds.ConvolutionKernel = "STANDARD"
+    rng = np.random.default_rng(index)
+    return set_pixels(ds, rng.integers(0, 3000, (size, size), dtype=np.uint16))
+
+
+def mr_slice(index, study_uid=None, series_uid=None, size=256):
+    ds = base_dataset(MR_SOP, study_uid=study_uid, series_uid=series_uid)
+    ds.Modality = "MR"
+    ds.InstanceNumber = index + 1
+    ds.ImagePositionPatient = [0.0, 0.0, index * 3.0]
+    ds.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+    ds.PixelSpacing = [0.9, 0.9]
+    ds.SliceThickness = 3.0
+    ds.EchoTime = 90
+    ds.RepetitionTime = 4000
+    rng = np.random.default_rng(index)
+    return set_pixels(ds, rng.integers(0, 1200, (size, size), dtype=np.uint16))
+
+
+def cr_image(rows=2048, cols=1670):
+    ds = base_dataset(CR_SOP)
+    ds.Modality = "DX"
+    ds.WindowCenter = 2048
+    ds.WindowWidth = 4096
+    ds.ViewPosition = "PA"
+    ds.BodyPartExamined = "CHEST"
+    rng = np.random.default_rng(0)
+    return set_pixels(ds, rng.integers(0, 4096, (rows, cols), dtype=np.uint16))
+
+
+def mammo_image(rows=3328, cols=2560):
+    ds = base_dataset(MG_SOP)
+    ds.Modality = "MG"
+    ds.ViewPosition = "CC"
+    ds.ImageLaterality = "L"
+    ds.WindowCenter = 2000
+    ds.WindowWidth = 3000
+    y, x = np.mgrid[0:rows, 0:cols]
+    breast = np.clip(1 - ((y - rows / 2) / (rows / 2)) ** 2 - (x / cols) ** 2, 0, 1)
+    noise = np.random.default_rng(1).integers(0, 200, (rows, cols))
+    return set_pixels(ds, (breast * 3800 + noise * (breast > 0)).astype(np.uint16))
+
+
+def rgb_image(rows=1024, cols=1024):
+    ds = base_dataset(CR_SOP)
+    ds.Modality = "XC"
+    rng = np.random.default_rng(2)
+    return set_pixels(ds, rng.integers(0, 255, (rows, cols, 3), dtype=np.uint8))
+
+
+def tomo_volume(frames=30, rows=1024, cols=768):
+    """Multi-frame breast tomosynthesis with shared and per frame functional groups"""
+    ds = base_dataset(TOMO_SOP)
+    ds.Modality = "MG"
+    ds.Manufacturer = "HOLOGIC, Inc."
+    rng = np.random.default_rng(3)
+    arr = rng.integers(0, 1000, (frames, rows, cols), dtype=np.uint16)
+    # dense tissue on the left edge
+    arr[:, :, : cols // 4] += 2000
+    set_pixels(ds, arr)
+    shared = Dataset()
+    orientation = Dataset()
+    orientation.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+    shared.PlaneOrientationSequence = [orientation]
+    measures = Dataset()
+    measures.PixelSpacing = [0.1, 0.1]
+    measures.SliceThickness = 1.0
+    shared.PixelMeasuresSequence = [measures]
+    voi = Dataset()
+    voi.WindowCenter = 1500
+    voi.WindowWidth = 2001
+    shared.FrameVOILUTSequence = [voi]
+    anatomy = Dataset()
+    anatomy.FrameLaterality = "L"
+    shared.FrameAnatomySequence = [anatomy]
+    ds.SharedFunctionalGroupsSequence = [shared]
+    per_frame = []
+    for i in range(frames):
+        frame = Dataset()
+        position = Dataset()
+        position.ImagePositionPatient = [0.0, 0.0, float(i)]
+        frame.PlanePositionSequence = [position]
+        content = Dataset()
+        content.InStackPositionNumber = i + 1
+        frame.FrameContentSequence = [content]
+        per_frame.append(frame)
+    ds.PerFrameFunctionalGroupsSequence = per_frame
+    return ds
+
+
+def other_with_private(private_bytes=1 << 20):
+    ds = base_dataset(SR_SOP)
+    ds.Modality = "SR"
+    ds.add_new(0x00090010, "LO", "SYNTHETIC PRIVATE")
+    ds.add_new(0x00091001, "OB", b"\x01" * private_bytes)
+    ds.add_new(0x00091002, "LO", "private text")
+    code = Dataset()
+    code.CodeValue = "121060"
+    code.CodingSchemeDesignator = "DCM"
+    code.CodeMeaning = "History"
+    ds.ConceptNameCodeSequence = [code]
+    return ds
+
+
+def write_dataset(ds, dcm_path):
+    os.makedirs(os.path.dirname(dcm_path), exist_ok=True)
+    ds.save_as(dcm_path, enforce_file_format=True)
+    return dcm_path
+
+
+def build_corpus(root, scale=1):
+    """
+    Writes a mixed modality tree under root laid out as patient/kind/files. Every scale unit adds
+    a CT and an MR series, a tomosynthesis volume, 16 bit DX and mammography images, RGB images
+    and header only files with large private tags. Returns the written paths by kind.
+    """
+    corpus = {k: [] for k in ("ct", "mr", "tomo", "dx", "mammo", "rgb", "other")}
+    for unit in range(scale):
+        unit_root = os.path.join(root, f"patient_{unit}")
+        for kind, make_slice, n_slices in (("ct", ct_slice, 64), ("mr", mr_slice, 32)):
+            study_uid, series_uid = generate_uid(), generate_uid()
+            for i in range(n_slices):
+                ds = make_slice(i, study_uid=study_uid, series_uid=series_uid, size=256)
+                corpus[kind].append(write_dataset(ds, os.path.join(unit_root, kind, f"{i}.dcm")))
+        corpus["tomo"].append(
+            write_dataset(tomo_volume(), os.path.join(unit_root, "tomo", "tomo.dcm"))
+        )
+        for i in range(4):
+            dcm_path = os.path.join(unit_root, "dx", f"{i}.dcm")
+            corpus["dx"].append(write_dataset(cr_image(1024, 832), dcm_path))
+        for i in range(2):
+            dcm_path = os.path.join(unit_root, "mammo", f"{i}.dcm")
+            corpus["mammo"].append(write_dataset(mammo_image(1664, 1280), dcm_path))
+            dcm_path = os.path.join(unit_root, "rgb", f"{i}.dcm")
+            corpus["rgb"].append(write_dataset(rgb_image(512, 512), dcm_path))
+        for i in range(20):
+            dcm_path = os.path.join(unit_root, "other", f"{i}.dcm")
+            corpus["other"].append(write_dataset(other_with_private(64 << 10), dcm_path))
+    return corpus
@@ -0,0 +1,180 @@
+import numpy as np
+import pytest
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+from A3IDicomTools.configs import build_args
+
+CT_SOP = "1.2.840.10008.5.1.4.1.1.2"
+TOMO_SOP = "1.2.840.10008.5.1.4.1.1.13.1.3"
+
+
+def build_dataset(sop_class_uid, rows=8, cols=8, **kwargs):
+    """Small monochrome dataset with a valid file meta group"""
+    ds = Dataset()
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.MediaStorageSOPClassUID = sop_class_uid
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.SOPClassUID = sop_class_uid
+    ds.SOPInstanceUID = generate_uid()
+    ds.file_meta.MediaStorageSOPInstanceUID = ds.SOPInstanceUID
+    ds.PatientID = "P1"
+    ds.PatientName = "Doe^John"
+    ds.StudyInstanceUID = generate_uid()
+    ds.SeriesInstanceUID = generate_uid()
+    ds.Modality = "OT"
+    ds.Rows = rows
+    ds.Columns = cols
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated = 16
+    ds.BitsStored = 16
+    ds.HighBit = 15
+    ds.PixelRepresentation = 0
+    ds.PixelData = np.arange(rows * cols, dtype=np.uint16).tobytes()
+    for k, v in kwargs.items():
+        setattr(ds, k, v)
+    return ds
+
+
+@pytest.fixture
+def make_dcm(tmp_path):
+    def _make(name, sop_class_uid, **kwargs):
+        ds = build_dataset(sop_class_uid, **kwargs)
+        dcm_path = tmp_path / name
+        dcm_path.parent.mkdir(parents=True, exist_ok=True)
+        ds.save_as(dcm_path, enforce_file_format=True)
+        return dcm_path
+
+    return _make
+
+
+@pytest.fixture
+def dataset_builder():
+    return build_dataset
+
+
+@pytest.fixture
+def make_config(tmp_path):
+    """Extractor configuration as parsed from the command line, with overrides"""
+
+    def _make(**overrides):
+        args = [
+            "--DICOMHome", str(tmp_path / "dicoms"),
+            "--OutputDirectory", str(tmp_path / "out"),
+            "--SaveBatchSize", "100",
+            "--SaveImages", "True",
+            "--NumProcesses", "1",
+            "--PublicHeadersOnly", "True",
+            "--SpecificHeadersOnly", "False",
+            "--ApplyVOILUT", "True",
+            "--Extractor", "General",
+            "--Reorient", "False",
+            "--ApplyParentFilter", "False",
+        ]
+        config = vars(build_args().parse_args(args))
+        config.update(overrides)
+        return config
+
+    return _make
+
+
+@pytest.fixture
+def make_ct_series(tmp_path):
+    """Writes an axial CT series of n slices to tmp_path/name, returns the paths"""
+
+    def _make(name="ct", n_slices=4, size=16):
+        series_dir = tmp_path / name
+        series_dir.mkdir(parents=True)
+        study_uid, series_uid = generate_uid(), generate_uid()
+        paths = []
+        for i in range(n_slices):
+            pixels = np.random.default_rng(i).integers(0, 3000, size * size, dtype=np.uint16)
+            ds = build_dataset(
+                CT_SOP,
+                rows=size,
+                cols=size,
+                Modality="CT",
+                StudyInstanceUID=study_uid,
+                SeriesInstanceUID=series_uid,
+                InstanceNumber=i + 1,
+                ImagePositionPatient=[0.0, 0.0, i * 1.25],
+                ImageOrientationPatient=[1, 0, 0, 0, 1, 0],
+                PixelSpacing=[0.7, 0.7],
+                SliceThickness=1.25,
+                RescaleSlope=1,
+                RescaleIntercept=-1024,
+                PixelData=pixels.tobytes(),
+            )
+            paths.append(str(series_dir / f"{i}.dcm"))
+            ds.save_as(paths[-1], enforce_file_format=True)
+        return paths
+
+    return _make
+
+
+@pytest.fixture
+def make_tomo(tmp_path):
+    """Writes a multi-frame breast tomosynthesis with shared and per frame functional groups"""
+
+    def _make(name="tomo.dcm", frames=5, rows=64, cols=48, laterality="L"):
+        arr = np.random.default_rng(3).integers(0, 1000, (frames, rows, cols), dtype=np.uint16)
+        # dense tissue on the left edge
+        arr[:, :, : cols // 4] += 2000
+        ds = build_dataset(TOMO_SOP, rows=rows, cols=cols, Modality="MG", NumberOfFrames=frames)
+        ds.PixelData = arr.tobytes()
+        shared = Dataset()
+        orientation = Dataset()
+        orientation.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+        shared.PlaneOrientationSequence = [orientation]
+        measures = Dataset()
+        measures.PixelSpacing = [0.1, 0.1]
+        measures.SliceThickness = 1.0
+        shared.PixelMeasuresSequence = [measures]
+        voi = Dataset()
+        voi.WindowCenter = 1500
+        voi.WindowWidth = 2001
+        shared.FrameVOILUTSequence = [voi]
+        anatomy = Dataset()
+        anatomy.FrameLaterality = laterality
+        shared.FrameAnatomySequence = [anatomy]
+        ds.SharedFunctionalGroupsSequence = [shared]
+        per_frame = []
+        for i in range(frames):
+            frame = Dataset()
+            position = Dataset()
+            position.ImagePositionPatient = [0.0, 0.0, float(i)]
+            frame.PlanePositionSequence = [position]
+            content = Dataset()
+            content.InStackPositionNumber = i + 1
+            frame.FrameContentSequence = [content]
+            per_frame.append(frame)
+        ds.PerFrameFunctionalGroupsSequence = per_frame
+        dcm_path = tmp_path / name
+        ds.save_as(dcm_path, enforce_file_format=True)
+        return str(dcm_path)
+
+    return _make
+
+
+@pytest.fixture
+def transcode():
+    """Transcodes a file to a transfer syntax with gdcm. Skips the test when gdcm is not installed"""
+    gdcm = pytest.importorskip("gdcm")
+
+    def _transcode(src, dst, syntax_name="JPEG2000Lossless"):
+        reader = gdcm.ImageReader()
+        reader.SetFileName(str(src))
+        assert reader.Read()
+        change = gdcm.ImageChangeTransferSyntax()
+        change.SetTransferSyntax(gdcm.TransferSyntax(getattr(gdcm.TransferSyntax, syntax_name)))
+        change.SetInput(reader.GetImage())
+        assert change.Change()
+        writer = gdcm.ImageWriter()
+        writer.SetFileName(str(dst))
+        writer.SetFile(reader.GetFile())
+        writer.SetImage(change.GetOutput())
+        assert writer.Write()
+        return str(dst)
+
+    return _transcode
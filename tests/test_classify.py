@@ -0,0 +1,19 @@
+from A3IDicomTools.extractors.GeneralExtractor import StorageClass, read_dcm_record
+from A3IDicomTools.extractors.inventory import FileStatus
+
+CT_SOP = "1.2.840.10008.5.1.4.1.1.2"
+CR_SOP = "1.2.840.10008.5.1.4.1.1.1.1"
+
+
+def test_categorize(make_dcm):
+    ct_record = read_dcm_record((make_dcm("ct.dcm", CT_SOP), None, None))
+    cr_record = read_dcm_record((make_dcm("cr.dcm", CR_SOP), None, None))
+    assert ct_record["storage_class"] == StorageClass.MRCT
+    assert cr_record["storage_class"] == StorageClass.XRAY
+
+
+def test_categorize_not_dicom(tmp_path):
+    txt_path = tmp_path / "notes.dcm"
+    txt_path.write_bytes(b"not a dicom file")
+    record = read_dcm_record((txt_path, None, None))
+    assert record["storage_class"] is None and record["status"] == FileStatus.UNREADABLE
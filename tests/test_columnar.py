@@ -0,0 +1,31 @@
+import pickle
+
+import pandas as pd
+
+from A3IDicomTools.extractors.columnar import ColumnBatch
+
+
+def test_column_batch_matches_row_frame():
+    rows = [
+        {"file": "a.dcm", "Rows": 512, "err_code": 0},
+        {"file": "b.dcm", "Modality": "SR"},
+        {"file": "c.dcm", "Rows": 256, "err_code": 1},
+    ]
+    first, second = ColumnBatch(), ColumnBatch()
+    first.append(rows[0])
+    for row in rows[1:]:
+        second.append(row)
+    second.perf.add("XRAY", {"files": 2, "read": 0.5})
+    # a batch crosses the process boundary as columns
+    second = pickle.loads(pickle.dumps(second))
+    first.extend(second)
+    first.perf.merge(second.perf)
+    # missing strings are None instead of NaN, both are written as empty cells
+    assert first.to_frame().to_csv() == pd.DataFrame(rows).to_csv()
+    assert first.column("Modality") == [None, "SR", None]
+    assert first.perf.summary()["XRAY"]["files"] == 2
+
+    first.copy_row(0, file="copy.dcm", duplicate_of="a.dcm")
+    assert len(first) == 4
+    assert first.column("file")[-1] == "copy.dcm" and first.column("Rows")[-1] == 512
+    assert first.column("duplicate_of") == [None, None, None, "a.dcm"]
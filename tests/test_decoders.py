@@ -0,0 +1,38 @@
+import json
+
+import numpy as np
+import pydicom as pyd
+import pytest
+
+from A3IDicomTools.extractors import decoders
+from A3IDicomTools.extractors.perf import PerfReport, StageTimer
+
+
+def test_fallback_to_next_decoder(tmp_path, monkeypatch, make_dcm, transcode):
+    native = make_dcm("native.dcm", "1.2.840.10008.5.1.4.1.1.1.1", rows=64, cols=48)
+    j2k = transcode(native, tmp_path / "j2k.dcm")
+    # pydicom has no JPEG 2000 decoder of its own, the first candidate fails
+    monkeypatch.setattr(decoders, "decoder_candidates", lambda uid, preferences: ["pydicom", "gdcm"])
+    timer = StageTimer()
+    arr = decoders.decode_pixels(pyd.dcmread(j2k), timer=timer)
+    np.testing.assert_array_equal(arr, pyd.dcmread(native).pixel_array)
+    assert list(timer.perf["pixel_decode"][pyd.uid.JPEG2000Lossless]) == ["gdcm"]
+
+    report = PerfReport()
+    report.add("XRAY", timer.perf)
+    written = report.write(tmp_path / "report.json", {"extraction": 1.0})
+    assert written["transfer_syntaxes"][pyd.uid.JPEG2000Lossless]["decoders"]["gdcm"]["files"] == 1
+
+
+def test_decoder_preferences(tmp_path):
+    bench_file = tmp_path / "decoders.json"
+    bench_file.write_text(json.dumps({"ranking": {"1.2.840.10008.1.2.4.90": ["gdcm", "pylibjpeg"]}}))
+    assert decoders.load_decoder_preferences(str(bench_file)) == {
+        "1.2.840.10008.1.2.4.90": ["gdcm", "pylibjpeg"]
+    }
+    preferences = decoders.load_decoder_preferences({"JPEG2000Lossless": "not_installed"})
+    available = list(decoders.get_decoder(pyd.uid.JPEG2000Lossless).available_plugins)
+    assert decoders.decoder_candidates(pyd.uid.JPEG2000Lossless, preferences) == (available or [None])
+    assert decoders.decoder_candidates(pyd.uid.ExplicitVRLittleEndian) == [decoders.NATIVE]
+    with pytest.raises(ValueError):
+        decoders.load_decoder_preferences({"NotASyntax": "gdcm"})
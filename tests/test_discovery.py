@@ -0,0 +1,28 @@
+from A3IDicomTools.extractors.discovery import DicomTreeScanner
+
+
+def _make_tree(root):
+    for series in ["a/s1", "a/s2", "b/s1"]:
+        series_dir = root / series
+        series_dir.mkdir(parents=True)
+        for i in range(3):
+            (series_dir / f"{i}.dcm").write_bytes(b"")
+        (series_dir / "notes.txt").write_bytes(b"")
+
+
+def test_scanner_finds_all(tmp_path):
+    _make_tree(tmp_path)
+    scanner = DicomTreeScanner(tmp_path, num_threads=4)
+    found = sorted(str(e.relative_to(tmp_path)) for e in scanner)
+    assert len(found) == 9
+    assert all(e.endswith(".dcm") for e in found)
+    assert scanner.files_found == 9
+
+
+def test_scanner_one_per_dir(tmp_path):
+    _make_tree(tmp_path)
+    scanner = DicomTreeScanner(tmp_path, num_threads=4, one_per_dir=True)
+    parents = [str(e.parent) for e in scanner]
+    assert len(parents) == 3
+    assert len(set(parents)) == 3
+
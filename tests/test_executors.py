@@ -0,0 +1,20 @@
+import os
+
+from A3IDicomTools.extractors.executors import split_dispatch
+
+
+def _run(tasks):
+    return [(name, os.getpid()) for name, _ in tasks]
+
+
+def test_header_tasks_run_on_threads():
+    batches = [[("OTHER", i), ("XRAY", i)] for i in range(5)]
+    results = list(
+        split_dispatch(
+            batches, _run, processes=2, threads=2, is_header_task=lambda e: e[0] == "OTHER"
+        )
+    )
+    rows = [row for result in results for row in result]
+    assert len(results) == 10 and len(rows) == 10
+    assert all(pid == os.getpid() for name, pid in rows if name == "OTHER")
+    assert all(pid != os.getpid() for name, pid in rows if name == "XRAY")
@@ -0,0 +1,111 @@
+import pydicom as pyd
+from pydicom.dataset import Dataset
+
+import pytest
+
+from A3IDicomTools.extractors.extractUtils import (
+    _cap_value,
+    extract_all_tags,
+    extract_tags,
+    resolve_tags,
+)
+from A3IDicomTools.extractors.functional_extractors import process_general
+
+CT_SOP = "1.2.840.10008.5.1.4.1.1.2"
+
+
+def _round_trip(ds, tmp_path):
+    dcm_path = tmp_path / "test.dcm"
+    ds.save_as(dcm_path, enforce_file_format=True)
+    return dcm_path
+
+
+def test_matches_legacy_values(tmp_path, dataset_builder):
+    ds = dataset_builder(
+        CT_SOP,
+        InstanceNumber=3,
+        SliceThickness=1.25,
+        ImagePositionPatient=[0, 0, 1.5],
+        SpecificCharacterSet="ISO_IR 100",
+        InstitutionName="Hôpital",
+    )
+    dcm_path = _round_trip(ds, tmp_path)
+    legacy = extract_all_tags(pyd.dcmread(dcm_path, stop_before_pixels=True))
+    tags = extract_tags(pyd.dcmread(dcm_path, stop_before_pixels=True))
+    assert set(legacy) == set(tags)
+    assert tags["InstanceNumber"] == 3
+    assert tags["SliceThickness"] == 1.25
+    assert tags["Rows"] == 8
+    assert tags["InstitutionName"] == "Hôpital"
+    assert tags["ImagePositionPatient"] == legacy["ImagePositionPatient"]
+    assert tags["PatientName"] == legacy["PatientName"]
+
+
+def test_private_and_nested(tmp_path, dataset_builder):
+    ds = dataset_builder(CT_SOP)
+    ds.add_new(0x00090010, "LO", "ACME")
+    ds.add_new(0x00091001, "LO", "secret")
+    code = Dataset()
+    code.CodeValue = "123"
+    ds.ConceptNameCodeSequence = [code]
+    dcm = pyd.dcmread(_round_trip(ds, tmp_path), stop_before_pixels=True)
+    tags = extract_tags(dcm)
+    assert "00091001" not in tags
+    assert tags["ConceptNameCodeSequence_CodeValue"] == "123"
+    tags = extract_tags(dcm, public_only=False, extract_nested=False)
+    assert tags["00091001"] == "secret"
+    assert not any(k.startswith("ConceptNameCodeSequence") for k in tags)
+
+
+def test_extract_nested_config(tmp_path, dataset_builder, make_config):
+    ds = dataset_builder(CT_SOP)
+    items = [Dataset(), Dataset()]
+    items[0].CodeValue, items[1].CodeValue = "first", "last"
+    ds.ConceptNameCodeSequence = items
+    dcm_path = str(_round_trip(ds, tmp_path))
+    tags = process_general(dcm_path, config=make_config())
+    # the items share the keys, the last one wins
+    assert tags["ConceptNameCodeSequence_CodeValue"] == "last"
+    tags = process_general(dcm_path, config=make_config(ExtractNested=False))
+    assert not any(k.startswith("ConceptNameCodeSequence") for k in tags)
+
+
+def test_specific_tags(tmp_path, dataset_builder):
+    tags = resolve_tags(["PatientID", "0x00280010", "(0008,1032)"])
+    assert tags == [0x00100020, 0x00280010, 0x00081032]
+    with pytest.raises(ValueError):
+        resolve_tags(["NotAKeyword"])
+    code = Dataset()
+    code.CodeValue = "123"
+    ds = dataset_builder(CT_SOP, ProcedureCodeSequence=[code])
+    dcm_path = _round_trip(ds, tmp_path)
+    dcm = pyd.dcmread(dcm_path, stop_before_pixels=True, specific_tags=tags)
+    assert extract_tags(dcm, tags=tags) == {
+        "PatientID": "P1",
+        "Rows": 8,
+        "ProcedureCodeSequence_CodeValue": "123",
+    }
+
+
+def test_oversized_values_are_not_loaded(tmp_path, dataset_builder):
+    ds = dataset_builder(CT_SOP, StudyDescription="short")
+    ds.add_new(0x00420011, "OB", bytes(range(256)) * 4096)  # EncapsulatedDocument, 1 MiB
+    ds.add_new(0x00204000, "LT", "x" * 5000)  # ImageComments
+    dcm_path = _round_trip(ds, tmp_path)
+    dcm = pyd.dcmread(dcm_path, stop_before_pixels=True, defer_size=1024)
+    tags = extract_tags(dcm, max_value_bytes=1024, oversized="hash")
+    assert tags["EncapsulatedDocument"].startswith("<1048576 bytes blake2b:")
+    assert tags["StudyDescription"] == "short"
+    # the deferred value was hashed from the file, not loaded
+    assert dcm.get_item(0x00420011, keep_deferred=True).value is None
+    assert extract_tags(dcm, max_value_bytes=1024, oversized="size")["ImageComments"] == "<5000 bytes>"
+    truncated = extract_tags(dcm, max_value_bytes=1024, oversized="truncate")
+    assert truncated["ImageComments"] == "x" * 1024
+    # binary values are kept as hex within the cap
+    assert truncated["EncapsulatedDocument"] == (bytes(range(256)) * 2).hex()
+
+
+def test_capped_values_are_measured_in_bytes():
+    assert _cap_value("é" * 1000, 1024, "truncate") == "é" * 512
+    assert _cap_value("é" * 1000, 1024, "size") == "<2000 bytes>"
+    assert _cap_value("é" * 500, 1024, "size") == "é" * 500
@@ -0,0 +1,17 @@
+import numpy as np
+import png
+import pytest
+
+from A3IDicomTools.extractors.image_encoders import encode_png
+
+
+@pytest.mark.parametrize(
+    "shape,dtype,bit_depth",
+    [((5, 7), np.uint16, 16), ((5, 7), np.uint8, 8), ((5, 7, 3), np.uint8, 8)],
+)
+def test_png_round_trip(shape, dtype, bit_depth):
+    arr = np.random.default_rng(0).integers(0, np.iinfo(dtype).max, size=shape, dtype=dtype)
+    width, height, rows, info = png.Reader(bytes=encode_png(arr, bit_depth, 1)).read()
+    assert (width, height, info["bitdepth"]) == (7, 5, bit_depth)
+    assert info["greyscale"] == (len(shape) == 2)
+    np.testing.assert_array_equal(np.vstack(list(rows)), arr.reshape(5, -1))
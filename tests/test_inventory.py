@@ -0,0 +1,119 @@
+import os
+
+import pandas as pd
+
+from A3IDicomTools.extractors.GeneralExtractor import read_dcm_record
+from A3IDicomTools.extractors.inventory import FileStatus, InventoryIndex
+
+CT_SOP = "1.2.840.10008.5.1.4.1.1.2"
+
+
+def _scan(index, paths):
+    index.start_scan()
+    records = [read_dcm_record(e) for e in index.iter_known_stats(paths)]
+    index.add_records(records)
+    return records
+
+
+def test_incremental_scan(tmp_path, make_dcm):
+    index = InventoryIndex(tmp_path / "index.sqlite")
+    paths = [make_dcm(f"s/{i}.dcm", CT_SOP) for i in range(3)]
+    records = _scan(index, paths)
+    assert all(r["storage_class"] == "MRCT" for r in records)
+    assert index.count_pending() == {"MRCT": 3}
+
+    index.set_status([(paths[0], FileStatus.DONE)])
+    records = _scan(index, paths)
+    # nothing changed so nothing is read again
+    assert not any("storage_class" in r for r in records)
+    assert sorted(str(p) for _, p in index.iter_pending()) == sorted(str(p) for p in paths[1:])
+
+
+def test_missing_files_are_not_pending(tmp_path, make_dcm):
+    index = InventoryIndex(tmp_path / "index.sqlite")
+    paths = [make_dcm(f"s/{i}.dcm", CT_SOP) for i in range(2)]
+    _scan(index, paths)
+    _scan(index, paths[:1])
+    assert index.count_pending() == {"MRCT": 1}
+
+
+def test_mark_duplicates(tmp_path, make_dcm):
+    index = InventoryIndex(tmp_path / "index.sqlite")
+    original = make_dcm("a/0.dcm", CT_SOP)
+    copy = tmp_path / "b" / "0.dcm"
+    copy.parent.mkdir()
+    copy.write_bytes(original.read_bytes())
+    other = make_dcm("c/0.dcm", CT_SOP)
+    _scan(index, [original, copy, other])
+    assert index.mark_duplicates() == 1
+    assert index.duplicates_by_representative() == {str(original): [str(copy)]}
+    assert sorted(str(p) for _, p in index.iter_pending()) == sorted([str(original), str(other)])
+
+
+def test_duplicates_of_extracted_files(tmp_path, make_dcm):
+    index = InventoryIndex(tmp_path / "index.sqlite")
+    original = make_dcm("a/0.dcm", CT_SOP)
+    _scan(index, [original])
+    index.set_status([(original, FileStatus.DONE)])
+    # a copy re-sent after the original was extracted
+    copy = tmp_path / "b" / "0.dcm"
+    copy.parent.mkdir()
+    copy.write_bytes(original.read_bytes())
+    _scan(index, [original, copy])
+    assert index.mark_duplicates() == 1
+    assert index.extracted_duplicates() == {str(original): [str(copy)]}
+    assert index.count_pending() == {}
+
+
+def test_copies_of_extracted_files_reuse_their_row(tmp_path, make_dcm, make_config):
+    from A3IDicomTools.extractors.PngExtractor import ExtractorRegister
+
+    original = make_dcm("dicoms/a/0.dcm", CT_SOP)
+    config = make_config(SaveImages=False, Incremental=True)
+    ExtractorRegister.build_extractor(config).execute()
+    copy = tmp_path / "dicoms" / "b" / "0.dcm"
+    copy.parent.mkdir()
+    copy.write_bytes(original.read_bytes())
+    extractor = ExtractorRegister.build_extractor(config)
+    extractor.execute()
+    assert extractor.index.count_status() == {FileStatus.DONE: 2}
+    meta = pd.read_csv(tmp_path / "out" / "metadata.csv", dtype="str").set_index("file")
+    assert meta.loc[str(copy), "duplicate_of"] == str(original)
+    assert meta.loc[str(copy), "SOPInstanceUID"] == meta.loc[str(original), "SOPInstanceUID"]
+
+
+def test_incremental_run_finds_files_rewritten_in_place(tmp_path, make_dcm, make_config):
+    from A3IDicomTools.extractors.PngExtractor import ExtractorRegister
+
+    dcm_path = make_dcm("dicoms/a/0.dcm", CT_SOP, PatientID="before")
+    config = make_config(SaveImages=False, Incremental=True)
+    ExtractorRegister.build_extractor(config).execute()
+    dir_mtime = os.stat(dcm_path.parent).st_mtime
+    make_dcm("dicoms/a/0.dcm", CT_SOP, PatientID="after")
+    os.utime(dcm_path, (0, 1))
+    assert os.stat(dcm_path.parent).st_mtime == dir_mtime
+    ExtractorRegister.build_extractor(config).execute()
+    meta = pd.read_csv(tmp_path / "out" / "metadata.csv", dtype="str")
+    # the row of the first extraction is replaced
+    assert meta["PatientID"].tolist() == ["after"]
+    assert set(meta["err_code"]) == {"0"}
+
+
+def test_incremental_run_converts_a_series_sent_in_two_parts(tmp_path, make_config, make_ct_series):
+    import nibabel as nib
+
+    from A3IDicomTools.extractors.PngExtractor import ExtractorRegister
+
+    staged = make_ct_series(name="staged", n_slices=8)
+    series_dir = tmp_path / "dicoms" / "ct"
+    series_dir.mkdir(parents=True)
+    config = make_config(Incremental=True)
+    for part in (staged[:4], staged[4:]):
+        for path in part:
+            os.replace(path, series_dir / os.path.basename(path))
+        ExtractorRegister.build_extractor(config).execute()
+    meta = pd.read_csv(tmp_path / "out" / "metadata.csv", dtype="str")
+    assert len(meta) == 8
+    assert set(meta["err_code"]) == {"0"}
+    assert meta["image_path"].nunique() == 1
+    assert nib.load(meta["image_path"].iloc[0]).shape == (16, 16, 8)
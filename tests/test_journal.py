@@ -0,0 +1,32 @@
+from A3IDicomTools.extractors.journal import CompletionJournal
+
+
+def test_replay_only_committed(tmp_path):
+    journal = CompletionJournal(tmp_path / "run.journal")
+    journal.start()
+    journal.record("a.dcm", "done", 0)
+    journal.record("b.dcm", "failed", 0)
+    journal.commit(0)
+    journal.record("c.dcm", "done", 1)
+    journal.close()
+    assert list(journal.replay()) == [("a.dcm", "done"), ("b.dcm", "failed")]
+    offset = journal.last_offset
+
+    # a new run reuses batch id 1, the entry of the interrupted run must not be committed
+    journal.start()
+    journal.record("d.dcm", "done", 1)
+    journal.commit(1)
+    journal.close()
+    assert list(journal.replay(offset)) == [("d.dcm", "done")]
+
+
+def test_replay_partial_line(tmp_path):
+    journal_path = tmp_path / "run.journal"
+    journal_path.write_text("#start\ndone\t0\ta.dcm\n#commit\t0\ndone\t1\tb.d")
+    journal = CompletionJournal(journal_path)
+    assert list(journal.replay()) == [("a.dcm", "done")]
+    journal.start()
+    journal.record("c.dcm", "done", 1)
+    journal.commit(1)
+    journal.close()
+    assert list(journal.replay(journal.last_offset)) == [("c.dcm", "done")]
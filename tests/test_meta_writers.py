@@ -0,0 +1,163 @@
+import pandas as pd
+import pytest
+
+from A3IDicomTools.extractors.meta_writers import BackgroundBatchWriter, CsvMetaWriter, typed_frame
+
+
+def test_typed_frame():
+    df = pd.DataFrame(
+        [
+            {"Rows": 10, "SliceThickness": 1.5, "PatientID": "007"},
+            {"SliceThickness": 2, "PatientID": None},
+        ],
+        dtype=object,
+    )
+    typed = typed_frame(df)
+    assert str(typed["Rows"].dtype) == "Int64"
+    assert str(typed["SliceThickness"].dtype) == "float64"
+    assert typed["PatientID"].tolist()[0] == "007"
+
+
+def test_parquet_merge_union(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    from A3IDicomTools.extractors.meta_writers import ParquetMetaWriter
+
+    writer = ParquetMetaWriter(str(tmp_path))
+    writer.write_batch([{"file": "a", "Rows": 10}], 0)
+    writer.write_batch([{"file": "b", "Rows": "x", "Extra": 1.5}], 1)
+    merged = pq.read_table(writer.merge(str(tmp_path)))
+    assert merged.num_rows == 2
+    assert set(merged.column_names) == {"file", "Rows", "Extra"}
+    assert str(merged.schema.field("Extra").type) == "double"
+
+
+def test_csv_merge(tmp_path):
+    writer = CsvMetaWriter(str(tmp_path))
+    writer.write_batch([{"file": "a", "Rows": 10}], 0)
+    writer.write_batch([{"file": "b", "Extra": "y"}], 1)
+    merged = pd.read_csv(writer.merge(str(tmp_path)), dtype="str")
+    assert len(merged) == 2
+    assert {"file", "Rows", "Extra"} <= set(merged.columns)
+
+
+def test_csv_merge_to_parquet(tmp_path):
+    pytest.importorskip("pyarrow")
+    writer = CsvMetaWriter(str(tmp_path))
+    for i in range(3):
+        writer.write_batch([{"file": str(i), f"Col{i}": "v"}], i)
+    writer.merge(str(tmp_path), to_parquet=True)
+    merged = pd.read_parquet(tmp_path / "metadata.parquet")
+    assert merged["file"].tolist() == ["0", "1", "2"]
+    assert {"Col0", "Col1", "Col2"} <= set(merged.columns)
+
+
+def test_background_writer_keeps_order_and_reports_errors():
+    written = []
+
+    def write(rows, batch_id):
+        if batch_id == 3:
+            raise OSError("disk full")
+        written.append((batch_id, len(rows)))
+
+    writer = BackgroundBatchWriter(write, max_queue=2)
+    for batch_id in range(3):
+        writer.submit([{"a": 1}] * batch_id, batch_id)
+    writer.close()
+    assert written == [(0, 0), (1, 1), (2, 2)]
+    assert writer.metrics["writer_batches"] == 3
+
+    writer = BackgroundBatchWriter(write, max_queue=2)
+    writer.submit([], 3)
+    with pytest.raises(OSError):
+        writer.close()
+
+    # an error already being handled is not replaced by the writer's
+    writer = BackgroundBatchWriter(write, max_queue=2)
+    writer.submit([], 3)
+    writer.close(raise_error=False)
+
+
+def test_csv_append(tmp_path):
+    writer = CsvMetaWriter(str(tmp_path))
+    writer.write_batch([{"file": "a", "Rows": 10}], 0)
+    destination = writer.merge(str(tmp_path))
+    writer.write_batch([{"file": "b"}], 1)
+    writer.append(str(tmp_path), writer.batch_files()[1:])
+    assert pd.read_csv(destination, dtype="str")["file"].tolist() == ["a", "b"]
+    # a new column needs a new header so the file is rewritten
+    writer.write_batch([{"file": "c", "Extra": "y"}], 2)
+    writer.append(str(tmp_path), writer.batch_files()[2:])
+    merged = pd.read_csv(destination, dtype="str")
+    assert merged["file"].tolist() == ["a", "b", "c"] and "Extra" in merged.columns
+
+
+def test_csv_int_columns_keep_their_format(tmp_path):
+    writer = CsvMetaWriter(str(tmp_path))
+    writer.write_batch([{"file": "a", "err_code": 0}, {"file": "b"}], 0)
+    writer.write_batch([{"file": "c", "err_code": 0}], 1)
+    merged = pd.read_csv(writer.merge(str(tmp_path)), dtype="str")
+    assert merged["err_code"].tolist()[::2] == ["0", "0"]
+
+
+def test_parquet_append(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    from A3IDicomTools.extractors.meta_writers import ParquetMetaWriter
+
+    writer = ParquetMetaWriter(str(tmp_path))
+    writer.write_batch([{"file": "a", "Rows": 10, "Extra": 1.5}], 0)
+    destination = writer.merge(str(tmp_path))
+    writer.write_batch([{"file": "b", "Rows": 12}], 1)
+    writer.append(str(tmp_path), writer.batch_files()[1:])
+    appended = pq.ParquetFile(destination)
+    # the new rows are added as a row group after the existing ones
+    assert appended.num_row_groups == 2
+    assert appended.read().column("file").to_pylist() == ["a", "b"]
+    # a new column needs a new schema so every batch is merged again
+    writer.write_batch([{"file": "c", "New": "y"}], 2)
+    writer.append(str(tmp_path), writer.batch_files()[2:])
+    merged = pq.read_table(destination)
+    assert merged.column("file").to_pylist() == ["a", "b", "c"] and "New" in merged.column_names
+
+
+def test_csv_append_to_parquet(tmp_path):
+    pytest.importorskip("pyarrow")
+    writer = CsvMetaWriter(str(tmp_path))
+    writer.write_batch([{"file": "a", "Rows": 10}], 0)
+    writer.merge(str(tmp_path), to_parquet=True)
+    writer.write_batch([{"file": "b"}], 1)
+    writer.append(str(tmp_path), writer.batch_files()[1:], to_parquet=True)
+    merged = pd.read_parquet(tmp_path / "metadata.parquet")
+    assert merged["file"].tolist() == ["a", "b"]
+
+
+@pytest.mark.parametrize("to_parquet", [False, True])
+def test_csv_latest_batch_wins_per_file(tmp_path, to_parquet):
+    if to_parquet:
+        pytest.importorskip("pyarrow")
+    writer = CsvMetaWriter(str(tmp_path))
+    writer.write_batch([{"file": "a", "PatientID": "old"}, {"file": "b", "PatientID": "b"}], 0)
+    destination = writer.merge(str(tmp_path), to_parquet=to_parquet)
+    # a is extracted again, its earlier row is dropped from the merged output
+    writer.write_batch([{"file": "a", "PatientID": "new"}], 1)
+    writer.append(str(tmp_path), writer.batch_files()[1:], to_parquet=to_parquet)
+    merged = pd.read_csv(destination, dtype="str")
+    assert merged[["file", "PatientID"]].values.tolist() == [["b", "b"], ["a", "new"]]
+    if to_parquet:
+        merged = pd.read_parquet(tmp_path / "metadata.parquet")
+        assert merged[["file", "PatientID"]].values.tolist() == [["b", "b"], ["a", "new"]]
+
+
+def test_parquet_latest_batch_wins_per_file(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    from A3IDicomTools.extractors.meta_writers import ParquetMetaWriter
+
+    writer = ParquetMetaWriter(str(tmp_path))
+    writer.write_batch([{"file": "a", "PatientID": "old"}, {"file": "b", "PatientID": "b"}], 0)
+    destination = writer.merge(str(tmp_path))
+    writer.write_batch([{"file": "a", "PatientID": "new"}], 1)
+    writer.append(str(tmp_path), writer.batch_files()[1:])
+    merged = pq.read_table(destination).to_pandas()
+    assert merged[["file", "PatientID"]].values.tolist() == [["b", "b"], ["a", "new"]]
@@ -0,0 +1,23 @@
+import json
+
+from A3IDicomTools.extractors.perf import PerfReport, StageTimer
+
+
+def test_report_by_storage_class(tmp_path):
+    report = PerfReport()
+    for i in range(1, 5):
+        timer = StageTimer(n_files=2)
+        timer.add("read", 0.1 * i)
+        timer.add("encode", 0.2)
+        timer.add("bytes_read", 100)
+        report.add("XRAY", timer.perf)
+    report.add("OTHER", {"files": 1, "tags": 0.5, "bytes_read": 10, "bytes_written": 0})
+    report.write(tmp_path / "report.json", {"extraction": 2.0})
+    written = json.loads((tmp_path / "report.json").read_text())
+    assert written["files"] == 9
+    assert written["files_per_sec"] == 4.5
+    xray = written["storage_classes"]["XRAY"]
+    assert (xray["tasks"], xray["files"], xray["bytes_read"]) == (4, 8, 400)
+    assert abs(xray["stages"]["read"]["max"] - 0.4) < 1e-9
+    assert "decode" not in xray["stages"]
+    assert written["storage_classes"]["OTHER"]["files_per_worker_sec"] == 2.0
@@ -0,0 +1,47 @@
+import numpy as np
+import pydicom as pyd
+from pydicom import pixels as pyd_pixels
+
+from A3IDicomTools.extractors.functional_extractors import apply_window, process_image
+
+CR_SOP = "1.2.840.10008.5.1.4.1.1.1.1"
+
+
+def _reference(ds):
+    image = pyd_pixels.apply_voi_lut(ds.pixel_array, ds, prefer_lut=True).astype(float)
+    return np.uint16(np.maximum(image, 0) / image.max() * (2**16 - 1))
+
+
+def test_windowed_and_raw_match_float_reference(make_dcm):
+    windowed = pyd.dcmread(make_dcm("w.dcm", CR_SOP, WindowCenter=20, WindowWidth=30))
+    raw = pyd.dcmread(make_dcm("r.dcm", CR_SOP))
+    for ds in (windowed, raw):
+        image, shape, is_rgb, bit_depth = process_image(ds)
+        assert (shape, is_rgb, bit_depth, image.dtype) == ((8, 8), False, 16, np.uint16)
+        diff = np.abs(image.astype(int) - _reference(ds).astype(int))
+        assert diff.max() <= 1
+
+
+def test_rgb_is_detected(make_dcm):
+    rgb = np.arange(8 * 8 * 3, dtype=np.uint8).reshape(8, 8, 3)
+    dcm_path = make_dcm(
+        "rgb.dcm",
+        CR_SOP,
+        SamplesPerPixel=3,
+        PhotometricInterpretation="RGB",
+        PlanarConfiguration=0,
+        BitsAllocated=8,
+        BitsStored=8,
+        HighBit=7,
+        PixelData=rgb.tobytes(),
+    )
+    image, shape, is_rgb, _ = process_image(pyd.dcmread(dcm_path), is16Bit=False)
+    assert is_rgb and shape == (8, 8, 3)
+    assert image.max() == 255
+
+
+def test_apply_window_keeps_native_dtype():
+    arr = np.arange(10, dtype=np.uint16)
+    out = apply_window(arr, None, {"WindowCenter": 5, "WindowWidth": 4})
+    assert out is arr and out.dtype == np.uint16
+    assert out.min() == 3 and out.max() == 7
@@ -0,0 +1,31 @@
+from pathlib import Path
+
+from A3IDicomTools.extractors.inventory import InventoryIndex
+from A3IDicomTools.extractors.scheduling import plan_tasks
+
+
+def _record(path, store_class, size, series_uid=None):
+    return {
+        "path": path,
+        "size": size,
+        "mtime": 0,
+        "storage_class": store_class,
+        "series_uid": series_uid,
+    }
+
+
+def test_longest_first_and_cheap_tasks_chunked(tmp_path):
+    index = InventoryIndex(tmp_path / "index.sqlite")
+    index.start_scan()
+    mb = 2**20
+    index.add_records(
+        [_record(f"ct/{i}.dcm", "MRCT", mb, "1.2.3") for i in range(100)]
+        + [_record("tomo.dcm", "TOMO", 400 * mb), _record("cr.dcm", "XRAY", 20 * mb)]
+        + [_record(f"sr/{i}.dcm", "OTHER", 1000) for i in range(200)]
+    )
+    batches = list(plan_tasks(index, print_images=True, series_classes=("MRCT",), chunk_cost=0.25))
+    assert batches[0] == [("TOMO", Path("tomo.dcm"))]
+    assert batches[1][0][0] == "MRCT" and len(batches[1][0][1]) == 100
+    assert batches[2][0][0] == "XRAY"
+    # 200 header only tasks of 3ms are packed in chunks of ~0.25s
+    assert [len(e) for e in batches[3:]] == [84, 84, 32]
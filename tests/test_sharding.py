@@ -0,0 +1,53 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from A3IDicomTools.MergeShards import merge_shards
+from A3IDicomTools.extractors.GeneralExtractor import read_dcm_record
+from A3IDicomTools.extractors.inventory import FileStatus
+from A3IDicomTools.extractors.meta_writers import CsvMetaWriter
+from A3IDicomTools.extractors.sharding import record_shard, shard_directory, shard_of
+
+
+def test_partition_is_stable_and_keeps_studies_together():
+    records = [{"path": f"/d/{i}.dcm", "study_uid": f"1.2.{i % 5}"} for i in range(50)]
+    shards = {}
+    for rec in records:
+        shards.setdefault(rec["study_uid"], set()).add(record_shard(rec, 3))
+    assert all(len(e) == 1 for e in shards.values())
+    assert shard_of("1.2.3", 4) == shard_of("1.2.3", 4)
+    assert {shard_of(f"1.2.{i}", 4) for i in range(100)} == {0, 1, 2, 3}
+
+
+def test_other_shards_are_not_fingerprinted(make_dcm):
+    dcm_path = make_dcm("ct.dcm", "1.2.840.10008.5.1.4.1.1.2", StudyInstanceUID="1.2.3")
+    own_shard = shard_of("1.2.3", 2)
+    record = read_dcm_record((dcm_path, None, None), shard_index=own_shard, shard_count=2)
+    assert record["storage_class"] == "MRCT" and record["fingerprint"]
+    record = read_dcm_record((dcm_path, None, None), shard_index=1 - own_shard, shard_count=2)
+    assert record["status"] == FileStatus.OTHER_SHARD and record["study_uid"] == "1.2.3"
+    assert record["storage_class"] is None and "fingerprint" not in record
+
+
+def test_merge_shards(tmp_path):
+    for shard_index in range(2):
+        shard_dir = shard_directory(str(tmp_path), shard_index, 2)
+        writer = CsvMetaWriter(os.path.join(shard_dir, "meta"))
+        os.makedirs(writer.meta_directory)
+        writer.write_batch([{"file": f"{shard_index}.dcm", f"Tag{shard_index}": 1}], 0)
+        with open(os.path.join(shard_dir, "performance_report.json"), "w") as f:
+            json.dump({"run": {"extraction": 1.0 + shard_index}, "files": 1}, f)
+    merged = pd.read_csv(merge_shards(str(tmp_path)), dtype="str")
+    assert sorted(merged["file"]) == ["0.dcm", "1.dcm"]
+    assert {"Tag0", "Tag1"} <= set(merged.columns)
+    with open(tmp_path / "performance_report.json") as f:
+        report = json.load(f)
+    assert report["files"] == 2 and report["run"]["extraction"] == 2.0
+
+
+def test_merge_shards_missing_shard(tmp_path):
+    os.makedirs(tmp_path / "shard_0_of_2")
+    with pytest.raises(FileNotFoundError):
+        merge_shards(str(tmp_path))
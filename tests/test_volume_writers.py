@@ -0,0 +1,87 @@
+import os
+
+import nibabel as nib
+import numpy as np
+import pytest
+
+from A3IDicomTools.extractors.functional_extractors import (
+    process_ctmri,
+    process_ctmri_series,
+    process_tomo,
+)
+from A3IDicomTools.extractors.volume_writers import volume_extension, write_volume
+
+
+@pytest.mark.parametrize("codec", ["none", "gzip", "parallel_gzip"])
+def test_volume_round_trip(tmp_path, codec):
+    # larger than a parallel_gzip block so the volume is written as several gzip members
+    arr = np.random.default_rng(0).integers(0, 64, size=(128, 128, 48), dtype=np.uint16)
+    nii = nib.Nifti1Image(arr, affine=np.eye(4))
+    nifti_path = tmp_path / f"vol{volume_extension(codec)}"
+    stats = write_volume(nii, nifti_path, codec=codec, level=1, threads=2)
+    np.testing.assert_array_equal(np.asarray(nib.load(nifti_path).dataobj), arr)
+    assert stats["image_encode_time"] >= 0
+    assert (stats["image_compression_ratio"] == 1) == (codec == "none")
+
+
+@pytest.mark.parametrize("shape", [(32, 24, 5), (16, 12, 4, 3)])
+def test_volume_same_as_nibabel(tmp_path, shape):
+    arr = np.random.default_rng(1).random(shape).astype(np.float32)
+    nii = nib.Nifti1Image(arr, affine=np.diag([0.5, 0.7, 1.2, 1]))
+    write_volume(nii, tmp_path / "vol.nii", codec="none")
+    assert (tmp_path / "vol.nii").read_bytes() == nii.to_bytes()
+
+
+@pytest.mark.parametrize("codec", ["none", "gzip"])
+@pytest.mark.parametrize("laterality", ["L", "R"])
+def test_streamed_tomo_matches_dicom2nifti(tmp_path, codec, laterality, make_config, make_tomo):
+    # the dense tissue is on the left, a right breast is flipped by VerifyLaterality
+    dcm_path = make_tomo(laterality=laterality)
+    volumes = []
+    for stream in (True, False):
+        save_dir = tmp_path / str(stream)
+        save_dir.mkdir()
+        config = make_config(VolumeCodec=codec, VerifyLaterality=True, StreamTomoFrames=stream)
+        dcm_tags = process_tomo(dcm_path, str(save_dir), True, config=config)
+        assert dcm_tags["err_code"] == 0
+        volumes.append(nib.load(dcm_tags["image_path"]))
+    streamed, converted = volumes
+    np.testing.assert_array_equal(np.asarray(streamed.dataobj), np.asarray(converted.dataobj))
+    config = make_config(VolumeCodec=codec, StreamTomoFrames=True)
+    unverified = nib.load(process_tomo(dcm_path, str(tmp_path), True, config=config)["image_path"])
+    flipped = not np.array_equal(np.asarray(streamed.dataobj), np.asarray(unverified.dataobj))
+    assert flipped == (laterality == "R")
+    np.testing.assert_allclose(streamed.affine, converted.affine)
+    assert streamed.get_data_dtype() == converted.get_data_dtype()
+
+
+def test_reoriented_tomo(tmp_path, make_config, make_tomo):
+    import dicom2nifti
+    import pydicom as pyd
+
+    dcm_path = make_tomo()
+    config = make_config(Reorient=True, ApplyVOILUT=False)
+    dcm_tags = process_tomo(dcm_path, str(tmp_path), True, config=config)
+    assert dcm_tags["err_code"] == 0
+    reference = dicom2nifti.convert_dicom.dicom_array_to_nifti(
+        [pyd.dcmread(dcm_path)], str(tmp_path / "reference.nii.gz"), reorient_nifti=True
+    )["NII"]
+    written = nib.load(dcm_tags["image_path"])
+    np.testing.assert_array_equal(np.asarray(written.dataobj), np.asarray(reference.dataobj))
+    np.testing.assert_allclose(written.affine, reference.affine)
+
+
+def test_reoriented_ctmri(tmp_path, make_config, make_ct_series):
+    import dicom2nifti
+    dcm_paths = make_ct_series()
+    reference = dicom2nifti.dicom_series_to_nifti(
+        os.path.dirname(dcm_paths[0]), str(tmp_path / "reference.nii.gz"), reorient_nifti=True
+    )["NII"]
+    config = make_config(Reorient=True)
+    tag_rows = [process_ctmri(dcm_paths[0], str(tmp_path), True, config=config)]
+    tag_rows += process_ctmri_series(dcm_paths, str(tmp_path), True, config=config)
+    for dcm_tags in tag_rows:
+        assert dcm_tags["err_code"] == 0
+        written = nib.load(dcm_tags["image_path"])
+        np.testing.assert_array_equal(np.asarray(written.dataobj), np.asarray(reference.dataobj))
+        np.testing.assert_allclose(written.affine, reference.affine)